@@ -0,0 +1,47 @@
+import json
+import pytest
+
+import vegans
+import vegans.benchmarks as benchmarks
+
+
+@pytest.mark.parametrize("model_name", vegans.__all__)
+def test_build_model(model_name):
+    model = benchmarks.build_model(model_name=model_name, architecture="example", device="cpu")
+    X, y = benchmarks.create_data(model_name=model_name, architecture="example", nr_samples=8)
+    assert X.shape[1:] == model.x_dim
+    assert (y is None) == (not model_name.startswith("Conditional"))
+
+
+def test_run_benchmarks(tmp_path):
+    results = benchmarks.run_benchmarks(
+        models=["VanillaGAN", "ConditionalCycleGAN"], batch_size=4, nr_steps=2, nr_generate=2, device="cpu", verbose=False
+    )
+    for result in results["results"]:
+        assert "error" not in result, result["error"]
+        assert result["steps_per_sec"] > 0 and result["generate_samples_per_sec"] > 0
+        assert result["peak_memory_mb"] is None or result["peak_memory_mb"] > 0
+
+    path = str(tmp_path / "results.json")
+    benchmarks.save_results(results=results, path=path)
+    loaded = benchmarks.load_results(path=path)
+    comparison = benchmarks.compare_results(baseline=loaded, current=results)
+    assert len(comparison) == 4
+    assert all(row["ratio"] == 1 for row in comparison)
+
+    results = benchmarks.run_benchmarks(models=["EBGAN"], architectures=["celeba"], verbose=False)
+    assert "error" in results["results"][0]
+
+    results = benchmarks.run_benchmarks(models=["VanillaGAN"], batch_size=4, nr_steps=1, nr_generate=1, device="cpu",
+        verbose=False, isolate=False)
+    assert results["results"][0]["peak_memory_mb"] is None
+
+
+def test_cli(tmp_path):
+    from vegans.benchmarks.__main__ import main
+    path = str(tmp_path / "results.json")
+    args = ["--models", "LSGAN", "--batch-size", "4", "--steps", "2", "--generate-batches", "1", "--device", "cpu"]
+    assert main(args + ["--output", path]) == 0
+    with open(path) as f:
+        assert json.load(f)["results"][0]["model"] == "LSGAN"
+    assert main(args + ["--baseline", path]) == 0
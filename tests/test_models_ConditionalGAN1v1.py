@@ -68,6 +68,20 @@ def test_init(gan, last_layer):
         gan(generator=gen, adversary=adv, x_dim=16, z_dim=z_dim, y_dim=y_dim, folder=None)
 
 
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_concatenate_real(gan, last_layer):
+    gen = generate_net(in_dim=15, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=21, last_layer=last_layer, out_dim=1)
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, y_dim=5, folder=None)
+    X_batch, y_batch = torch.zeros(4, 16), torch.ones(4, 5)
+    real_concat = testgan._concatenate_real(X_batch=X_batch, y_batch=y_batch)
+    assert real_concat.shape == (4, 21)
+    assert testgan._concatenate_real(X_batch=X_batch, y_batch=y_batch) is real_concat
+    assert testgan._concatenate_real(X_batch=torch.zeros(4, 16), y_batch=y_batch) is not real_concat
+    testgan.calculate_losses(X_batch=X_batch, Z_batch=testgan.sample(n=4), y_batch=y_batch)
+    assert testgan._real_concat_cache[0] is X_batch
+
+
 @pytest.mark.parametrize("gan, last_layer", networks)
 def test_fit_vector(gan, last_layer):
     z_dim = 10
@@ -90,6 +104,28 @@ def test_fit_vector(gan, last_layer):
     assert hasattr(testgan, "logged_losses")
 
 
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_fit_class_labels(gan, last_layer):
+    y_dim = 5
+    X_train = np.zeros(shape=[100, 16])
+    y_train = np.arange(100) % y_dim
+
+    gen = generate_net(in_dim=15, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=21, last_layer=last_layer, out_dim=1)
+    fit_kwargs = {
+        "epochs": 1, "batch_size": 4, "steps": None, "print_every": None, "save_model_every": None,
+        "save_images_every": None, "save_losses_every": "1e", "enable_tensorboard": False
+    }
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, y_dim=y_dim, folder=None)
+    testgan.fit(X_train=X_train, y_train=y_train, X_test=X_train, y_test=y_train, **fit_kwargs)
+    assert testgan.fixed_labels.dtype == torch.long
+    embedded = testgan.concatenate(torch.zeros(3, 16), torch.tensor([0, 4, 2]))
+    assert torch.equal(embedded[:, 16:], torch.eye(y_dim)[[0, 4, 2]])
+
+    with pytest.raises(AssertionError):
+        testgan.fit(X_train=X_train, y_train=y_train.astype(float), **fit_kwargs)
+
+
 @pytest.mark.parametrize("gan, last_layer", networks)
 def test_fit_vector_feature_loss(gan, last_layer):
     z_dim = 10
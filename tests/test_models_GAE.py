@@ -112,6 +112,30 @@ def test_fit_vector(gan, adv_dim, enc_dim):
     assert hasattr(testgan, "logged_losses")
 
 
+@pytest.mark.parametrize("gan", [BicycleGAN, VAEGAN])
+def test_encode_real(gan):
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    enc = generate_net(in_dim=16, last_layer=torch.nn.Identity, out_dim=11)
+    disc = generate_net(in_dim=16, last_layer=torch.nn.Sigmoid, out_dim=1)
+    testgan = gan(generator=gen, adversary=disc, encoder=enc, x_dim=16, z_dim=10, folder=None)
+    X_batch = torch.zeros(4, 16)
+    real_encodings = []
+    testgan.encoder.register_forward_hook(lambda module, inpt, output: real_encodings.append(inpt[0] is X_batch))
+
+    testgan._losses = testgan.calculate_losses(X_batch=X_batch, Z_batch=testgan.sample(n=4))
+    assert sum(real_encodings) == 1
+    mu, _ = testgan._encode_real(X_batch=X_batch)
+    assert testgan._encode_real(X_batch=torch.zeros(4, 16))[0] is not mu
+
+    testgan._losses = testgan.calculate_losses(X_batch=X_batch, Z_batch=testgan.sample(n=4), who="Encoder")
+    testgan._zero_grad(who="Encoder")
+    testgan._backward(who="Encoder")
+    testgan._step(who="Encoder")
+    assert testgan._encoded_real_cache is None
+    head_params = set(testgan.latent_heads.parameters())
+    assert head_params <= set(p for group in testgan.optimizers["Encoder"].param_groups for p in group["params"])
+
+
 @pytest.mark.parametrize("gan, adv_dim, enc_dim", networks_flat)
 def test_fit_vector_feature_loss(gan, adv_dim, enc_dim):
     z_dim = 10
@@ -4,6 +4,7 @@ import pytest
 import numpy as np
 
 from vegans.GAN import (
+    EBGAN,
     KLGAN,
     LSGAN,
     VanillaGAN,
@@ -11,6 +12,7 @@ from vegans.GAN import (
     WassersteinGANGP
 )
 from vegans.utils.layers import LayerReshape
+from vegans.utils.optimizers import supports_implementation
 
 networks = [
     (KLGAN, torch.nn.Sigmoid),
@@ -83,6 +85,165 @@ def test_fit_vector(gan, last_layer):
     assert hasattr(testgan, "logged_losses")
 
 
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_clone(gan, last_layer):
+    X_train = np.zeros(shape=[100, 16])
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=16, last_layer=last_layer, out_dim=1)
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None)
+    testgan.enable_ema()
+
+    clonedgan = testgan.clone(optim_kwargs={"Generator": {"lr": 0.5}})
+    assert clonedgan.generator is not testgan.generator
+    assert getattr(clonedgan, "ema", None) is None
+    assert testgan.ema is not None
+    assert clonedgan.optimizers["Generator"].param_groups[0]["lr"] == 0.5
+    assert testgan.optimizers["Generator"].param_groups[0]["lr"] != 0.5
+    optimized_params = clonedgan.optimizers["Generator"].param_groups[0]["params"]
+    assert all(any(param is p for p in clonedgan.generator.parameters()) for param in optimized_params)
+    assert clonedgan.generator.output_size == testgan.generator.output_size
+    with pytest.raises(KeyError):
+        testgan.clone(optim_kwargs={"Nonexistent": {"lr": 0.5}})
+
+    clonedgan.fit(X_train=X_train, epochs=1, batch_size=4, print_every=None, save_losses_every="1e")
+    assert hasattr(clonedgan, "logged_losses")
+    assert not hasattr(testgan, "logged_losses")
+
+
+@pytest.mark.skipif(
+    not supports_implementation(torch.optim.Adam, "foreach"), reason="Installed torch has no foreach optimizers."
+)
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_fuse_optimizers(gan, last_layer):
+    X_train = np.zeros(shape=[100, 16])
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=16, last_layer=last_layer, out_dim=1)
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None, optim_kwargs={"Generator": {"lr": 0.5}})
+    testgan.fit(X_train=X_train, epochs=1, batch_size=4, print_every=None, save_losses_every="1e")
+    states = {
+        name: {param: dict(state) for param, state in optimizer.state.items()}
+        for name, optimizer in testgan.optimizers.items()
+    }
+    testgan.fuse_optimizers(implementation="foreach", joint=True)
+    for name, optimizer in testgan.optimizers.items():
+        assert len(optimizer.state) == len(states[name]) > 0
+        for param, state in states[name].items():
+            for key, value in state.items():
+                assert torch.equal(torch.as_tensor(optimizer.state[param][key]), torch.as_tensor(value))
+    assert testgan.optimizers["Generator"].param_groups[0]["foreach"]
+    assert testgan.optimizers["Generator"].param_groups[0]["lr"] == 0.5
+    assert testgan._joint_optimizer.param_groups[0] is testgan.optimizers["Generator"].param_groups[0]
+    with pytest.raises(ValueError):
+        testgan.fuse_optimizers(implementation="unknown")
+
+    testgan.fit(X_train=X_train, epochs=1, batch_size=4, print_every=None, save_losses_every="1e")
+    testgan.train()
+    testgan._losses = testgan.calculate_losses(X_batch=torch.zeros(4, 16), Z_batch=testgan.sample(n=4))
+    testgan._zero_grad()
+    testgan._backward()
+    testgan._step()
+    assert len(testgan._joint_optimizer.state) == sum(len(opt.state) for opt in testgan.optimizers.values())
+
+
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_ema(gan, last_layer, tmp_path):
+    X_train = np.zeros(shape=[100, 16])
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=16, last_layer=last_layer, out_dim=1)
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None)
+    with pytest.raises(ValueError):
+        with testgan.ema_weights():
+            pass
+    testgan.enable_ema(decay=0.9, every=5)
+    assert testgan._create_steps(steps={"Generator": 3}) == {"Generator": 3, "Adversary": 1}
+    testgan.fit(X_train=X_train, epochs=1, batch_size=4, print_every=None, save_losses_every="1e")
+    assert testgan.ema.nr_updates == 5
+    weight = testgan.ema.params[0]
+    live_weight = weight.detach().clone()
+    with testgan.ema_weights():
+        assert not torch.equal(weight, live_weight)
+        assert testgan.generate(z=testgan.fixed_noise).shape == (testgan.fixed_noise_size, 16)
+    assert torch.equal(weight, live_weight)
+
+    average = testgan.ema.averages[0].clone()
+    path = str(tmp_path / "model.torch")
+    testgan.save(name=path, use_ema=True)
+    assert torch.equal(weight, live_weight)
+    assert torch.equal(testgan.ema.averages[0], average)
+    loaded = gan.load(path)
+    assert loaded.ema is None
+    assert torch.equal(next(loaded._Z_transformer.parameters()), average)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="EMA side streams require cuda.")
+def test_ema_stream():
+    X_train = np.zeros(shape=[100, 16])
+    averages = {}
+    for use_stream in [False, True]:
+        torch.manual_seed(0)
+        gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+        adv = generate_net(in_dim=16, last_layer=torch.nn.Sigmoid, out_dim=1)
+        testgan = VanillaGAN(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None, device="cuda")
+        testgan.enable_ema(decay=0.9, use_stream=use_stream)
+        testgan.fit(
+            X_train=X_train, epochs=1, batch_size=4, steps={"Generator": 3}, print_every=None, save_losses_every="1e"
+        )
+        assert testgan.ema.nr_updates == 3*25
+        averages[use_stream] = [average.cpu() for average in testgan.ema.averages]
+    for average, average_stream in zip(averages[False], averages[True]):
+        assert torch.allclose(average, average_stream, atol=1e-5)
+
+
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_fit_profile(gan, last_layer):
+    X_train = np.zeros(shape=[100, 16])
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=16, last_layer=last_layer, out_dim=1)
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None)
+    testgan.fit(X_train=X_train, epochs=1, batch_size=4, print_every=None, save_losses_every="1e", profile=True)
+    assert testgan.profiler.counts["data"] == 25
+    assert testgan.profiler.counts["step/Generator"] == 25
+    assert testgan.profiler.counts["logging"] == 1
+    metrics = testgan.get_training_metrics()
+    assert metrics["step"] == metrics["total_steps"] == 25
+    assert metrics["eta"] == 0
+
+
+@pytest.mark.parametrize("gan, last_layer", networks)
+def test_fit_callbacks(gan, last_layer):
+    from vegans.utils.callbacks import Callback
+    class EarlyStopping(Callback):
+        def __init__(self):
+            self.networks = []
+        def on_step(self, model, network, state):
+            self.networks.append(network)
+        def on_batch_end(self, model, state):
+            state.stop_training = state.step == 3
+    X_train = np.zeros(shape=[100, 16])
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=16, last_layer=last_layer, out_dim=1)
+    testgan = gan(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None)
+    early_stopping = EarlyStopping()
+    testgan.fit(X_train=X_train, epochs=2, batch_size=4, print_every=None, save_losses_every=1, callbacks=[early_stopping])
+    assert testgan.get_training_metrics()["step"] == 3
+    assert len(testgan.logged_losses.get_steps(mode="Train")) == 3
+    assert early_stopping.networks == 3*list(testgan.neural_nets.keys())
+
+
+def test_EBGAN_margin():
+    X_train = torch.utils.data.DataLoader(torch.full(size=(40, 16), fill_value=0.5), batch_size=4)
+    gen = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid, out_dim=16)
+    adv = generate_net(in_dim=16, last_layer=torch.nn.Sigmoid, out_dim=16)
+    testgan = EBGAN(generator=gen, adversary=adv, x_dim=16, z_dim=10, folder=None)
+    testgan.fit(
+        X_train=X_train, epochs=1, print_every=None, save_model_every=None, save_images_every=None,
+        save_losses_every="1e", enable_tensorboard=False
+    )
+    assert testgan.m == pytest.approx(0.5)
+    losses = testgan._calculate_adversary_loss(X_batch=torch.zeros(4, 16), Z_batch=testgan.sample(n=4))
+    assert losses["Adversary_fake"].item() >= 0
+
+
 @pytest.mark.parametrize("gan, last_layer", networks)
 def test_fit_vector_feature_loss(gan, last_layer):
     X_train = np.zeros(shape=[100, 16])
@@ -101,6 +262,34 @@ def test_fit_vector_feature_loss(gan, last_layer):
     )
     assert hasattr(testgan, "logged_losses")
 
+    X_batch = torch.zeros(4, 16)
+    real_features = testgan._real_features(X_real=X_batch)
+    assert not real_features.requires_grad
+    assert testgan._real_features(X_real=X_batch) is real_features
+    testgan._losses = testgan.calculate_losses(X_batch=X_batch, Z_batch=testgan.sample(n=4), who="Adversary")
+    testgan._zero_grad(who="Adversary")
+    testgan._backward(who="Adversary")
+    testgan._step(who="Adversary")
+    assert testgan._real_features(X_real=X_batch) is not real_features
+
+    testgan.enable_mean_feature_matching(momentum=0.5)
+    testgan.fit(
+        X_train=X_train, X_test=X_test, **fit_kwargs
+    )
+    assert testgan._real_features_mean.shape == (16, )
+    real_features_mean = testgan._real_features_mean.clone()
+    X_test_batch = torch.ones(4, 16)
+    testgan._log_losses(X_batch=X_test_batch, Z_batch=testgan.sample(n=4), mode="Test")
+    assert torch.equal(testgan._real_features_mean, real_features_mean)
+    testgan._real_features(X_real=X_test_batch)
+    real_features_mean = testgan._real_features_mean.clone()
+    testgan._losses = testgan.calculate_losses(X_batch=X_test_batch, Z_batch=testgan.sample(n=4), who="Adversary")
+    testgan._zero_grad(who="Adversary")
+    testgan._backward(who="Adversary")
+    testgan._step(who="Adversary")
+    testgan._real_features(X_real=X_test_batch)
+    assert torch.equal(testgan._real_features_mean, real_features_mean)
+
 
 @pytest.mark.parametrize("gan, last_layer", networks)
 def test_fit_error_vector(gan, last_layer):
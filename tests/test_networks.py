@@ -36,6 +36,33 @@ def test_NeuralNetwork():
         net = generate_net(in_dim=10, last_layer=torch.nn.Tanh)
         network.NeuralNetwork(network=net, name="Something", input_size=11, device="cpu", ngpu=3, secure=True)
 
+def test_NeuralNetwork_output_size():
+    net = generate_net(in_dim=10, last_layer=torch.nn.Tanh)
+    net = network.NeuralNetwork(network=net, name="Something", input_size=10, device="cpu", ngpu=0, secure=False)
+    assert net._output_size is None
+    assert net.output_size == (10, )
+    assert net._get_output_shape_forward() == (1, 10)
+
+    net = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3), torch.nn.BatchNorm2d(8))
+    net = network.NeuralNetwork(network=net, name="Something", input_size=[3, 16, 16], device="cpu", ngpu=0, secure=True)
+    assert net.output_size == (8, 14, 14)
+    assert net._get_output_shape_forward() == (1, 8, 14, 14)
+    assert torch.all(net.network[1].running_mean == 0)
+
+    class Reshape(torch.nn.Module):
+        def __init__(self, nr_channels):
+            super().__init__()
+            self.nr_channels = nr_channels
+
+        def forward(self, x):
+            return x.reshape(len(x), self.nr_channels, -1)
+
+    shapes = [
+        network.NeuralNetwork(network=Reshape(nr_channels), name="Something", input_size=12, device="cpu", ngpu=0, secure=False).output_size
+        for nr_channels in [2, 3]
+    ]
+    assert shapes == [(2, 6), (3, 4)]
+
 
 def test_Adversary():
     net = generate_net(in_dim=10, last_layer=torch.nn.Sigmoid)
@@ -1,3 +1,5 @@
+import os
+import sys
 import torch
 import pytest
 
@@ -5,11 +7,256 @@ import numpy as np
 import vegans.utils as utils
 import vegans.utils.loading as loading
 
+from vegans.utils.twins import twins_supported
+
 def test_Dataset():
     X = list(range(100))
     data = utils.DataSet(X)
     assert len(data) == len(X)
 
+def test_ArrayDataSet():
+    X = np.arange(100*3).reshape(100, 3)
+    y = np.arange(100).reshape(100, 1)
+    data = utils.ArrayDataSet(X, y=y, batch_size=32)
+    batches = list(data)
+    assert len(data) == len(batches) == 4
+    assert batches[0][0].shape == (32, 3) and batches[-1][0].shape == (4, 3)
+    assert np.array_equal(torch.cat([X_batch for X_batch, _ in batches]).numpy(), X)
+    assert np.array_equal(torch.cat([y_batch for _, y_batch in batches]).numpy(), y)
+
+def test_ArrayDataSet_memmap(tmp_path):
+    path = str(tmp_path / "X.npy")
+    np.save(path, np.ones(shape=(50, 2, 4, 4)))
+    X = np.load(path, mmap_mode="r")
+    batches = list(utils.ArrayDataSet(X, batch_size=16))
+    assert len(batches) == 4
+    assert isinstance(batches[0], torch.Tensor) and batches[0].shape == (16, 2, 4, 4)
+
+def test_BatchStream():
+    X = np.arange(10).reshape(10, 1)
+    loader = torch.utils.data.DataLoader(utils.ArrayDataSet(X, batch_size=4), batch_size=None)
+    stream = utils.BatchStream(loader)
+    assert len(stream) == 3
+    peeked = stream.peek()
+    first_epoch = list(stream)
+    assert first_epoch[0] is peeked
+    assert np.array_equal(torch.cat(first_epoch).numpy(), X)
+    assert np.array_equal(torch.cat(list(stream)).numpy(), X)
+
+    stream = utils.BatchStream(loader, nr_samples=20)
+    assert len(stream) == 5
+    assert np.array_equal(torch.cat(list(stream)).numpy().ravel()[:12], np.concatenate([np.arange(10), np.arange(2)]))
+
+def test_AsyncLogger(tmp_path):
+    from vegans.utils.logger import AsyncLogger
+    os.makedirs(str(tmp_path / "images"))
+    logger = AsyncLogger(folder=str(tmp_path))
+    logger.log_images(images=torch.rand(4, 1, 8, 8), step=3, labels=[0, 1, 2, 3])
+    logged_losses = {"Train": {"Generator": [1.0, 0.5]}, "Test": {"Generator": [1.2, 0.7]}}
+    logger.plot_losses(logged_losses=logged_losses, path=str(tmp_path / "losses.png"))
+    logged_losses["Train"]["Generator"].append(0.25)
+    logged_losses["Test"]["Generator"].append(0.5)
+    logger.plot_losses(logged_losses=logged_losses, path=str(tmp_path / "losses.png"))
+    logger.close()
+    assert os.path.exists(str(tmp_path / "images" / "image_3.png"))
+    assert os.path.exists(str(tmp_path / "losses.png"))
+    assert len(logger._loss_plot.values[("Train", "Generator")]) == 3
+
+def test_LossHistory(tmp_path):
+    from vegans.utils.history import LossHistory
+    history = LossHistory(columns=["Generator", "Adversary"], modes=["Train", "Test"], capacity=2, flush_every=3)
+    for step in range(10):
+        history.append(mode="Train", losses={"Generator": torch.tensor(step), "Adversary": torch.tensor([2*step])}, step=step)
+    assert np.array_equal(history["Train"]["Generator"], np.arange(10))
+    assert np.array_equal(history["Train"]["Adversary"], 2*np.arange(10))
+    assert np.array_equal(history.get_steps(mode="Train"), np.arange(10))
+    assert len(history["Test"]["Generator"]) == 0
+
+    aggregated = history.aggregate(mode="Train", window=5)
+    assert np.array_equal(aggregated["Generator"], [2, 7])
+    aggregated = history.aggregate(mode="Train", window=4, agg=lambda x: np.max(x))
+    assert np.array_equal(aggregated["Adversary"], [6, 14])
+    with pytest.raises(TypeError):
+        history.aggregate(mode="Train", window=5, agg=lambda x, axis: np.mean(x, axis=axis) + "")
+
+    history.to_csv(str(tmp_path / "losses.csv"))
+    assert os.path.exists(str(tmp_path / "losses.csv"))
+
+def test_PhaseProfiler():
+    from vegans.utils.profiling import PhaseProfiler
+    profiler = PhaseProfiler(device="cpu")
+    profiler.start()
+    for _ in range(3):
+        with profiler.phase("data"):
+            pass
+        with profiler.phase("losses/Generator"):
+            torch.ones(10).sum()
+        profiler.step()
+    with pytest.raises(ValueError):
+        with profiler.phase("logging"):
+            raise ValueError()
+    profiler.stop()
+
+    assert profiler.counts == {"data": 3, "losses/Generator": 3, "logging": 1}
+    scalars = profiler.get_scalars()
+    assert set(scalars.keys()) == {"Profile/data", "Profile/losses/Generator", "Profile/logging"}
+    assert all(value >= 0 for value in scalars.values())
+    assert profiler.get_scalars()["Profile/data"] == 0
+    assert "losses/Generator" in profiler.summary()
+
+def test_ThroughputMeter():
+    from vegans.utils.profiling import ThroughputMeter
+    meter = ThroughputMeter(total_steps=20, device="cpu", warmup_steps=5)
+    assert meter.get_metrics() == {}
+    meter.start()
+    for step in range(10):
+        meter.mark("data")
+        torch.ones(100).sum()
+        meter.mark("train")
+        meter.end_step(nr_samples=32)
+        metrics = meter.get_metrics()
+        assert metrics["step"] == step + 1
+        assert metrics["warmup"] == (step + 1 <= 5)
+    assert metrics["samples_per_sec_train"] > 0
+    assert metrics["samples_per_sec"] <= metrics["samples_per_sec_train"]
+    assert 0 <= metrics["overhead_fraction"] <= 1
+    assert metrics["eta"] == pytest.approx(10 * metrics["time_per_step"])
+
+def test_CallbackList():
+    from vegans.utils.callbacks import Callback, CallbackList, SaveModel, TrainingState
+    class Recorder(Callback):
+        def __init__(self):
+            self.steps = []
+        def on_batch_end(self, model, state):
+            self.steps.append(state.step)
+    recorder = Recorder()
+    callbacks = CallbackList(callbacks=[recorder, SaveModel(every=2)])
+    assert not callbacks.has_step_callbacks
+    assert callbacks._hooks["on_train_begin"] == []
+    state = TrainingState(max_epochs=1, max_batches=1)
+    state.step = 1
+    callbacks.on_batch_end(model=None, state=state)
+    assert recorder.steps == [1]
+    with pytest.raises(TypeError):
+        CallbackList(callbacks=[lambda model, state: None])
+
+def test_join_optimizers():
+    from vegans.utils.optimizers import join_optimizers
+    net1, net2 = torch.nn.Linear(2, 2), torch.nn.Linear(2, 1)
+    opt1 = torch.optim.Adam(net1.parameters(), lr=0.1)
+    opt2 = torch.optim.Adam(net2.parameters(), lr=0.01)
+    joint = join_optimizers([opt1, opt2])
+    assert [group["lr"] for group in joint.param_groups] == [0.1, 0.01]
+    (net1(torch.ones(1, 2)).sum() + net2(torch.ones(1, 2)).sum()).backward()
+    joint.step()
+    assert len(opt1.state) == 2 and len(opt2.state) == 2
+    opt1.step()
+    assert opt1.state[net1.weight]["step"] == 2
+    opt1.state_dict()
+    with pytest.raises(TypeError):
+        join_optimizers([opt1, torch.optim.SGD(net2.parameters(), lr=0.1)])
+
+def test_TrainingEngine_stages():
+    from vegans.utils.engine import TrainingEngine
+    class Model():
+        neural_nets = {"Autoencoder": None, "AdversaryX_Y": None, "AdversaryY_X": None}
+        _independent_networks = [("AdversaryX_Y", "AdversaryY_X")]
+    schedule = {"Autoencoder": 1, "AdversaryX_Y": 1, "AdversaryY_X": 1}
+    engine = TrainingEngine(model=Model(), schedule=schedule)
+    assert engine.stages == [("Autoencoder", ), ("AdversaryX_Y", ), ("AdversaryY_X", )]
+    engine = TrainingEngine(model=Model(), schedule=schedule, concurrent=True)
+    assert engine.stages == [("Autoencoder", ), ("AdversaryX_Y", "AdversaryY_X")]
+
+def test_latent():
+    from vegans.utils.latent import latent_grid, latent_interpolation, latent_sweep, make_mosaic
+    grid = latent_grid(base=torch.zeros(3), dims=(0, 1), limits=(-1, 1), nr_points=3)
+    assert grid.shape == (9, 3)
+    assert grid[0].tolist() == [-1, 1, 0] and grid[2].tolist() == [1, 1, 0] and grid[8].tolist() == [1, -1, 0]
+    sweep = latent_sweep(base=torch.ones(2, 4), dim=3, values=[5, 6, 7])
+    assert sweep.shape == (6, 4) and sweep[:, 3].tolist() == [5, 6, 7, 5, 6, 7]
+    path = latent_interpolation(start=torch.zeros(2), end=torch.ones(2), nr_steps=5)
+    assert path[2].tolist() == [0.5, 0.5]
+    path = latent_interpolation(start=torch.tensor([1., 0]), end=torch.tensor([0., 1]), nr_steps=3, spherical=True)
+    assert torch.allclose(torch.norm(path, dim=1), torch.ones(3))
+    images = torch.arange(6).float().reshape(6, 1, 1, 1)
+    assert make_mosaic(images=images, nrow=2).tolist() == [[[0, 1, 2], [3, 4, 5]]]
+
+def test_LayerFusedHeads():
+    from vegans.utils.layers import LayerFusedHeads
+    heads = LayerFusedHeads(in_features=[2, 3], out_shapes=[4, [1, 2, 2]], activations=[None, torch.nn.ReLU()])
+    x = torch.randn(5, 2, 3)
+    mu, log_variance = heads(x)
+    assert mu.shape == (5, 4) and log_variance.shape == (5, 1, 2, 2)
+    assert mu._is_view() and (log_variance >= 0).all()
+    assert torch.allclose(mu, heads.linear(x.reshape(5, 6))[:, :4])
+
+@pytest.mark.skipif(not twins_supported(), reason="Twin networks require torch.func.")
+def test_twin_forward():
+    from vegans.utils.twins import check_twins, stack_twins, twin_forward
+    first = torch.nn.Sequential(torch.nn.Linear(3, 4), torch.nn.ReLU(), torch.nn.Linear(4, 2))
+    second = torch.nn.Sequential(torch.nn.Linear(3, 4), torch.nn.ReLU(), torch.nn.Linear(4, 2))
+    check_twins(first, second)
+    x_first, x_second = torch.randn(5, 3), torch.randn(5, 3)
+    out_first, out_second = twin_forward(first, second, x_first, x_second)
+    assert torch.allclose(out_first, first(x_first), atol=1e-6)
+    assert torch.allclose(out_second, second(x_second), atol=1e-6)
+    (out_first.sum() + out_second.sum()).backward()
+    assert first[0].weight.grad is not None and second[0].weight.grad is not None
+    params = stack_twins(first, second)
+    assert params["0.weight"].shape == (2, 4, 3)
+    assert torch.allclose(twin_forward(first, second, x_first, x_second, params=params)[1], out_second)
+
+    with pytest.raises(ValueError):
+        check_twins(first, torch.nn.Sequential(torch.nn.Linear(3, 2)))
+    with pytest.raises(ValueError):
+        check_twins(torch.nn.BatchNorm1d(3), torch.nn.BatchNorm1d(3))
+
+def test_generate_tiled():
+    from vegans.utils.tiling import generate_tiled, tile_positions
+
+    class DoublingModel(torch.nn.Module):
+        y_dim = (2, 8, 8)
+        device = "cpu"
+
+        def generate(self, y, z=None):
+            return (2*y).numpy()
+
+    assert tile_positions(size=20, tile_size=8, stride=6) == [0, 6, 12]
+    y = torch.rand(2, 21, 13)
+    output = generate_tiled(model=DoublingModel(), y=y, overlap=3, batch_size=4)
+    assert output.shape == (2, 21, 13)
+    assert torch.allclose(output, 2*y, atol=1e-5)
+
+def test_evaluation(tmp_path):
+    from vegans.evaluation import Evaluator, frechet_distance, kernel_distance
+    mean, covariance = torch.zeros(3), torch.eye(3)
+    assert frechet_distance(mean, covariance, mean, covariance) == pytest.approx(0, abs=1e-6)
+    assert frechet_distance(mean, covariance, mean + 1, covariance) == pytest.approx(3)
+
+    X_real = np.random.rand(300, 1, 8, 8)
+    evaluator = Evaluator(reference=X_real, name="random", cache_dir=str(tmp_path), batch_size=64, bank_size=200)
+    scores_same = evaluator.score(samples=[torch.rand(100, 1, 8, 8), torch.rand(100, 1, 8, 8)])
+    scores_shifted = evaluator.score(samples=[torch.rand(200, 1, 8, 8) + 1])
+    assert scores_same["FID"] < scores_shifted["FID"] and scores_same["KID"] < scores_shifted["KID"]
+    assert len(os.listdir(tmp_path)) == 1
+
+    cached = Evaluator(reference=X_real, name="random", cache_dir=str(tmp_path), batch_size=64, bank_size=200)
+    assert torch.equal(cached.reference_statistics()["mean"], evaluator.reference_statistics()["mean"])
+    subset = Evaluator(reference=X_real[:64], name="random", cache_dir=str(tmp_path), batch_size=64, bank_size=200)
+    assert subset.reference_statistics()["nr_samples"] == 64
+    assert len(os.listdir(tmp_path)) == 2
+    features = torch.randn(200, 4)
+    assert kernel_distance(features, torch.randn(200, 4)) < kernel_distance(features, torch.randn(200, 4) + 2)
+
+def test_lazy_imports():
+    import subprocess
+    code = (
+        "import sys; from vegans import VanillaGAN; "
+        "lazy = ['matplotlib', 'pandas', 'torchvision', 'torch.utils.tensorboard', 'vegans.models.unconditional.AAE']; "
+        "assert not any(module in sys.modules for module in lazy), [m for m in lazy if m in sys.modules]"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
 def test_WassersteinLoss():
     labels = torch.from_numpy(np.array([1, 1, 0, 0, 1, 0])).float()
     predictions = torch.from_numpy(np.array([5, 3, -2, 3, 8, -2])).float()
@@ -33,6 +280,8 @@ def test_concatenate():
     tensor2 = torch.randn(20, 10, requires_grad=False, device="cpu")
     result = utils.concatenate(tensor1, tensor2)
     assert result.numpy().shape == (20, 15, 4, 4)
+    assert torch.equal(result[:, 5:], torch.tile(tensor2.reshape(20, 10, 1, 1), dims=(1, 1, 4, 4)))
+    assert utils.concatenate(tensor1.double(), tensor2.double()).dtype == torch.float32
 
     tensor1 = torch.randn(20, 5, requires_grad=False, device="cpu")
     tensor2 = torch.randn(20, 10, 8, 7, requires_grad=False, device="cpu")
@@ -28,7 +28,7 @@ if __name__ == '__main__':
 
     epochs = 3
 
-    X_train, y_train = iter(train_dataloader).next()
+    X_train, y_train = next(iter(train_dataloader))
     x_dim = X_train.numpy().shape[1:]
     y_dim = y_train.numpy().shape[1:]
     z_dim = 128
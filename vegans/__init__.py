@@ -1,27 +1,52 @@
-from .models.unconditional.AAE import AAE
-from .models.unconditional.LSGAN import LSGAN
-from .models.unconditional.LRGAN import LRGAN
-from .models.unconditional.EBGAN import EBGAN
-from .models.unconditional.KLGAN import KLGAN
-from .models.unconditional.VAEGAN import VAEGAN
-from .models.unconditional.InfoGAN import InfoGAN
-from .models.unconditional.BicycleGAN import BicycleGAN
-from .models.unconditional.VanillaGAN import VanillaGAN
-from .models.unconditional.VanillaVAE import VanillaVAE
-from .models.unconditional.WassersteinGAN import WassersteinGAN
-from .models.unconditional.WassersteinGANGP import WassersteinGANGP
+""" All models are imported lazily on first access, e.g. `from vegans import VanillaGAN` only loads the
+modules needed for the VanillaGAN. Heavy optional dependencies (matplotlib, tensorboard, torchvision, pandas)
+are only imported once they are used.
+"""
+import importlib
 
-from .models.conditional.ConditionalAAE import ConditionalAAE
-from .models.conditional.ConditionalLSGAN import ConditionalLSGAN
-from .models.conditional.ConditionalLRGAN import ConditionalLRGAN
-from .models.conditional.ConditionalEBGAN import ConditionalEBGAN
-from .models.conditional.ConditionalKLGAN import ConditionalKLGAN
-from .models.conditional.ConditionalVAEGAN import ConditionalVAEGAN
-from .models.conditional.ConditionalInfoGAN import ConditionalInfoGAN
-from .models.conditional.ConditionalPix2Pix import ConditionalPix2Pix
-from .models.conditional.ConditionalCycleGAN import ConditionalCycleGAN
-from .models.conditional.ConditionalBicycleGAN import ConditionalBicycleGAN
-from .models.conditional.ConditionalVanillaGAN import ConditionalVanillaGAN
-from .models.conditional.ConditionalVanillaVAE import ConditionalVanillaVAE
-from .models.conditional.ConditionalWassersteinGAN import ConditionalWassersteinGAN
-from .models.conditional.ConditionalWassersteinGANGP import ConditionalWassersteinGANGP
\ No newline at end of file
+_MODELS = {
+    "AAE": "vegans.models.unconditional.AAE",
+    "LSGAN": "vegans.models.unconditional.LSGAN",
+    "LRGAN": "vegans.models.unconditional.LRGAN",
+    "EBGAN": "vegans.models.unconditional.EBGAN",
+    "KLGAN": "vegans.models.unconditional.KLGAN",
+    "VAEGAN": "vegans.models.unconditional.VAEGAN",
+    "InfoGAN": "vegans.models.unconditional.InfoGAN",
+    "BicycleGAN": "vegans.models.unconditional.BicycleGAN",
+    "VanillaGAN": "vegans.models.unconditional.VanillaGAN",
+    "VanillaVAE": "vegans.models.unconditional.VanillaVAE",
+    "WassersteinGAN": "vegans.models.unconditional.WassersteinGAN",
+    "WassersteinGANGP": "vegans.models.unconditional.WassersteinGANGP",
+
+    "ConditionalAAE": "vegans.models.conditional.ConditionalAAE",
+    "ConditionalLSGAN": "vegans.models.conditional.ConditionalLSGAN",
+    "ConditionalLRGAN": "vegans.models.conditional.ConditionalLRGAN",
+    "ConditionalEBGAN": "vegans.models.conditional.ConditionalEBGAN",
+    "ConditionalKLGAN": "vegans.models.conditional.ConditionalKLGAN",
+    "ConditionalVAEGAN": "vegans.models.conditional.ConditionalVAEGAN",
+    "ConditionalInfoGAN": "vegans.models.conditional.ConditionalInfoGAN",
+    "ConditionalPix2Pix": "vegans.models.conditional.ConditionalPix2Pix",
+    "ConditionalCycleGAN": "vegans.models.conditional.ConditionalCycleGAN",
+    "ConditionalBicycleGAN": "vegans.models.conditional.ConditionalBicycleGAN",
+    "ConditionalVanillaGAN": "vegans.models.conditional.ConditionalVanillaGAN",
+    "ConditionalVanillaVAE": "vegans.models.conditional.ConditionalVanillaVAE",
+    "ConditionalWassersteinGAN": "vegans.models.conditional.ConditionalWassersteinGAN",
+    "ConditionalWassersteinGANGP": "vegans.models.conditional.ConditionalWassersteinGANGP",
+}
+_SUBMODULES = ["GAN", "evaluation", "models", "utils"]
+
+__all__ = list(_MODELS.keys())
+
+
+def __getattr__(name):
+    if name in _MODELS:
+        model = getattr(importlib.import_module(_MODELS[name]), name)
+        globals()[name] = model
+        return model
+    elif name in _SUBMODULES:
+        return importlib.import_module("vegans." + name)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
@@ -0,0 +1,8 @@
+""" Training and inference benchmarks for all models in `vegans.GAN`.
+
+Run from the command line with `python -m vegans.benchmarks --help`.
+"""
+from vegans.benchmarks.builders import ARCHITECTURES, build_model, create_data, get_dimensions
+from vegans.benchmarks.runner import (
+    benchmark_model, run_benchmarks, compare_results, save_results, load_results, get_environment
+)
@@ -0,0 +1,75 @@
+""" Command line interface of the benchmark suite.
+
+Examples
+--------
+Benchmark all models on the example architecture and store the results:
+
+    python -m vegans.benchmarks --output results.json
+
+Compare two models against an earlier run and fail if a throughput dropped by more than 10%:
+
+    python -m vegans.benchmarks --models WassersteinGANGP ConditionalCycleGAN --architectures mnist \\
+        --baseline results_main.json --tolerance 0.1
+"""
+import sys
+import argparse
+
+from vegans.benchmarks.builders import ARCHITECTURES
+from vegans.benchmarks.runner import run_benchmarks, save_results, load_results, compare_results
+
+
+def _parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m vegans.benchmarks",
+        description="Measure training and inference throughput of vegans models on synthetic data."
+    )
+    parser.add_argument("--models", nargs="+", default=None, help="Models from vegans.GAN. Default: all models.")
+    parser.add_argument(
+        "--architectures", nargs="+", default=["example"], choices=list(ARCHITECTURES),
+        help="Architecture families from vegans.utils.loading.architectures. Default: example."
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=20, help="Number of timed training steps.")
+    parser.add_argument("--generate-batches", type=int, default=10, help="Number of timed batches for generate.")
+    parser.add_argument("--device", choices=["cpu", "cuda"], default=None)
+    parser.add_argument(
+        "--no-isolate", action="store_true",
+        help="Run all benchmarks in this process. Faster, but the cpu peak memory is not reported."
+    )
+    parser.add_argument("--output", default=None, help="Path of the json file the results are written to.")
+    parser.add_argument("--baseline", default=None, help="Json file of an earlier run to compare against.")
+    parser.add_argument(
+        "--tolerance", type=float, default=None,
+        help="Exit with status 1 if a throughput is lower than (1 - tolerance) times the baseline."
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = _parse_args(sys.argv[1:] if args is None else args)
+    results = run_benchmarks(
+        models=args.models, architectures=args.architectures, batch_size=args.batch_size, nr_steps=args.steps,
+        nr_generate=args.generate_batches, device=args.device, isolate=not args.no_isolate
+    )
+    if args.output is not None:
+        save_results(results=results, path=args.output)
+        print("Results saved to {}.".format(args.output))
+
+    if args.baseline is not None:
+        regressions = []
+        print("\nComparison to {}:".format(args.baseline))
+        for row in compare_results(baseline=load_results(args.baseline), current=results):
+            is_regression = args.tolerance is not None and row["ratio"] < 1 - args.tolerance
+            print("{:>28} {:>8} {:>25}: {:10.2f} -> {:10.2f} ({:+.1%}){}".format(
+                row["model"], row["architecture"], row["metric"], row["baseline"], row["current"], row["ratio"] - 1,
+                "  REGRESSION" if is_regression else ""
+            ))
+            if is_regression:
+                regressions.append(row)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
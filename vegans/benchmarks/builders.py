@@ -0,0 +1,181 @@
+import numpy as np
+import vegans
+import vegans.utils.loading.architectures as architectures
+
+
+ARCHITECTURES = {
+    "example": {"x_dim": (32, ), "z_dim": 8, "y_dim": (10, )},
+    "mnist": {"x_dim": (1, 32, 32), "z_dim": 32, "y_dim": (10, )},
+    "celeba": {"x_dim": (3, 64, 64), "z_dim": 128, "y_dim": (40, )},
+}
+
+
+class _NetworkFactory():
+    """ Creates fresh networks from `vegans.utils.loading.architectures` for one architecture family.
+    """
+    def __init__(self, architecture, x_dim, z_dim, y_dim):
+        self.architecture = architecture
+        self.x_dim = x_dim
+        self.z_dim = z_dim
+        self.y_dim = y_dim
+
+    def _load(self, network, **kwargs):
+        loader = getattr(architectures, "load_{}_{}".format(self.architecture, network), None)
+        if loader is None:
+            raise NotImplementedError(
+                "No {} architecture defined for '{}'.".format(network, self.architecture)
+            )
+        return loader(**kwargs)
+
+    def generator(self, y_dim=None):
+        return self._load("generator", x_dim=self.x_dim, z_dim=self.z_dim, y_dim=y_dim)
+
+    def adversary(self, adv_type, x_dim=None, y_dim=None):
+        x_dim = self.x_dim if x_dim is None else x_dim
+        return self._load("adversary", x_dim=x_dim, y_dim=y_dim, adv_type=adv_type)
+
+    def encoder(self, z_dim=None, x_dim=None, y_dim=None):
+        z_dim = self.z_dim if z_dim is None else z_dim
+        x_dim = self.x_dim if x_dim is None else x_dim
+        return self._load("encoder", x_dim=x_dim, z_dim=z_dim, y_dim=y_dim)
+
+    def decoder(self, y_dim=None):
+        return self._load("decoder", x_dim=self.x_dim, z_dim=self.z_dim, y_dim=y_dim)
+
+    def autoencoder(self, y_dim=None):
+        return self._load("autoencoder", x_dim=self.x_dim, y_dim=y_dim)
+
+
+def get_dimensions(model_name, architecture="example"):
+    """ Returns the dimensions used to benchmark `model_name` with `architecture`.
+
+    Parameters
+    ----------
+    model_name : str
+        Name of a model in `vegans.GAN`.
+    architecture : str, optional
+        One of "example", "mnist", "celeba".
+
+    Returns
+    -------
+    tuple
+        x_dim, z_dim, y_dim. y_dim is None for unconditional models. For `ConditionalCycleGAN` the labels
+        are of the same shape as the data (image-to-image translation).
+    """
+    if model_name not in vegans.__all__:
+        raise ValueError("`model_name` must be one of {}. Given: {}.".format(vegans.__all__, model_name))
+    if architecture not in ARCHITECTURES:
+        raise ValueError("`architecture` must be one of {}. Given: {}.".format(list(ARCHITECTURES), architecture))
+    dims = ARCHITECTURES[architecture]
+    x_dim, z_dim, y_dim = dims["x_dim"], dims["z_dim"], dims["y_dim"]
+    if not model_name.startswith("Conditional"):
+        y_dim = None
+    elif model_name == "ConditionalCycleGAN":
+        y_dim = x_dim
+    return x_dim, z_dim, y_dim
+
+
+def build_model(model_name, architecture="example", device=None, **kwargs):
+    """ Construct `model_name` with freshly initialised networks of the given architecture family.
+
+    Mirrors the model specific construction logic of the tutorial snippets.
+
+    Parameters
+    ----------
+    model_name : str
+        Name of a model in `vegans.GAN`.
+    architecture : str, optional
+        One of "example", "mnist", "celeba".
+    device : str, optional
+        "cpu" or "cuda".
+    **kwargs
+        Passed to the model constructor.
+
+    Returns
+    -------
+    AbstractGenerativeModel
+        Model without output folder.
+
+    Raises
+    ------
+    NotImplementedError
+        If the architecture family does not define a network needed by the model, e.g. the autoencoder for CelebA.
+    """
+    x_dim, z_dim, y_dim = get_dimensions(model_name=model_name, architecture=architecture)
+    nets = _NetworkFactory(architecture=architecture, x_dim=x_dim, z_dim=z_dim, y_dim=y_dim)
+    model = getattr(vegans, model_name)
+    kwargs = dict(kwargs, x_dim=x_dim, z_dim=z_dim, device=device, folder=None)
+    if y_dim is not None:
+        kwargs["y_dim"] = y_dim
+    name = model_name.replace("Conditional", "")
+
+    if name == "AAE":
+        adversary = architectures.load_example_adversary(x_dim=z_dim, y_dim=y_dim, adv_type="Discriminator")
+        return model(
+            generator=nets.generator(y_dim=y_dim), adversary=adversary, encoder=nets.encoder(y_dim=y_dim), **kwargs
+        )
+    elif name in ["BicycleGAN", "VAEGAN"]:
+        return model(
+            generator=nets.generator(y_dim=y_dim), adversary=nets.adversary(adv_type="Discriminator", y_dim=y_dim),
+            encoder=nets.encoder(z_dim=2*z_dim, y_dim=y_dim), **kwargs
+        )
+    elif name == "CycleGAN":
+        return model(
+            generatorX_Y=nets.generator(y_dim=y_dim), adversaryX_Y=nets.adversary(adv_type="Discriminator", y_dim=y_dim),
+            generatorY_X=nets.generator(y_dim=y_dim), adversaryY_X=nets.adversary(adv_type="Discriminator", y_dim=y_dim),
+            **kwargs
+        )
+    elif name == "EBGAN":
+        # Synthetic data is uniformly distributed on [0, 1], see `np.mean(X_train)` in the tutorials.
+        return model(generator=nets.generator(y_dim=y_dim), adversary=nets.autoencoder(y_dim=y_dim), m=0.5, **kwargs)
+    elif name == "InfoGAN":
+        if y_dim is None:
+            c_dim_discrete, c_dim_continuous = [10], 0
+            encoder = nets.encoder(z_dim=32)
+        else:
+            c_dim_discrete, c_dim_continuous = [5], 5
+            encoder = nets.encoder(z_dim=32, x_dim=(x_dim[0]+int(np.sum(y_dim)), *x_dim[1:]))
+        c_dim = int(np.sum(c_dim_discrete)) + c_dim_continuous
+        gen_y_dim = c_dim if y_dim is None else int(np.sum(y_dim)) + c_dim
+        return model(
+            generator=nets.generator(y_dim=gen_y_dim), adversary=nets.adversary(adv_type="Discriminator", y_dim=y_dim),
+            encoder=encoder, c_dim_discrete=c_dim_discrete, c_dim_continuous=c_dim_continuous, **kwargs
+        )
+    elif name in ["KLGAN", "LSGAN", "Pix2Pix", "VanillaGAN"]:
+        return model(
+            generator=nets.generator(y_dim=y_dim), adversary=nets.adversary(adv_type="Discriminator", y_dim=y_dim),
+            **kwargs
+        )
+    elif name == "LRGAN":
+        return model(
+            generator=nets.generator(y_dim=y_dim), adversary=nets.adversary(adv_type="Discriminator", y_dim=y_dim),
+            encoder=nets.encoder(y_dim=y_dim), **kwargs
+        )
+    elif name == "VanillaVAE":
+        return model(encoder=nets.encoder(z_dim=2*z_dim, y_dim=y_dim), decoder=nets.decoder(y_dim=y_dim), **kwargs)
+    elif name in ["WassersteinGAN", "WassersteinGANGP"]:
+        return model(
+            generator=nets.generator(y_dim=y_dim), adversary=nets.adversary(adv_type="Critic", y_dim=y_dim), **kwargs
+        )
+    raise NotImplementedError("No benchmark construction defined for {}.".format(model_name))
+
+
+def create_data(model_name, architecture="example", nr_samples=128, seed=0):
+    """ Create synthetic training data for `model_name`.
+
+    Returns
+    -------
+    tuple
+        X, y as float32 arrays uniformly distributed on [0, 1]. y are one-hot labels for conditional models,
+        images for `ConditionalCycleGAN` and None for unconditional models.
+    """
+    x_dim, _, y_dim = get_dimensions(model_name=model_name, architecture=architecture)
+    random = np.random.RandomState(seed)
+    X = random.uniform(size=(nr_samples, *x_dim)).astype(np.float32)
+    if y_dim is None:
+        y = None
+    elif model_name == "ConditionalCycleGAN":
+        y = random.uniform(size=(nr_samples, *y_dim)).astype(np.float32)
+    else:
+        y = np.eye(y_dim[0], dtype=np.float32)[random.randint(0, y_dim[0], size=nr_samples)]
+    return X, y
@@ -0,0 +1,258 @@
+import io
+import os
+import sys
+import json
+import time
+import torch
+import platform
+import contextlib
+import subprocess
+import multiprocessing
+
+import numpy as np
+import vegans
+
+from concurrent.futures import ProcessPoolExecutor
+from vegans.utils.profiling import get_peak_memory
+from vegans.benchmarks.builders import build_model, create_data, ARCHITECTURES
+
+
+def benchmark_model(model_name, architecture="example", batch_size=32, nr_steps=20, nr_generate=10, device=None, seed=0):
+    """ Measure training and inference throughput of one model on synthetic data.
+
+    Training is done through `fit` so the measured steps include everything a user runs. The first training step is
+    measured separately (including construction) and also serves as warm up for the steady state measurement.
+
+    Parameters
+    ----------
+    model_name : str
+        Name of a model in `vegans.GAN`.
+    architecture : str, optional
+        One of "example", "mnist", "celeba".
+    batch_size : int, optional
+        Batch size used for training and generation.
+    nr_steps : int, optional
+        Number of training steps (batches) timed after the first step.
+    nr_generate : int, optional
+        Number of batches timed for `generate`.
+    device : str, optional
+        "cpu" or "cuda". Defaults to "cuda" if available.
+    seed : int, optional
+        Seed for the synthetic data and the network initialisation.
+
+    Returns
+    -------
+    dict
+        Measured metrics. Times are in seconds, memory in megabytes. On the cpu `peak_memory_mb` is the peak
+        resident set size of the whole process, so it only describes this model if it is benchmarked in a fresh
+        process (see `run_benchmarks(isolate=True)`).
+    """
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    torch.manual_seed(seed)
+    X, y = create_data(model_name=model_name, architecture=architecture, nr_samples=4*batch_size, seed=seed)
+    if device == "cuda":
+        torch.cuda.reset_peak_memory_stats()
+
+    start = _now(device)
+    model = build_model(model_name=model_name, architecture=architecture, device=device)
+    construction_time = _now(device) - start
+    _fit(model=model, X=X, y=y, batch_size=batch_size, nr_steps=1)
+    time_to_first_step = _now(device) - start
+
+    start = _now(device)
+    _fit(model=model, X=X, y=y, batch_size=batch_size, nr_steps=nr_steps)
+    training_time = _now(device) - start
+
+    y_generate = None if y is None else y[:batch_size]
+    with torch.no_grad():
+        _generate(model=model, y=y_generate, batch_size=batch_size)
+        start = _now(device)
+        for _ in range(nr_generate):
+            _generate(model=model, y=y_generate, batch_size=batch_size)
+        generation_time = _now(device) - start
+
+    return {
+        "model": model_name,
+        "architecture": architecture,
+        "device": device,
+        "batch_size": batch_size,
+        "nr_params": int(sum(model.get_number_params().values())),
+        "construction_time": construction_time,
+        "time_to_first_step": time_to_first_step,
+        "steps_per_sec": nr_steps / training_time,
+        "train_samples_per_sec": nr_steps * batch_size / training_time,
+        "generate_samples_per_sec": nr_generate * batch_size / generation_time,
+        "peak_memory_mb": get_peak_memory(device=device),
+    }
+
+
+def run_benchmarks(models=None, architectures=("example", ), batch_size=32, nr_steps=20, nr_generate=10,
+    device=None, verbose=True, isolate=True):
+    """ Benchmark several models and architectures.
+
+    Models which can not be built for an architecture (e.g. EBGAN for "celeba", which defines no autoencoder) or
+    which fail during the benchmark are reported with an "error" entry instead of metrics.
+
+    Parameters
+    ----------
+    models : list, optional
+        Names of models in `vegans.GAN`. Defaults to all models.
+    architectures : list, optional
+        Architecture families from `vegans.utils.loading.architectures`.
+    batch_size, nr_steps, nr_generate, device
+        See `benchmark_model`.
+    verbose : bool, optional
+        If True, one line per benchmark is printed.
+    isolate : bool, optional
+        If True, every benchmark runs in a new process. Otherwise the cpu peak memory, which is measured for the
+        whole process, includes all models benchmarked before and is reported as None.
+
+    Returns
+    -------
+    dict
+        {"meta": environment information, "results": list of metric dictionaries}
+    """
+    models = vegans.__all__ if models is None else models
+    results = []
+    for architecture in architectures:
+        for model_name in models:
+            kwargs = {
+                "model_name": model_name, "architecture": architecture, "batch_size": batch_size,
+                "nr_steps": nr_steps, "nr_generate": nr_generate, "device": device
+            }
+            try:
+                if isolate:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                        result = pool.submit(_benchmark_quietly, kwargs).result()
+                else:
+                    result = _benchmark_quietly(kwargs)
+                    if result["device"] == "cpu":
+                        result["peak_memory_mb"] = None
+            except Exception as e:
+                result = {
+                    "model": model_name, "architecture": architecture, "error": "{}: {}".format(type(e).__name__, e)
+                }
+            results.append(result)
+            if verbose:
+                print(_format_result(result))
+                sys.stdout.flush()
+
+    settings = {
+        "models": list(models), "architectures": list(architectures), "batch_size": batch_size, "nr_steps": nr_steps,
+        "nr_generate": nr_generate, "device": device, "isolate": isolate
+    }
+    return {"meta": get_environment(settings=settings), "results": results}
+
+
+def get_environment(settings=None):
+    """ Collect information needed to compare benchmark results across commits and machines.
+    """
+    meta = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "torch": torch.__version__,
+        "numpy": np.__version__,
+        "cuda_device": torch.cuda.get_device_name() if torch.cuda.is_available() else None,
+        "settings": settings,
+    }
+    return meta
+
+
+def save_results(results, path):
+    """ Save the output of `run_benchmarks` as json file.
+    """
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, metrics=("steps_per_sec", "generate_samples_per_sec")):
+    """ Compare two outputs of `run_benchmarks`.
+
+    Parameters
+    ----------
+    baseline, current : dict
+        Outputs of `run_benchmarks` (or loaded json files).
+    metrics : list, optional
+        Throughput metrics to compare. Higher values are considered better.
+
+    Returns
+    -------
+    list
+        One dictionary per (model, architecture, metric) present in both results containing the baseline and
+        current value and their ratio `current / baseline`.
+    """
+    baseline_results = {
+        (result["model"], result["architecture"]): result for result in baseline["results"] if "error" not in result
+    }
+    comparison = []
+    for result in current["results"]:
+        key = (result["model"], result["architecture"])
+        if "error" in result or key not in baseline_results:
+            continue
+        for metric in metrics:
+            before, after = baseline_results[key][metric], result[metric]
+            comparison.append({
+                "model": key[0], "architecture": key[1], "metric": metric,
+                "baseline": before, "current": after, "ratio": after / before
+            })
+    return comparison
+
+
+#########################################################################
+# Helper functions
+#########################################################################
+def _benchmark_quietly(kwargs):
+    # Suppress the training output of `fit`.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return benchmark_model(**kwargs)
+
+
+def _fit(model, X, y, batch_size, nr_steps):
+    fit_kwargs = {
+        "X_train": X, "epochs": 1, "batch_size": batch_size, "samples_per_epoch": nr_steps*batch_size,
+        "print_every": None, "save_model_every": None, "save_images_every": None, "save_losses_every": None,
+        "enable_tensorboard": False
+    }
+    if y is not None:
+        fit_kwargs["y_train"] = y
+    model.fit(**fit_kwargs)
+
+
+def _generate(model, y, batch_size):
+    if y is None:
+        return model.generate(n=batch_size)
+    return model.generate(y=y)
+
+
+def _now(device):
+    if device == "cuda":
+        torch.cuda.synchronize()
+    return time.perf_counter()
+
+
+def _get_commit():
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        )
+        return commit.decode().strip()
+    except Exception:
+        return None
+
+
+def _format_result(result):
+    if "error" in result:
+        return "{:>28} {:>8}   {}".format(result["model"], result["architecture"], result["error"])
+    return "{:>28} {:>8}   {:9.2f} steps/s {:11.1f} samples/s (generate) {:7.2f} s to first step {:9.1f} MB".format(
+        result["model"], result["architecture"], result["steps_per_sec"], result["generate_samples_per_sec"],
+        result["time_to_first_step"], result["peak_memory_mb"] or float("nan")
+    )
@@ -0,0 +1,393 @@
+""" Sample quality metrics: Frechet distance (FID) and kernel distance (KID) between generated and real samples.
+
+Both sides are streamed in chunks through a feature extractor. Only the running sums of the features (for the mean
+and covariance) and a bounded bank of features (for the KID) are kept in memory. The statistics of the reference
+data are computed once and can be cached on disk, keyed by the name of the dataset, a fingerprint of the
+feature extractor and a fingerprint of the data (its length, sample shape and first batch).
+
+The bundled extractor (`SmallConvFeatures`) is a small convolutional network with fixed random weights. It needs
+no download, but its scores are only comparable with each other, not with published Inception scores. Pass a
+pretrained network as `feature_extractor` for those.
+
+Example
+-------
+>>> evaluator = Evaluator(reference=X_train, name="celeba", cache_dir="./fid_cache")
+>>> evaluator.evaluate(model, nr_samples=10000)
+{'FID': ..., 'KID': ...}
+>>> model.fit(X_train, callbacks=[EvaluateModel(evaluator=evaluator, every=5000)])
+"""
+import os
+import hashlib
+import torch
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from torch.utils.data import DataLoader, Dataset
+from vegans.utils.callbacks import PeriodicCallback
+from vegans.utils.latent import generate_in_batches, inference_mode
+from vegans.utils.processing import ArrayDataSet
+
+
+class SmallConvFeatures(torch.nn.Module):
+    """ Small convolutional feature extractor with fixed random weights (drawn from `seed`).
+
+    Images are mapped to `nr_features` features by three strided convolutions and global average pooling.
+    Flat samples ([n, features]) are returned flattened as they are.
+
+    Parameters
+    ----------
+    in_channels : int
+        Number of image channels.
+    nr_features : int, optional
+        Number of output features.
+    seed : int, optional
+        Seed of the weights. Extractors with the same arguments are identical.
+    """
+    def __init__(self, in_channels, nr_features=128, seed=0):
+        super().__init__()
+        self.in_channels = in_channels
+        self.nr_features = nr_features
+        self.seed = seed
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(seed)
+            self.network = torch.nn.Sequential(
+                torch.nn.Conv2d(in_channels, 32, kernel_size=3, stride=2, padding=1),
+                torch.nn.LeakyReLU(0.2),
+                torch.nn.Conv2d(32, 64, kernel_size=3, stride=2, padding=1),
+                torch.nn.LeakyReLU(0.2),
+                torch.nn.Conv2d(64, nr_features, kernel_size=3, stride=2, padding=1),
+                torch.nn.AdaptiveAvgPool2d(1),
+                torch.nn.Flatten()
+            )
+        self.requires_grad_(False)
+        self.eval()
+
+    def forward(self, x):
+        if x.dim() != 4:
+            return torch.flatten(x, start_dim=1)
+        return self.network(x)
+
+    def __repr__(self):
+        return "SmallConvFeatures(in_channels={}, nr_features={}, seed={})".format(
+            self.in_channels, self.nr_features, self.seed
+        )
+
+
+class FeatureStatistics():
+    """ Streaming mean and covariance of features and a bank of the first `bank_size` features for the KID.
+
+    The sums are accumulated in float64, so many chunks can be added without loss of precision.
+    """
+    def __init__(self, bank_size=10000):
+        self.bank_size = bank_size
+        self.nr_samples = 0
+        self._sum = None
+        self._sum_outer = None
+        self._bank = []
+        self._bank_count = 0
+
+    def update(self, features):
+        features = features.detach().double()
+        if self._sum is None:
+            self._sum = torch.zeros(features.shape[1], dtype=torch.float64, device=features.device)
+            self._sum_outer = torch.zeros(features.shape[1], features.shape[1], dtype=torch.float64, device=features.device)
+        self._sum += features.sum(dim=0)
+        self._sum_outer += features.T @ features
+        self.nr_samples += len(features)
+        if self._bank_count < self.bank_size:
+            keep = features[:self.bank_size - self._bank_count].float().cpu()
+            self._bank.append(keep)
+            self._bank_count += len(keep)
+
+    @property
+    def mean(self):
+        return (self._sum / self.nr_samples).cpu()
+
+    @property
+    def covariance(self):
+        mean = self._sum / self.nr_samples
+        covariance = (self._sum_outer - self.nr_samples*torch.outer(mean, mean)) / (self.nr_samples - 1)
+        return covariance.cpu()
+
+    @property
+    def bank(self):
+        return torch.cat(self._bank, dim=0)
+
+    def state(self):
+        """ Dictionary with everything needed to compute the metrics. Used for the disk cache.
+        """
+        return {"mean": self.mean, "covariance": self.covariance, "bank": self.bank, "nr_samples": self.nr_samples}
+
+
+#########################################################################
+# Metrics
+#########################################################################
+def _sqrt_psd(matrix):
+    eigenvalues, eigenvectors = torch.linalg.eigh(matrix)
+    return (eigenvectors * eigenvalues.clamp(min=0).sqrt()) @ eigenvectors.T
+
+
+def frechet_distance(mean1, covariance1, mean2, covariance2):
+    """ Frechet distance between two gaussians, i.e. the FID for the statistics of real and generated features.
+
+    The trace of the matrix square root is computed from the eigenvalues of the symmetric matrix
+    sqrt(C1) C2 sqrt(C1), so no scipy is needed.
+    """
+    mean1, mean2 = mean1.double(), mean2.double()
+    covariance1, covariance2 = covariance1.double(), covariance2.double()
+    sqrt_covariance1 = _sqrt_psd(covariance1)
+    product = sqrt_covariance1 @ covariance2 @ sqrt_covariance1
+    trace_sqrt = torch.linalg.eigvalsh((product + product.T) / 2).clamp(min=0).sqrt().sum()
+    distance = torch.sum((mean1 - mean2)**2) + torch.trace(covariance1) + torch.trace(covariance2) - 2*trace_sqrt
+    return distance.item()
+
+
+def kernel_distance(features1, features2, nr_subsets=10, subset_size=1000, seed=0):
+    """ Kernel distance (KID): unbiased MMD estimate with the polynomial kernel (x.y / d + 1)**3, averaged over
+    `nr_subsets` random subsets of at most `subset_size` samples of both feature banks.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    features1, features2 = features1.double(), features2.double()
+    nr_features = features1.shape[1]
+    subset_size = min(subset_size, len(features1), len(features2))
+    estimates = []
+    for _ in range(nr_subsets):
+        x = features1[torch.randperm(len(features1), generator=generator)[:subset_size]]
+        y = features2[torch.randperm(len(features2), generator=generator)[:subset_size]]
+        k_xx = (x @ x.T / nr_features + 1)**3
+        k_yy = (y @ y.T / nr_features + 1)**3
+        k_xy = (x @ y.T / nr_features + 1)**3
+        m = subset_size
+        mmd = (
+            (k_xx.sum() - k_xx.diagonal().sum()) / (m*(m - 1)) + (k_yy.sum() - k_yy.diagonal().sum()) / (m*(m - 1))
+            - 2*k_xy.mean()
+        )
+        estimates.append(mmd.item())
+    return float(np.mean(estimates))
+
+
+#########################################################################
+# Evaluator
+#########################################################################
+class Evaluator():
+    """ Computes the FID and KID of a model against reference data.
+
+    Parameters
+    ----------
+    reference : np.array, torch.utils.data.Dataset or torch.utils.data.DataLoader
+        Real samples. Array-like objects are read in slices (see `utils.ArrayDataSet`). Batches of (X, y) tuples
+        are supported, only X is used.
+    feature_extractor : torch.nn.Module, optional
+        Maps a batch of samples to a batch of feature vectors. By default a `SmallConvFeatures` network is used
+        for images and the flattened samples otherwise.
+    name : str, optional
+        Name of the reference dataset. Together with `cache_dir` the reference statistics are cached on disk as
+        `{cache_dir}/{name}_{fingerprint}_{data fingerprint}.torch` where the fingerprints identify the feature
+        extractor and the reference data (see `data_fingerprint`).
+    cache_dir : str, optional
+        Folder of the disk cache.
+    batch_size : int, optional
+        Number of samples per chunk on both sides.
+    nr_reference : int, optional
+        Use only the first `nr_reference` real samples. By default all are used.
+    bank_size : int, optional
+        Maximum number of features kept for the KID on both sides.
+    device : str, optional
+        Device of the feature extraction.
+    """
+    def __init__(self, reference, feature_extractor=None, name=None, cache_dir=None, batch_size=256,
+            nr_reference=None, bank_size=10000, device="cpu"):
+        assert (name is None) == (cache_dir is None), "`name` and `cache_dir` must be given together for the disk cache."
+        self.reference = reference
+        self.feature_extractor = feature_extractor
+        self.name = name
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.nr_reference = nr_reference
+        self.bank_size = bank_size
+        self.device = device
+        self._reference_state = None
+
+    def _batches(self, data):
+        if isinstance(data, DataLoader):
+            loader = data
+        elif isinstance(data, Dataset):
+            loader = DataLoader(data, batch_size=self.batch_size)
+        else:
+            loader = DataLoader(ArrayDataSet(X=data, batch_size=self.batch_size), batch_size=None)
+        for batch in loader:
+            yield batch[0] if isinstance(batch, (list, tuple)) else batch
+
+    def _get_extractor(self, sample):
+        if self.feature_extractor is None:
+            channels = sample.shape[1] if sample.dim() == 4 else 1
+            self.feature_extractor = SmallConvFeatures(in_channels=channels)
+        return self.feature_extractor.to(self.device)
+
+    def fingerprint(self):
+        """ Hash of the architecture and the weights of the feature extractor and of the reference settings.
+        """
+        digest = hashlib.sha1(repr(self.feature_extractor).encode())
+        for name, tensor in self.feature_extractor.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().numpy().tobytes())
+        digest.update("{}_{}".format(self.nr_reference, self.bank_size).encode())
+        return digest.hexdigest()[:16]
+
+    def data_fingerprint(self, first_batch):
+        """ Hash of the number of reference samples, the sample shape and the content of the first batch. Changed
+        or subsetted reference data therefore does not reuse statistics cached under the same name.
+        """
+        reference = self.reference.dataset if isinstance(self.reference, DataLoader) else self.reference
+        try:
+            nr_samples = len(reference)
+        except TypeError:
+            nr_samples = None
+        first_batch = torch.as_tensor(first_batch).detach().cpu().float()
+        digest = hashlib.sha1("{}_{}".format(nr_samples, tuple(first_batch.shape[1:])).encode())
+        digest.update(first_batch.contiguous().numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+    def _features(self, X_batch):
+        X_batch = torch.as_tensor(X_batch).float().to(self.device)
+        extractor = self._get_extractor(sample=X_batch)
+        with inference_mode():
+            return extractor(X_batch)
+
+    def _cache_path(self, first_batch):
+        return os.path.join(
+            self.cache_dir, "{}_{}_{}.torch".format(self.name, self.fingerprint(), self.data_fingerprint(first_batch))
+        )
+
+    def reference_statistics(self):
+        """ Statistics of the reference data. Computed once, then taken from memory or the disk cache.
+        """
+        if self._reference_state is not None:
+            return self._reference_state
+        batches = self._batches(self.reference)
+        first_batch = next(batches)
+        features = self._features(first_batch)
+        if self.cache_dir is not None:
+            cache_path = self._cache_path(first_batch=first_batch)
+            if os.path.exists(cache_path):
+                self._reference_state = torch.load(cache_path)
+                return self._reference_state
+
+        statistics = FeatureStatistics(bank_size=self.bank_size)
+        statistics.update(features[:self.nr_reference])
+        for X_batch in batches:
+            if self.nr_reference is not None and statistics.nr_samples >= self.nr_reference:
+                break
+            features = self._features(X_batch)
+            if self.nr_reference is not None:
+                features = features[:self.nr_reference - statistics.nr_samples]
+            statistics.update(features)
+        self._reference_state = statistics.state()
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            torch.save(self._reference_state, cache_path)
+        return self._reference_state
+
+    def generate_samples(self, model, nr_samples=10000, y=None):
+        """ Yields `nr_samples` generated samples in chunks of `batch_size` (see `utils.latent.generate_in_batches`).
+
+        Parameters
+        ----------
+        model : AbstractGenerativeModel
+            Trained model.
+        nr_samples : int, optional
+            Number of generated samples.
+        y : np.array or torch.Tensor, optional
+            Labels of the generated samples. Required for conditional models.
+        """
+        assert not model._conditional or (y is not None and len(y) >= nr_samples), (
+            "Conditional models need at least `nr_samples` labels `y`."
+        )
+        for start in range(0, nr_samples, self.batch_size):
+            n = min(self.batch_size, nr_samples - start)
+            inputs = {"z": model.sample(n=n)}
+            if y is not None:
+                inputs["y"] = y[start:start+n]
+            yield generate_in_batches(model, batch_size=self.batch_size, **inputs)
+
+    def score(self, samples):
+        """ FID and KID of the generated `samples` (iterable of batches) against the reference statistics.
+        """
+        reference = self.reference_statistics()
+        statistics = FeatureStatistics(bank_size=self.bank_size)
+        for X_batch in samples:
+            statistics.update(self._features(X_batch))
+        return {
+            "FID": frechet_distance(reference["mean"], reference["covariance"], statistics.mean, statistics.covariance),
+            "KID": kernel_distance(reference["bank"], statistics.bank)
+        }
+
+    def evaluate(self, model, nr_samples=10000, y=None):
+        """ FID and KID of `nr_samples` samples of `model`. Samples are streamed, so memory stays bounded.
+
+        Returns
+        -------
+        dict
+            {"FID": float, "KID": float}
+        """
+        return self.score(samples=self.generate_samples(model=model, nr_samples=nr_samples, y=y))
+
+
+class EvaluateModel(PeriodicCallback):
+    """ Evaluates the FID and KID every `every` steps during `fit` in the background.
+
+    The samples are generated synchronously (the weights change with the next step), then the feature extraction
+    and the metrics are computed in a background thread while training continues. Finished results are appended to
+    `self.history` as (step, {"FID": ..., "KID": ...}), printed and written to tensorboard if enabled. The reference
+    statistics are prepared in the background at the start of training.
+
+    Parameters
+    ----------
+    evaluator : Evaluator
+        Evaluator holding the reference data.
+    every : int
+        Number of steps between evaluations.
+    nr_samples : int, optional
+        Number of generated samples per evaluation. They are kept on the cpu until they are scored.
+    y : np.array or torch.Tensor, optional
+        Labels of the generated samples for conditional models.
+    """
+    phase = "evaluation"
+
+    def __init__(self, evaluator, every, nr_samples=5000, y=None):
+        super().__init__(every=every)
+        self.evaluator = evaluator
+        self.nr_samples = nr_samples
+        self.y = y
+        self.history = []
+        self._executor = None
+        self._pending = []
+
+    def on_train_begin(self, model, state):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._executor.submit(self.evaluator.reference_statistics)
+
+    def run(self, model, state):
+        samples = list(self.evaluator.generate_samples(model=model, nr_samples=self.nr_samples, y=self.y))
+        self._pending.append((state.step, self._executor.submit(self.evaluator.score, samples)))
+
+    def on_batch_end(self, model, state):
+        super().on_batch_end(model=model, state=state)
+        self._collect(state=state, wait=False)
+
+    def on_train_end(self, model, state):
+        self._collect(state=state, wait=True)
+        self._executor.shutdown()
+        self._executor = None
+
+    def _collect(self, state, wait):
+        while self._pending and (wait or self._pending[0][1].done()):
+            step, future = self._pending.pop(0)
+            metrics = future.result()
+            self.history.append((step, metrics))
+            print("Step {}: FID={:.4f}, KID={:.6f}".format(step, metrics["FID"], metrics["KID"]))
+            writer = state.writer_test if state.writer_test is not None else state.writer_train
+            if writer is not None:
+                for key, value in metrics.items():
+                    writer.add_scalar("Evaluation/" + key, value, step)
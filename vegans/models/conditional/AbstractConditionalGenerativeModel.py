@@ -2,11 +2,9 @@ import os
 import torch
 
 import numpy as np
-import matplotlib.pyplot as plt
 import vegans.utils as utils
 
 from torch.nn import MSELoss
-from torchvision.utils import make_grid
 from vegans.utils import get_input_dim
 from vegans.utils.networks import NeuralNetwork
 from vegans.models.unconditional.AbstractGenerativeModel import AbstractGenerativeModel
@@ -48,11 +46,14 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
         tensorboard output are written there. Existing folders are never overwritten or deleted. If a folder with the same name
         already exists a time stamp is appended to make it unique.
     """
+    _conditional = True
+    _cached_per_batch = ("_real_concat_cache", )
 
     #########################################################################
     # Actions before training
     #########################################################################
     def __init__(self, x_dim, z_dim, y_dim, optim, optim_kwargs, feature_layer, fixed_noise_size, device, ngpu, folder, secure):
+        self._real_concat_cache = None
         self.adv_in_dim = get_input_dim(dim1=x_dim, dim2=y_dim)
         self.gen_in_dim = get_input_dim(dim1=z_dim, dim2=y_dim)
         AbstractGenerativeModel.__init__(
@@ -64,7 +65,7 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
         self.eval()
 
     def _set_up_training(self, X_train, y_train, X_test, y_test, epochs, batch_size, steps,
-        print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard):
+        print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard, samples_per_epoch=None):
         """ Create the dataloaders, SummaryWriters for tensorboard and transform the saving indicators.
 
         This function creates all data needed during training like the data loaders and save steps.
@@ -72,15 +73,15 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
         """
         train_dataloader, test_dataloader, writer_train, writer_test, save_periods = super()._set_up_training(
             X_train, y_train, X_test, y_test, epochs, batch_size, steps,
-            print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard
+            print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard, samples_per_epoch
         )
-        iter_dataloader = iter(train_dataloader)
-        _, y_train = iter_dataloader.next()
-        while y_train.shape[0] < self.fixed_noise_size:
-            _, y_train2 = iter_dataloader.next()
-            y_train = torch.cat((y_train, y_train2), axis=0)
-        self.fixed_labels = y_train[:self.fixed_noise_size].cpu().numpy()
-        self.fixed_labels = torch.from_numpy(self.fixed_labels).to(self.device)
+        fixed_labels = []
+        nr_labels = 0
+        while nr_labels < self.fixed_noise_size:
+            _, y_batch = train_dataloader.peek(index=len(fixed_labels))
+            fixed_labels.append(y_batch)
+            nr_labels += y_batch.shape[0]
+        self.fixed_labels = self._prepare_labels(torch.cat(fixed_labels, axis=0)[:self.fixed_noise_size])
         return train_dataloader, test_dataloader, writer_train, writer_test, save_periods
 
     def _assert_shapes(self, X_train, y_train, X_test, y_test):
@@ -104,10 +105,15 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
         assert X_train.shape[0] == y_train.shape[0], (
             "Same number if X_train and y_train needed.Given: {} and {}.".format(X_train.shape[0], y_train.shape[0])
         )
-        assert len(y_train.shape) == 2 or len(y_train.shape) == 4, (
-            "y_train must be either have 2 or 4 shape dimensions. Given: {}.".format(y_train.shape) +
+        assert len(y_train.shape) in [1, 2, 4], (
+            "y_train must be either have 1 (integer class labels), 2 or 4 shape dimensions. Given: {}.".format(y_train.shape) +
             "Try to use y_train.reshape(-1, 1) or y_train.reshape(-1, 1, height, width)."
         )
+        if len(y_train.shape) == 1:
+            assert not torch.is_floating_point(torch.as_tensor(y_train[:1])) and len(self.y_dim) == 1, (
+                "One dimensional y_train must contain integer class labels and y_dim must be the number of classes. " +
+                "Given: {} with y_dim={}.".format(y_train.dtype, self.y_dim)
+            )
         assert y_train.shape[2:] == self.y_dim[1:], (
             "Wrong input shape for y_train. Given: {}. Needed: {}.".format(y_train.shape, self.y_dim)
         )
@@ -209,15 +215,18 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
     # Actions during training
     #########################################################################
     def fit(self, X_train, y_train, X_test=None, y_test=None, epochs=5, batch_size=32, steps=None,
-            print_every="1e", save_model_every=None, save_images_every=None, save_losses_every="1e", enable_tensorboard=False):
+            print_every="1e", save_model_every=None, save_images_every=None, save_losses_every="1e", enable_tensorboard=False,
+            samples_per_epoch=None, profile=False, callbacks=None, concurrent=False):
         """ Trains the model, iterating over all contained networks.
 
         Parameters
         ----------
-        X_train : np.array
-            Training data for the generative adversarial network. Usually images.
+        X_train : np.array, np.memmap, torch.utils.data.Dataset or torch.utils.data.DataLoader
+            Training data for the generative adversarial network. Usually images. Array-like objects are read batch-wise
+            in contiguous slices, so memory-mapped arrays larger than the available memory can be used.
         y_train: np.array
             Training labels for the generative adversarial network. Might be images or one-hot encoded vector.
+            Must be None if `X_train` is a Dataset or DataLoader returning (X, y) tuples.
         X_test : np.array, optional
             Testing data for the generative adversarial network. Must have same shape as X_train.
         y_train: np.array
@@ -244,85 +253,49 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
             of the form "0.25e" (4 times per epoch), "1e" (once per epoch) or "3e" (every third epoch).
         enable_tensorboard : bool, optional
             Flag to indicate whether subdirectory folder/tensorboard should be created to log losses and images.
+        samples_per_epoch : int, optional
+            Number of training samples defining one epoch. Must be given if the length of `X_train` can not be
+            determined, e.g. for iterable datasets. Defaults to one pass over `X_train`.
+        profile : bool or utils.profiling.PhaseProfiler, optional
+            If True, the time spent in every phase of the training loop (data loading, device copy, loss calculation,
+            backward pass and optimizer step per network, logging, images, checkpoints) is recorded in `self.profiler`
+            and a summary table is printed after training. With `enable_tensorboard` the mean times are also logged.
+            Pass a `PhaseProfiler` to configure synchronisation or to record a `torch.profiler` trace.
+        callbacks : list, optional
+            Instances of `utils.callbacks.Callback` called during training in addition to the built-in callbacks
+            for printing, saving and logging, e.g. to ship metrics or to stop the training early.
+        concurrent : bool, optional
+            If True, networks which are independent of each other (e.g. the two adversaries of the CycleGAN) are
+            updated concurrently in separate threads and, on cuda, separate streams. Has no effect for models without
+            independent networks.
         """
-        train_dataloader, test_dataloader, writer_train, writer_test, save_periods = self._set_up_training(
-            X_train, y_train, X_test=X_test, y_test=y_test, epochs=epochs, batch_size=batch_size, steps=steps,
-            print_every=print_every, save_model_every=save_model_every, save_images_every=save_images_every,
-            save_losses_every=save_losses_every, enable_tensorboard=enable_tensorboard
+        self._fit(
+            X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, epochs=epochs, batch_size=batch_size,
+            steps=steps, print_every=print_every, save_model_every=save_model_every,
+            save_images_every=save_images_every, save_losses_every=save_losses_every,
+            enable_tensorboard=enable_tensorboard, samples_per_epoch=samples_per_epoch, profile=profile,
+            callbacks=callbacks, concurrent=concurrent
         )
-        max_batches = len(train_dataloader)
-        test_x_batch = next(iter(test_dataloader))[0].to(self.device) if X_test is not None else None
-        test_y_batch = next(iter(test_dataloader))[1].to(self.device) if X_test is not None else None
-        print_every, save_model_every, save_images_every, save_losses_every = save_periods
-
-        self.train()
-        if save_images_every is not None:
-            self._log_images(
-                images=self.generate(y=self.fixed_labels, z=self.fixed_noise),
-                step=0, writer=writer_train
-            )
-
-        for epoch in range(epochs):
-            print("---"*20)
-            print("EPOCH:", epoch+1)
-            print("---"*20)
-            for batch, (X, y) in enumerate(train_dataloader):
-                batch += 1
-                step = epoch*max_batches + batch
-                X = X.to(self.device).float()
-                y = y.to(self.device).float()
-                Z = self.sample(n=len(X))
-                for name, _ in self.neural_nets.items():
-                    for _ in range(self.steps[name]):
-                        self._losses = self.calculate_losses(X_batch=X, Z_batch=Z, y_batch=y, who=name)
-                        self._zero_grad(who=name)
-                        self._backward(who=name)
-                        self._step(who=name)
-
-                if print_every is not None and step % print_every == 0:
-                    self._losses = self.calculate_losses(X_batch=X, Z_batch=Z, y_batch=y)
-                    self._summarise_batch(
-                        batch=batch, max_batches=max_batches, epoch=epoch,
-                        max_epochs=epochs, print_every=print_every
-                    )
-
-                if save_model_every is not None and step % save_model_every == 0:
-                    self.save(name="models/model_{}.torch".format(step))
-
-                if save_images_every is not None and step % save_images_every == 0:
-                    self._log_images(
-                        images=self.generate(y=self.fixed_labels, z=self.fixed_noise),
-                        step=step, writer=writer_train
-                    )
-                    self._save_losses_plot()
-
-                if save_losses_every is not None and step % save_losses_every == 0:
-                    self._log_losses(X_batch=X, Z_batch=Z, y_batch=y, mode="Train")
-                    if enable_tensorboard:
-                        self._log_scalars(step=step, writer=writer_train)
-                    if test_x_batch is not None:
-                        self._log_losses(
-                            X_batch=test_x_batch, Z_batch=self.sample(n=len(test_x_batch)),
-                            y_batch=test_y_batch, mode="Test"
-                        )
-                        if enable_tensorboard:
-                            self._log_scalars(step=step, writer=writer_test)
-
-        self.eval()
-        self._clean_up(writers=[writer_train, writer_test])
 
 
     #########################################################################
     # Logging during training
     #########################################################################
+    def _generate_fixed_images(self):
+        return self.generate(y=self.fixed_labels, z=self.fixed_noise)
+
     def _log_images(self, images, step, writer):
         if self.images_produced:
-            labels = [torch.argmax(lbl, axis=0).item() for lbl in self.fixed_labels]
+            if self._is_class_label(self.fixed_labels):
+                labels = self.fixed_labels.tolist()
+            else:
+                labels = torch.argmax(self.fixed_labels, axis=1).tolist()
             super()._log_images(images=images, step=step, writer=writer, labels=labels)
 
-    def _log_losses(self, X_batch, Z_batch, y_batch, mode):
-        self._losses = self.calculate_losses(X_batch=X_batch, Z_batch=Z_batch, y_batch=y_batch)
-        self._append_losses(mode=mode)
+    def _log_losses(self, X_batch, Z_batch, y_batch, mode, step=None):
+        with self._logging_losses():
+            self._losses = self.calculate_losses(X_batch=X_batch, Z_batch=Z_batch, y_batch=y_batch)
+        self._append_losses(mode=mode, step=step)
 
 
     #########################################################################
@@ -360,7 +333,8 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
     def concatenate(self, tensor1, tensor2):
         """ Concatenates two tensors appropriately depending on their shape.
 
-        Tensor1 and Tensor2 can either have 2 or 4 dimensions.
+        Tensor1 and Tensor2 can either have 2 or 4 dimensions. Integer class labels of shape [batch_size] are
+        first mapped to their one-hot vectors by an embedding lookup on the device (see `_embed_labels`).
 
         Parameters
         ----------
@@ -374,8 +348,46 @@ class AbstractConditionalGenerativeModel(AbstractGenerativeModel):
         torch.Tensor
             Concatenated tensor.
         """
+        if self._is_class_label(tensor1):
+            tensor1 = self._embed_labels(tensor1)
+        if self._is_class_label(tensor2):
+            tensor2 = self._embed_labels(tensor2)
         return utils.concatenate(tensor1=tensor1, tensor2=tensor2)
 
+    @staticmethod
+    def _is_class_label(tensor):
+        return tensor.dim() == 1 and not torch.is_floating_point(tensor)
+
+    def _embed_labels(self, labels):
+        """ Maps integer class labels to one-hot vectors with an embedding lookup in an identity table, so that the
+        networks receive the same input as for one-hot encoded labels.
+        """
+        table = getattr(self, "_label_table", None)
+        if table is None or table.device != labels.device:
+            table = self._label_table = torch.eye(self.y_dim[0], device=labels.device)
+        return torch.nn.functional.embedding(labels, table)
+
+    def _prepare_labels(self, y):
+        """ Moves the labels to the device. Integer class labels are kept as torch.long, all others are cast to float.
+        """
+        y = y.to(self.device)
+        return y.long() if self._is_class_label(y) else y.float()
+
+    def _concatenate_real(self, X_batch, y_batch):
+        """ Real samples concatenated with their labels.
+
+        Within one batch the losses of every network and the logged losses are calculated with the same `X_batch`
+        and `y_batch` tensors, so the concatenation is computed once and reused as long as the same tensor objects
+        are passed. Tensors requiring gradients are never cached.
+        """
+        cache = getattr(self, "_real_concat_cache", None)
+        if cache is not None and cache[0] is X_batch and cache[1] is y_batch:
+            return cache[2]
+        real_concat = self.concatenate(X_batch, y_batch)
+        if not (X_batch.requires_grad or y_batch.requires_grad):
+            self._real_concat_cache = (X_batch, y_batch, real_concat)
+        return real_concat
+
     def generate(self, y=None, z=None):
         """ Generate output with generator.
 
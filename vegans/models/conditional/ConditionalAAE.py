@@ -163,7 +163,7 @@ class ConditionalAAE(AbstractConditionalGenerativeModel, AAE):
         encoded_output = self.encode(x=X_batch, y=y_batch).detach()
         fake_images = self.generate(y=y_batch, z=encoded_output)
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return AAE._calculate_generator_loss(self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat)
 
     def _calculate_encoder_loss(self, X_batch, Z_batch, y_batch):
@@ -29,6 +29,7 @@ from torch.nn import BCELoss, L1Loss
 
 from vegans.utils import get_input_dim
 from vegans.utils import WassersteinLoss
+from vegans.utils.twins import twins_supported, check_twins, stack_twins, twin_forward
 from vegans.utils.networks import Generator, Adversary, Autoencoder
 from vegans.models.conditional.AbstractConditionalGenerativeModel import AbstractConditionalGenerativeModel
 
@@ -74,6 +75,8 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
         tensorboard output are written there. Existing folders are never overwritten or deleted. If a folder with the same name
         already exists a time stamp is appended to make it unique.
     """
+    # Both adversaries only see detached fakes of the generators.
+    _independent_networks = [("AdversaryX_Y", "AdversaryY_X")]
 
     #########################################################################
     # Actions before training
@@ -126,6 +129,7 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
 
         self.lambda_x = lambda_x
         self.hyperparameters["lambda_x"] = lambda_x
+        self.twin_networks = False
 
         if self.secure:
             assert (self.generatorX_Y.output_size == self.x_dim), (
@@ -135,6 +139,24 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
                 "GeneratorY_X output shape must be equal to x_dim. {} vs. {}.".format(self.generatorY_X.output_size, self.x_dim)
             )
 
+    def enable_twin_networks(self):
+        """ Run both generators (and both adversaries in the generator loss) in one vectorized forward pass.
+
+        The two directions of the cycle are independent within one pass, so their parameters are stacked and
+        every layer runs one batched kernel for both (see `utils.twins.twin_forward`). This halves the kernel
+        launches and per-layer overheads, which dominate for small networks. Both networks of a pair must have the
+        same architecture and no buffers (e.g. no batch normalization). The networks themselves are unchanged,
+        so `generate(who=...)`, `save` and `load` work as before. Requires torch >= 2.0.
+        """
+        if not twins_supported():
+            raise NotImplementedError(
+                "Twin networks require `torch.func` (torch >= 2.0). Installed: torch {}.".format(torch.__version__)
+            )
+        check_twins(self.generatorX_Y, self.generatorY_X)
+        check_twins(self.adversaryX_Y, self.adversaryY_X)
+        self.twin_networks = True
+        self.hyperparameters["twin_networks"] = True
+
     def _define_loss(self):
         if self.adv_type == "Discriminator":
             loss_functions = {"Reconstruction": MSELoss(), "Adversary": MSELoss()}
@@ -215,14 +237,28 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
         return losses
 
     def _calculate_generator_loss(self, X_batch, Z_batch, y_batch):
-        fake_imagesX_Y = self.generate(z=Z_batch, y=X_batch, who="GeneratorX_Y")
-        fake_imagesY_X = self.generate(z=Z_batch, y=y_batch, who="GeneratorY_X")
+        if getattr(self, "twin_networks", False):
+            # The parameters are stacked once per loss calculation, i.e. once per optimizer step.
+            generator_params = stack_twins(self.generatorX_Y, self.generatorY_X)
+            fake_imagesX_Y, fake_imagesY_X = self._twin_generate(
+                Z_batch=Z_batch, yX_Y=X_batch, yY_X=y_batch, params=generator_params
+            )
+            reconstructedY_X_Y, reconstructedX_Y_X = self._twin_generate(
+                Z_batch=Z_batch, yX_Y=fake_imagesY_X, yY_X=fake_imagesX_Y, params=generator_params
+            )
+            fake_predictionsX_Y, fake_predictionsY_X = twin_forward(
+                self.adversaryX_Y, self.adversaryY_X,
+                self.concatenate(fake_imagesX_Y, X_batch).float(), self.concatenate(fake_imagesY_X, X_batch).float()
+            )
+        else:
+            fake_imagesX_Y = self.generate(z=Z_batch, y=X_batch, who="GeneratorX_Y")
+            fake_imagesY_X = self.generate(z=Z_batch, y=y_batch, who="GeneratorY_X")
 
-        reconstructedX_Y_X = self.generate(z=Z_batch, y=fake_imagesX_Y, who="GeneratorY_X")
-        reconstructedY_X_Y = self.generate(z=Z_batch, y=fake_imagesY_X, who="GeneratorX_Y")
+            reconstructedX_Y_X = self.generate(z=Z_batch, y=fake_imagesX_Y, who="GeneratorY_X")
+            reconstructedY_X_Y = self.generate(z=Z_batch, y=fake_imagesY_X, who="GeneratorX_Y")
 
-        fake_predictionsX_Y = self.predict(x=fake_imagesX_Y, y=X_batch, who="AdversaryX_Y")
-        fake_predictionsY_X = self.predict(x=fake_imagesY_X, y=X_batch, who="AdversaryY_X")
+            fake_predictionsX_Y = self.predict(x=fake_imagesX_Y, y=X_batch, who="AdversaryX_Y")
+            fake_predictionsY_X = self.predict(x=fake_imagesY_X, y=X_batch, who="AdversaryY_X")
 
         gen_loss_fakeX_Y = self.loss_functions["Adversary"](
             fake_predictionsX_Y, torch.ones_like(fake_predictionsX_Y, requires_grad=False)
@@ -246,6 +282,15 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
             "ReconstructionY_X_Y": self.lambda_x*gen_loss_reconstructionY_X_Y,
         }
 
+    def _twin_generate(self, Z_batch, yX_Y, yY_X, params=None):
+        """ Outputs of GeneratorX_Y for the condition `yX_Y` and of GeneratorY_X for `yY_X` in one forward pass.
+        `params` are the stacked generator parameters (see `utils.twins.stack_twins`).
+        """
+        return twin_forward(
+            self.generatorX_Y, self.generatorY_X,
+            self.concatenate(Z_batch, yX_Y).float(), self.concatenate(Z_batch, yY_X).float(), params=params
+        )
+
     def _calculate_adversaryX_Y_loss(self, X_batch, Z_batch, y_batch):
         fake_imagesX_Y = self.generate(z=Z_batch, y=X_batch, who="GeneratorX_Y").detach()
         fake_predictionsX_Y = self.predict(x=fake_imagesX_Y, y=X_batch, who="AdversaryX_Y")
@@ -287,6 +332,7 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
         }
 
     def _step(self, who=None):
+        self._wait_for_ema(who=who)
         if who is not None:
             self.optimizers[who].step()
             if who == "Adversary":
@@ -294,4 +340,4 @@ class ConditionalCycleGAN(AbstractConditionalGenerativeModel):
                     for p in self.adversary.parameters():
                         p.data.clamp_(-0.01, 0.01)
         else:
-            [optimizer.step() for _, optimizer in self.optimizers.items()]
\ No newline at end of file
+            self._step_all()
\ No newline at end of file
@@ -111,7 +111,7 @@ class ConditionalEBGAN(AbstractConditionalGAN1v1, EBGAN):
             )
         else:
             fake_concat = self.concatenate(fake_images, y_batch)
-            real_concat = self.concatenate(X_batch, y_batch)
+            real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
             gen_loss = self._calculate_feature_loss(X_real=real_concat, X_fake=fake_concat)
         return {"Generator": gen_loss}
 
@@ -123,10 +123,8 @@ class ConditionalEBGAN(AbstractConditionalGAN1v1, EBGAN):
         adv_loss_fake = self.loss_functions["Adversary"](
             fake_predictions, fake_images
         )
-        if adv_loss_fake < self.m:
-            adv_loss_fake = self.m - adv_loss_fake
-        else:
-            adv_loss_fake = torch.Tensor([0]).to(self.device)
+        # Hinge max(0, m - loss) without a host synchronisation.
+        adv_loss_fake = torch.clamp(self.m - adv_loss_fake, min=0)
         adv_loss_real = self.loss_functions["Adversary"](
             real_predictions, X_batch
         )
@@ -27,7 +27,7 @@ import torch
 import numpy as np
 import torch.nn as nn
 
-from vegans.utils.layers import LayerReshape
+from vegans.utils.layers import LayerFusedHeads
 from vegans.models.unconditional.InfoGAN import InfoGAN
 from vegans.utils.networks import Generator, Adversary, Encoder
 from vegans.utils import get_input_dim, NormalNegativeLogLikelihood
@@ -133,25 +133,19 @@ class ConditionalInfoGAN(AbstractConditionalGenerativeModel, InfoGAN):
             x_dim=x_dim, z_dim=z_dim, y_dim=y_dim, optim=optim, optim_kwargs=optim_kwargs, feature_layer=feature_layer,
             fixed_noise_size=fixed_noise_size, device=device, folder=folder, ngpu=ngpu, secure=secure
         )
+        # Reconstructions of the discrete codes and mean and log variance of the continuous codes, trained together
+        # with the encoder.
+        out_shapes, activations = [], []
         if self.c_dim_discrete != (0,):
-            self.multinomial = nn.Sequential(
-                nn.Flatten(),
-                nn.Linear(np.prod(self.encoder.output_size), np.sum(self.c_dim_discrete)),
-                nn.Sigmoid()
-            ).to(self.device)
-
+            out_shapes.append(int(np.sum(self.c_dim_discrete)))
+            activations.append(nn.Sigmoid())
         if self.c_dim_continuous != (0,):
-            self.mu = nn.Sequential(
-                nn.Flatten(),
-                nn.Linear(np.prod(self.encoder.output_size), np.sum(self.c_dim_continuous)),
-                LayerReshape(self.c_dim_continuous)
-            ).to(self.device)
-            self.log_variance = nn.Sequential(
-                nn.Flatten(),
-                nn.Linear(np.prod(self.encoder.output_size), np.sum(self.c_dim_continuous)),
-                nn.ReLU(),
-                LayerReshape(self.c_dim_continuous)
-            ).to(self.device)
+            out_shapes.extend([self.c_dim_continuous, self.c_dim_continuous])
+            activations.extend([None, nn.ReLU()])
+        self.code_heads = LayerFusedHeads(
+            in_features=self.encoder.output_size, out_shapes=out_shapes, activations=activations
+        ).to(self.device)
+        self._add_to_optimizer(module=self.code_heads, who="Encoder")
 
         self.lambda_z = lambda_z
         self.hyperparameters["lambda_z"] = lambda_z
@@ -222,19 +216,19 @@ class ConditionalInfoGAN(AbstractConditionalGenerativeModel, InfoGAN):
         c = self.sample_c(n=len(Z_batch))
         fake_images = self.generate(y=y_batch, z=Z_batch, c=c)
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return InfoGAN._calculate_generator_loss(self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat, c=c)
 
     def _calculate_encoder_loss(self, X_batch, Z_batch, y_batch):
         c = self.sample_c(n=len(Z_batch))
         fake_images = self.generate(y=y_batch, z=Z_batch, c=c).detach()
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return InfoGAN._calculate_encoder_loss(self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat, c=c)
 
     def _calculate_adversary_loss(self, X_batch, Z_batch, y_batch):
         c = self.sample_c(n=len(Z_batch))
         fake_images = self.generate(y=y_batch, z=Z_batch, c=c).detach()
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return InfoGAN._calculate_adversary_loss(self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat)
@@ -113,7 +113,7 @@ class ConditionalLRGAN(AbstractConditionalGANGAE, LRGAN):
     def _calculate_generator_loss(self, X_batch, Z_batch, y_batch):
         fake_images = self.generate(y=y_batch, z=Z_batch)
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return LRGAN._calculate_generator_loss(self, X_batch=real_concat, Z_batch=Z_batch, fake_images=fake_concat)
 
     def _calculate_encoder_loss(self, X_batch, Z_batch, y_batch):
@@ -124,5 +124,5 @@ class ConditionalLRGAN(AbstractConditionalGANGAE, LRGAN):
     def _calculate_adversary_loss(self, X_batch, Z_batch, y_batch):
         fake_images = self.generate(y=y_batch, z=Z_batch).detach()
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return LRGAN._calculate_adversary_loss(self, X_batch=real_concat, Z_batch=Z_batch, fake_images=fake_concat)
@@ -26,7 +26,7 @@ import torch
 import numpy as np
 import torch.nn as nn
 
-from vegans.utils.layers import LayerReshape
+from vegans.utils.layers import LayerFusedHeads
 from vegans.models.unconditional.VAEGAN import VAEGAN
 from vegans.utils.networks import Encoder, Generator, Adversary
 from vegans.models.conditional.AbstractConditionalGANGAE import AbstractConditionalGANGAE
@@ -106,16 +106,9 @@ class ConditionalVAEGAN(AbstractConditionalGANGAE, VAEGAN):
             x_dim=x_dim, z_dim=z_dim, y_dim=y_dim, optim=optim, optim_kwargs=optim_kwargs, adv_type=adv_type,
             feature_layer=feature_layer, fixed_noise_size=fixed_noise_size, device=device, folder=folder, ngpu=ngpu, secure=secure
         )
-        self.mu = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
-        self.log_variance = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
+        # mu and log_variance of the latent distribution, trained together with the encoder.
+        self.latent_heads = LayerFusedHeads(in_features=self.encoder.output_size, out_shapes=[z_dim, z_dim]).to(self.device)
+        self._add_to_optimizer(module=self.latent_heads, who="Encoder")
 
         self.lambda_KL = lambda_KL
         self.lambda_x = lambda_x
@@ -139,37 +132,31 @@ class ConditionalVAEGAN(AbstractConditionalGANGAE, VAEGAN):
     # Actions during training
     #########################################################################
     def _calculate_generator_loss(self, X_batch, Z_batch, y_batch):
-        encoded_output = self.encode(x=X_batch, y=y_batch)
-        mu = self.mu(encoded_output)
-        log_variance = self.log_variance(encoded_output)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
+        mu, log_variance = self._encode_real(X_batch=real_concat)
         Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
         fake_images_x = self.generate(z=Z_batch_encoded.detach(), y=y_batch)
         fake_concat_x = self.concatenate(fake_images_x, y_batch)
         fake_images_z = self.generate(z=Z_batch, y=y_batch)
         fake_concat_z = self.concatenate(fake_images_z, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
         return VAEGAN._calculate_generator_loss(
             self, X_batch=real_concat, Z_batch=None, fake_images_x=fake_concat_x, fake_images_z=fake_concat_z
         )
 
     def _calculate_encoder_loss(self, X_batch, Z_batch, y_batch):
-        encoded_output = self.encode(x=X_batch, y=y_batch)
-        mu = self.mu(encoded_output)
-        log_variance = self.log_variance(encoded_output)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
+        mu, log_variance = self._encode_real(X_batch=real_concat)
         Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
         fake_images_x = self.generate(z=Z_batch_encoded, y=y_batch)
         fake_concat_x = self.concatenate(fake_images_x, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
         return VAEGAN._calculate_encoder_loss(self, X_batch=real_concat, Z_batch=None, fake_images_x=fake_concat_x)
 
     def _calculate_adversary_loss(self, X_batch, Z_batch, y_batch):
-        encoded_output = self.encode(x=X_batch, y=y_batch)
-        mu = self.mu(encoded_output)
-        log_variance = self.log_variance(encoded_output)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
+        mu, log_variance = self._encode_real(X_batch=real_concat)
         Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
-        fake_images_x = self.generate(z=Z_batch_encoded, y=y_batch)
+        fake_images_x = self.generate(z=Z_batch_encoded.detach(), y=y_batch)
         fake_concat_x = self.concatenate(fake_images_x, y_batch).detach()
         fake_images_z = self.generate(z=Z_batch, y=y_batch)
         fake_concat_z = self.concatenate(fake_images_z, y_batch).detach()
-        real_concat = self.concatenate(X_batch, y_batch)
         return VAEGAN._calculate_adversary_loss(self, X_batch=real_concat, Z_batch=None, fake_images_x=fake_concat_x, fake_images_z=fake_concat_z)
@@ -23,7 +23,7 @@ import torch
 import numpy as np
 import torch.nn as nn
 
-from vegans.utils.layers import LayerReshape
+from vegans.utils.layers import LayerFusedHeads
 from vegans.utils import get_input_dim
 from vegans.models.unconditional.VanillaVAE import VanillaVAE
 from vegans.utils.networks import Encoder, Decoder, Autoencoder
@@ -102,16 +102,9 @@ class ConditionalVanillaVAE(AbstractConditionalGenerativeModel, VanillaVAE):
             x_dim=x_dim, z_dim=z_dim, y_dim=y_dim, optim=optim, optim_kwargs=optim_kwargs, feature_layer=None,
             fixed_noise_size=fixed_noise_size, device=device, folder=folder, ngpu=ngpu, secure=secure
         )
-        self.mu = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
-        self.log_variance = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
+        # mu and log_variance of the latent distribution, trained together with the encoder.
+        self.latent_heads = LayerFusedHeads(in_features=self.encoder.output_size, out_shapes=[z_dim, z_dim]).to(self.device)
+        self._add_to_optimizer(module=self.latent_heads, who="Autoencoder")
 
         self.lambda_KL = lambda_KL
         self.hyperparameters["lambda_KL"] = lambda_KL
@@ -145,11 +138,11 @@ class ConditionalVanillaVAE(AbstractConditionalGenerativeModel, VanillaVAE):
         return losses
 
     def _calculate_autoencoder_loss(self, X_batch, Z_batch, y_batch):
-        encoded_output = self.encode(x=X_batch, y=y_batch)
-        mu = self.mu(encoded_output)
-        log_variance = self.log_variance(encoded_output)
+        mu, log_variance = self.latent_heads(self.encode(x=X_batch, y=y_batch))
         Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
         fake_images = self.generate(z=Z_batch_encoded, y=y_batch)
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
-        return VanillaVAE._calculate_autoencoder_loss(self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
+        return VanillaVAE._calculate_autoencoder_loss(
+            self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat, mu=mu, log_variance=log_variance
+        )
@@ -109,5 +109,5 @@ class ConditionalWassersteinGANGP(AbstractConditionalGAN1v1, WassersteinGANGP):
     def _calculate_adversary_loss(self, X_batch, Z_batch, y_batch):
         fake_images = self.generate(y=y_batch, z=Z_batch).detach()
         fake_concat = self.concatenate(fake_images, y_batch)
-        real_concat = self.concatenate(X_batch, y_batch)
+        real_concat = self._concatenate_real(X_batch=X_batch, y_batch=y_batch)
         return WassersteinGANGP._calculate_adversary_loss(self, X_batch=real_concat, Z_batch=None, fake_images=fake_concat)
\ No newline at end of file
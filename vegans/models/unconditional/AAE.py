@@ -205,6 +205,7 @@ class AAE(AbstractGenerativeModel):
         }
 
     def _step(self, who=None):
+        self._wait_for_ema(who=who)
         if who is not None:
             self.optimizers[who].step()
             if who == "Adversary":
@@ -212,4 +213,4 @@ class AAE(AbstractGenerativeModel):
                     for p in self.adversary.parameters():
                         p.data.clamp_(-0.01, 0.01)
         else:
-            [optimizer.step() for _, optimizer in self.optimizers.items()]
+            self._step_all()
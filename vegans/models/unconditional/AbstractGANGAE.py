@@ -47,6 +47,7 @@ class AbstractGANGAE(AbstractGenerativeModel):
         tensorboard output are written there. Existing folders are never overwritten or deleted. If a folder with the same name
         already exists a time stamp is appended to make it unique.
     """
+    _cached_per_batch = ("_encoded_real_cache", )
 
     #########################################################################
     # Actions before training
@@ -127,6 +128,7 @@ class AbstractGANGAE(AbstractGenerativeModel):
         return losses
 
     def _step(self, who=None):
+        self._wait_for_ema(who=who)
         if who is not None:
             self.optimizers[who].step()
             if who == "Adversary":
@@ -134,7 +136,25 @@ class AbstractGANGAE(AbstractGenerativeModel):
                     for p in self.adversary.parameters():
                         p.data.clamp_(-0.01, 0.01)
         else:
-            [optimizer.step() for _, optimizer in self.optimizers.items()]
+            self._step_all()
+        if who is None or who == "Encoder":
+            self._encoded_real_cache = None
+
+    def _encode_real(self, X_batch):
+        """ Mean and log variance of the latent distribution of the real samples for models with variational heads
+        (`self.latent_heads`, e.g. the VAEGAN and BicycleGAN).
+
+        The generator, adversary and encoder losses of one batch all need them and the encoder is only changed by its
+        own update, so they are computed once and reused as long as the same `X_batch` tensor is passed. The cache is
+        invalidated by every encoder step. The returned tensors keep their graph for the encoder loss, the generator
+        and adversary losses detach them.
+        """
+        cache = getattr(self, "_encoded_real_cache", None)
+        if cache is not None and cache[0] is X_batch and (cache[1].requires_grad or not torch.is_grad_enabled()):
+            return cache[1], cache[2]
+        mu, log_variance = self.latent_heads(self.encode(x=X_batch))
+        self._encoded_real_cache = (X_batch, mu, log_variance)
+        return mu, log_variance
 
 
     #########################################################################
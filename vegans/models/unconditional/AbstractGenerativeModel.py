@@ -1,20 +1,23 @@
 import os
 import sys
-import time
+import copy
 import json
 import torch
 
 import numpy as np
 import vegans.utils as utils
-import matplotlib.pyplot as plt
 
 from torch.nn import MSELoss
 from datetime import datetime
+from contextlib import contextmanager
 from abc import ABC, abstractmethod
-from torch.utils.data import DataLoader
-from torchvision.utils import make_grid
-from torch.utils.tensorboard import SummaryWriter
-from vegans.utils import plot_losses, plot_images
+from vegans.utils.history import LossHistory
+from vegans.utils.profiling import PhaseProfiler, NoProfiler, ThroughputMeter
+from vegans.utils.engine import TrainingEngine
+from vegans.utils.optimizers import rebuild_optimizer, join_optimizers, supports_implementation
+from vegans.utils.ema import ExponentialMovingAverage
+from vegans.utils.callbacks import CallbackList, PrintProgress, SaveModel, SaveImages, LogLosses, UpdateEMA
+from torch.utils.data import DataLoader, Dataset
 
 class AbstractGenerativeModel(ABC):
     """The AbstractGenerativeModel is the most basic building block of vegans. All GAN implementation should
@@ -49,6 +52,16 @@ class AbstractGenerativeModel(ABC):
         tensorboard output are written there. Existing folders are never overwritten or deleted. If a folder with the same name
         already exists a time stamp is appended to make it unique.
     """
+    _conditional = False
+    # Groups of networks whose updates do not depend on each other and can be run concurrently, see `fit(concurrent=True)`.
+    _independent_networks = []
+    # Attributes caching intermediate results of the current batch. Collected over all classes by `_batch_caches`.
+    _cached_per_batch = ("_real_features_cache", "_real_features_mean_batch")
+    # Attributes holding the training state (optimizers, logs, averages, ...). Collected over all classes by
+    # `_training_attributes` and not copied by `clone`. Code reading them must handle their absence.
+    _training_state = ("optimizers", "hyperparameters", "logged_losses", "_logger", "_losses", "steps",
+        "total_training_time", "_meter", "_nr_expected_loss_logs", "profiler", "_joint_optimizer", "ema",
+        "_real_features_mean")
 
     #########################################################################
     # Actions before training
@@ -72,6 +85,11 @@ class AbstractGenerativeModel(ABC):
         self.feature_layer = feature_layer
         if self.feature_layer is not None:
             self.feature_layer.to(self.device)
+        self._logger = None
+        self.profiler = NoProfiler()
+        self.ema = None
+        self._feature_momentum = None
+        self._real_features_mean = None
         if not hasattr(self, "folder"):
             if folder is None:
                 self.folder = folder
@@ -108,7 +126,8 @@ class AbstractGenerativeModel(ABC):
                 "Model should either have self.generator and self.adversary (self.TYPE = 'GAN') or \n"+
                 "self.decoder and self.encoder (self.TYPE = 'VAE')."
             )
-        self.images_produced = True if len(self._Z_transformer.output_size) == 3 else False
+        output_size = self._Z_transformer.output_size if self.secure else self.x_dim
+        self.images_produced = True if len(output_size) == 3 else False
         self.eval()
 
     def _define_optimizers(self, optim, optim_kwargs):
@@ -155,9 +174,106 @@ class AbstractGenerativeModel(ABC):
             optimizers[name] = dict_optim[name](params=network.parameters(), **dict_optim_kwargs[name])
         return optimizers
 
+    def _add_to_optimizer(self, module, who):
+        """ Trains the parameters of `module`, e.g. layers constructed by the algorithm on top of a network, with the
+        optimizer of the network `who` (as an additional parameter group with the optimizer defaults).
+        """
+        self.optimizers[who].add_param_group({"params": list(module.parameters())})
+
     def _default_optimizer(self):
         return torch.optim.Adam
 
+    def enable_ema(self, decay=0.999, every=1, use_stream=False):
+        """ Keep an exponential moving average (EMA) of the generator / decoder weights during training.
+
+        The average is updated after the optimizer steps of the network containing the generator / decoder with
+        multi-tensor kernels (see `utils.ema.ExponentialMovingAverage`). Use `with model.ema_weights(): ...` to
+        generate with the averaged weights and `save(use_ema=True)` to save them.
+
+        Parameters
+        ----------
+        decay : float, optional
+            Weight of the current average in every update.
+        every : int, optional
+            Update the average only every `every` optimizer steps of the generator / decoder.
+        use_stream : bool, optional
+            On cuda, update the average on a separate stream which overlaps with the remaining training step.
+        """
+        first_param = next(self._Z_transformer.parameters())
+        self._ema_network = next(
+            name for name, network in self.neural_nets.items()
+            if any(param is first_param for param in network.parameters())
+        )
+        self.ema = ExponentialMovingAverage(module=self._Z_transformer, decay=decay, every=every, use_stream=use_stream)
+        self.hyperparameters["ema"] = {"decay": decay, "every": every}
+
+    @contextmanager
+    def ema_weights(self):
+        """ Context manager replacing the generator / decoder weights by their exponential moving average,
+        i.e. `with model.ema_weights(): samples = model.generate(n=16)`.
+        """
+        if getattr(self, "ema", None) is None:
+            raise ValueError("No exponential moving average of the weights is kept. Call `enable_ema()` before `fit`.")
+        with self.ema.average_parameters():
+            yield self
+
+    def enable_mean_feature_matching(self, momentum=0.9):
+        """ Match the mean features of real and fake samples in the feature loss (see `feature_layer`) instead of the
+        features of every sample, as proposed in the original feature matching paper.
+
+        Parameters
+        ----------
+        momentum : float, optional
+            Weight of the previous running mean of the real features when a new batch is seen. With 0 only the mean
+            of the current real batch is used.
+        """
+        assert self.feature_layer is not None, "`feature_layer` must be given in the constructor for feature matching."
+        assert 0 <= momentum < 1, "`momentum` must be in [0, 1). Given: {}.".format(momentum)
+        self._feature_momentum = momentum
+        self._real_features_mean = None
+        self.hyperparameters["feature_momentum"] = momentum
+
+    def fuse_optimizers(self, implementation="foreach", joint=True):
+        """ Recreates the optimizers with multi-tensor ("foreach") or fused kernels.
+
+        Small networks (e.g. MLPs on tabular data) spend a considerable part of every step in the per-parameter
+        Python loop of the optimizers. Foreach and fused implementations update all parameters of an optimizer
+        with a few kernels. The optimizer state (e.g. Adam's moments) is kept.
+
+        Parameters
+        ----------
+        implementation : str, optional
+            Either "foreach" or "fused". Fused kernels are only available for some optimizers (e.g. Adam, AdamW, SGD)
+            and devices.
+        joint : bool, optional
+            If True, all networks are updated by a single optimizer (see `utils.optimizers.join_optimizers`) when
+            all networks are stepped at once. Every network keeps its parameter groups and learning rate. Requires
+            optimizers of the same type, otherwise the networks are stepped one after another.
+        """
+        if implementation not in ["foreach", "fused"]:
+            raise ValueError("`implementation` must be 'foreach' or 'fused'. Given: {}.".format(implementation))
+        implementation_kwargs = {"foreach": True} if implementation == "foreach" else {"fused": True, "foreach": False}
+        for name, optimizer in self.optimizers.items():
+            if not supports_implementation(optimizer, implementation):
+                raise ValueError("Optimizer of {} ({}) has no {} implementation.".format(
+                    name, type(optimizer).__name__, implementation)
+                )
+            kwargs = {
+                key: value for key, value in implementation_kwargs.items() if supports_implementation(optimizer, key)
+            }
+            fused_optimizer = rebuild_optimizer(optimizer, group_kwargs=kwargs, **kwargs)
+            # `load_state_dict` converts the state as required by the implementation (e.g. the step counter of fused
+            # Adam is moved to the device of the parameter), so the groups are loaded with the new implementation.
+            state_dict = optimizer.state_dict()
+            for group in state_dict["param_groups"]:
+                group.update(kwargs)
+            fused_optimizer.load_state_dict(state_dict)
+            self.optimizers[name] = fused_optimizer
+        self._joint_optimizer = None
+        if joint and len(set(type(optimizer) for optimizer in self.optimizers.values())) == 1:
+            self._joint_optimizer = join_optimizers(self.optimizers.values())
+        self.hyperparameters["optimizers"] = self.optimizers
+
     def _check_dict_keys(self, param_dict, where):
         """ Checks if `param_dict` has the correct form.
 
@@ -208,19 +324,23 @@ class AbstractGenerativeModel(ABC):
         pass
 
     def _set_up_training(self, X_train, y_train, X_test, y_test, epochs, batch_size, steps,
-        print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard):
+        print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard, samples_per_epoch=None):
         """ Create the dataloaders, SummaryWriters for tensorboard and transform the saving indicators.
 
         This function creates all data needed during training like the data loaders and save steps.
         It also creates the hyperparameter dictionary and the `steps` dictionary.
         """
         train_dataloader, test_dataloader = self._set_up_data(
-            X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, batch_size=batch_size
+            X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, batch_size=batch_size,
+            samples_per_epoch=samples_per_epoch
         )
-        nr_test = 0 if X_test is None else len(X_test)
+        nr_test = 0 if X_test is None else self._get_nr_samples(X=X_test)
+        nr_train = samples_per_epoch if samples_per_epoch is not None else self._get_nr_samples(X=X_train)
 
+        # Tensorboard, matplotlib and torchvision are only imported when needed to keep `import vegans` fast.
         writer_train = writer_test = None
         if enable_tensorboard:
+            from torch.utils.tensorboard import SummaryWriter
             assert self.folder is not None, (
                 "`folder` argument in constructor was set to `None`. `enable_tensorboard` must be False or `folder` needs to be specified."
             )
@@ -228,75 +348,91 @@ class AbstractGenerativeModel(ABC):
             if X_test is not None:
                 writer_test = SummaryWriter(os.path.join(self.folder, "tensorboard/test/"))
 
+        self._logger = None
+        if enable_tensorboard or save_images_every is not None:
+            from vegans.utils.logger import AsyncLogger
+            self._logger = AsyncLogger(folder=self.folder)
+
         self.steps = self._create_steps(steps=steps)
         save_periods = self._set_up_saver(
             print_every=print_every, save_model_every=save_model_every, save_images_every=save_images_every,
             save_losses_every=save_losses_every, nr_batches=len(train_dataloader)
         )
+        if save_periods[3] is not None:
+            self._nr_expected_loss_logs = epochs * len(train_dataloader) // save_periods[3] + 1
+        self._meter = ThroughputMeter(total_steps=epochs*len(train_dataloader), device=self.device)
         self.hyperparameters.update({
             "epochs": epochs, "batch_size": batch_size, "steps": self.steps,
             "print_every": print_every, "save_model_every": save_model_every, "save_images_every": save_images_every,
-            "enable_tensorboard": enable_tensorboard, "nr_train": len(X_train), "nr_test": nr_test
+            "enable_tensorboard": enable_tensorboard, "nr_train": nr_train, "nr_test": nr_test
         })
         return train_dataloader, test_dataloader, writer_train, writer_test, save_periods
 
-    def _set_up_data(self, X_train, y_train, X_test, y_test, batch_size):
+    def _set_up_data(self, X_train, y_train, X_test, y_test, batch_size, samples_per_epoch=None):
         """ If `X_train` / `X_test` are not data loaders, create them.
 
-        Also asserts their input shapes for consistency.
+        Both are wrapped in a `utils.BatchStream` which defines the epoch length by `samples_per_epoch`.
+        The first batch is peeked to assert the input shapes for consistency and is still used for training.
         """
-        x_train_batch, y_train_batch, x_test_batch, y_test_batch = self._get_batch(
-            X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, batch_size=batch_size
-        )
+        train_dataloader = self._create_dataloader(X=X_train, y=y_train, batch_size=batch_size, name="train")
+        train_dataloader = utils.BatchStream(dataloader=train_dataloader, nr_samples=samples_per_epoch)
+        if train_dataloader.nr_batches is None:
+            raise ValueError(
+                "Length of `X_train` can not be determined (e.g. for iterable datasets). " +
+                "Specify the epoch length with `samples_per_epoch`."
+            )
+
+        test_dataloader = None
+        if X_test is not None:
+            test_dataloader = self._create_dataloader(X=X_test, y=y_test, batch_size=batch_size, name="test")
+            test_dataloader = utils.BatchStream(dataloader=test_dataloader)
 
         if self.secure:
+            x_train_batch, y_train_batch = self._split_batch(batch=train_dataloader.peek())
+            x_test_batch = y_test_batch = None
+            if test_dataloader is not None:
+                x_test_batch, y_test_batch = self._split_batch(batch=test_dataloader.peek())
             self._assert_shapes(X_train=x_train_batch, y_train=y_train_batch, X_test=x_test_batch, y_test=y_test_batch)
 
-        train_dataloader = X_train
-        if not isinstance(X_train, DataLoader):
-            train_data = utils.DataSet(X=X_train, y=y_train)
-            train_dataloader = DataLoader(train_data, batch_size=batch_size)
-
-        test_dataloader = X_test
-        if X_test is not None and not isinstance(X_test, DataLoader):
-            test_data = utils.DataSet(X=X_test, y=y_test)
-            test_dataloader = DataLoader(test_data, batch_size=batch_size)
-
         return train_dataloader, test_dataloader
 
-    def _get_batch(self, X_train, y_train, X_test, y_test, batch_size):
-        """ Returns the first batch of the training and testing data for the consistency checks.
+    def _create_dataloader(self, X, y, batch_size, name):
+        """ Returns a data loader for `X` (and `y`).
+
+        Array-like objects (np.array, np.memmap, zarr arrays, ...) are read in contiguous slices by
+        `utils.ArrayDataSet`, so they are never loaded into memory completely. Datasets (also
+        `torch.utils.data.IterableDataset`) are batched with `batch_size`. Data loaders are returned as is.
         """
-        if isinstance(X_train, DataLoader):
-            assert y_train is None, (
-                "If `X_train` is of type torch.utils.data.DataLoader, `y_train` must be None. The dataloader must " +
-                "return values for X and y when iterating."
+        if isinstance(X, (DataLoader, Dataset)):
+            assert y is None, (
+                "If `X_{}` is of type torch.utils.data.DataLoader or Dataset, `y_{}` must be None. ".format(name, name) +
+                "The dataloader must return values for X and y when iterating."
             )
-            try:
-                x_train_batch, y_train_batch = iter(X_train).next()
-            except ValueError:
-                x_train_batch = iter(X_train).next()
-                y_train_batch = None
-        else:
-            x_train_batch = X_train[:batch_size]
-            y_train_batch = y_train[:batch_size] if y_train is not None else None
+            if isinstance(X, DataLoader):
+                return X
+            return DataLoader(X, batch_size=batch_size)
 
-        if isinstance(X_test, DataLoader):
-            assert y_test is None, (
-                "If `X_test` is of type torch.utils.data.DataLoader, `y_test` must be None. The dataloader must " +
-                "return values for X and y when iterating."
-            )
-            if X_test is not None:
-                try:
-                    x_test_batch, y_test_batch = iter(X_test).next()
-                except ValueError:
-                    x_test_batch = iter(X_test).next()
-                    y_test_batch = None
-        else:
-            x_test_batch = X_test[:batch_size] if X_test is not None else None
-            y_test_batch = y_test[:batch_size] if y_test is not None else None
+        data = utils.ArrayDataSet(X=X, y=y, batch_size=batch_size)
+        return DataLoader(data, batch_size=None)
 
-        return x_train_batch, y_train_batch, x_test_batch, y_test_batch
+    @staticmethod
+    def _split_batch(batch):
+        """ Returns the batch as (X, y) tuple. y is None if the batch contains no labels.
+        """
+        if isinstance(batch, (list, tuple)) and len(batch) == 2:
+            return batch[0], batch[1]
+        return batch, None
+
+    @staticmethod
+    def _get_nr_samples(X):
+        """ Returns the number of samples in `X` if it can be determined, None otherwise.
+        """
+        if isinstance(X, DataLoader):
+            X = X.dataset
+        try:
+            return len(X)
+        except TypeError:
+            return None
 
     def _assert_shapes(self, X_train, y_train, X_test, y_test):
         assert len(X_train.shape) == 2 or len(X_train.shape) == 4, (
@@ -325,16 +461,11 @@ class AbstractGenerativeModel(ABC):
             If not None a dictionary of the form {"Network1": steps1, "Network2": steps2, ...} is expected.
             This dictionary might also be partially filled.
         """
-        steps = {}
-        for name, neural_net in self.neural_nets.items():
-            steps[name] = 1
-        if steps is not None:
-            assert isinstance(steps, dict), "steps parameter must be of type dict. Given: {}.".format(type(steps))
-            steps = steps
-            for name, _ in self.neural_nets.items():
-                if name not in steps:
-                    steps[name] = 1
-            self._check_dict_keys(steps, where="_create_steps")
+        if steps is None:
+            return {name: 1 for name in self.neural_nets}
+        assert isinstance(steps, dict), "steps parameter must be of type dict. Given: {}.".format(type(steps))
+        steps = dict({name: 1 for name in self.neural_nets}, **steps)
+        self._check_dict_keys(steps, where="_create_steps")
         return steps
 
     def _set_up_saver(self, print_every, save_model_every, save_images_every, save_losses_every, nr_batches):
@@ -351,17 +482,15 @@ class AbstractGenerativeModel(ABC):
             assert self.folder is not None, (
                 "`folder` argument in constructor was set to `None`. `save_model_every` must be None or `folder` needs to be specified."
             )
-            os.mkdir(os.path.join(self.folder, "models/"))
+            os.makedirs(os.path.join(self.folder, "models/"), exist_ok=True)
         if save_images_every is not None:
             save_images_every = self._string_to_batchnr(log_string=save_images_every, nr_batches=nr_batches, name="save_images_every")
             assert self.folder is not None, (
                 "`folder` argument in constructor was set to `None`. `save_images_every` must be None or `folder` needs to be specified."
             )
-            os.mkdir(os.path.join(self.folder, "images/"))
+            os.makedirs(os.path.join(self.folder, "images/"), exist_ok=True)
         save_losses_every = self._string_to_batchnr(log_string=save_losses_every, nr_batches=nr_batches, name="save_losses_every")
         self.total_training_time = 0
-        self.current_timer = time.perf_counter()
-        self.batch_training_times = []
 
         return print_every, save_model_every, save_images_every, save_losses_every
 
@@ -380,13 +509,15 @@ class AbstractGenerativeModel(ABC):
     # Actions during training
     #########################################################################
     def fit(self, X_train, X_test=None, epochs=5, batch_size=32, steps=None,
-        print_every="1e", save_model_every=None, save_images_every=None, save_losses_every="1e", enable_tensorboard=False):
+        print_every="1e", save_model_every=None, save_images_every=None, save_losses_every="1e", enable_tensorboard=False,
+        samples_per_epoch=None, profile=False, callbacks=None, concurrent=False):
         """ Trains the model, iterating over all contained networks.
 
         Parameters
         ----------
-        X_train : np.array or torch.utils.data.DataLoader
-            Training data for the generative network. Usually images.
+        X_train : np.array, np.memmap, torch.utils.data.Dataset or torch.utils.data.DataLoader
+            Training data for the generative network. Usually images. Array-like objects are read batch-wise in
+            contiguous slices, so memory-mapped arrays larger than the available memory can be used.
         X_test : np.array, optional
             Testing data for the generative network. Must have same shape as X_train.
         epochs : int, optional
@@ -411,66 +542,67 @@ class AbstractGenerativeModel(ABC):
             of the form "0.25e" (4 times per epoch), "1e" (once per epoch) or "3e" (every third epoch).
         enable_tensorboard : bool, optional
             Flag to indicate whether subdirectory folder/tensorboard should be created to log losses and images.
+        samples_per_epoch : int, optional
+            Number of training samples defining one epoch. Must be given if the length of `X_train` can not be
+            determined, e.g. for iterable datasets. Defaults to one pass over `X_train`.
+        profile : bool or utils.profiling.PhaseProfiler, optional
+            If True, the time spent in every phase of the training loop (data loading, device copy, loss calculation,
+            backward pass and optimizer step per network, logging, images, checkpoints) is recorded in `self.profiler`
+            and a summary table is printed after training. With `enable_tensorboard` the mean times are also logged.
+            Pass a `PhaseProfiler` to configure synchronisation or to record a `torch.profiler` trace.
+        callbacks : list, optional
+            Instances of `utils.callbacks.Callback` called during training in addition to the built-in callbacks
+            for printing, saving and logging, e.g. to ship metrics or to stop the training early.
+        concurrent : bool, optional
+            If True, networks which are independent of each other (e.g. the two adversaries of the CycleGAN) are
+            updated concurrently in separate threads and, on cuda, separate streams. Has no effect for models without
+            independent networks.
+        """
+        self._fit(
+            X_train=X_train, y_train=None, X_test=X_test, y_test=None, epochs=epochs, batch_size=batch_size, steps=steps,
+            print_every=print_every, save_model_every=save_model_every, save_images_every=save_images_every,
+            save_losses_every=save_losses_every, enable_tensorboard=enable_tensorboard,
+            samples_per_epoch=samples_per_epoch, profile=profile, callbacks=callbacks, concurrent=concurrent
+        )
+
+    def _fit(self, X_train, y_train, X_test, y_test, epochs, batch_size, steps, print_every, save_model_every,
+        save_images_every, save_losses_every, enable_tensorboard, samples_per_epoch, profile, callbacks, concurrent=False):
+        """ Sets up the training and runs the `utils.engine.TrainingEngine`. Shared by the `fit` methods of
+        conditional and unconditional models, see `fit` for the parameters.
         """
         if not self._init_run:
             raise ValueError("Run initializer of the AbstractGenerativeModel class is your subclass!")
         train_dataloader, test_dataloader, writer_train, writer_test, save_periods = self._set_up_training(
-            X_train, y_train=None, X_test=X_test, y_test=None, epochs=epochs, batch_size=batch_size, steps=steps,
+            X_train, y_train=y_train, X_test=X_test, y_test=y_test, epochs=epochs, batch_size=batch_size, steps=steps,
             print_every=print_every, save_model_every=save_model_every, save_images_every=save_images_every,
-            save_losses_every=save_losses_every, enable_tensorboard=enable_tensorboard
+            save_losses_every=save_losses_every, enable_tensorboard=enable_tensorboard, samples_per_epoch=samples_per_epoch
         )
-        max_batches = len(train_dataloader)
-        test_x_batch = iter(test_dataloader).next().to(self.device).float() if X_test is not None else None
-        print_every, save_model_every, save_images_every, save_losses_every = save_periods
-        train_x_batch = iter(train_dataloader).next()
-        if len(train_x_batch) != batch_size:
+        if not self._conditional and isinstance(train_dataloader.peek(), (list, tuple)):
             raise ValueError(
-                "Return value from train_dataloader has wrong shape. Should return object of size batch_size. " +
+                "Return value from train_dataloader has wrong shape. Should return a single tensor per batch. " +
                 "Did you pass a dataloader to `X_train` containing labels as well?"
             )
-
+        test_inputs = None
+        if test_dataloader is not None:
+            test_x_batch, test_y_batch = self._split_batch(batch=test_dataloader.peek())
+            test_inputs = {"X_batch": test_x_batch.to(self.device).float()}
+            if self._conditional:
+                test_inputs["y_batch"] = self._prepare_labels(test_y_batch)
+
+        self.profiler = self._create_profiler(profile=profile)
+        engine = TrainingEngine(
+            model=self, schedule=self.steps, conditional=self._conditional, profiler=self.profiler, meter=self._meter,
+            concurrent=concurrent,
+            callbacks=self._create_callbacks(
+                save_periods=save_periods, enable_tensorboard=enable_tensorboard, callbacks=callbacks
+            )
+        )
         self.train()
-        if save_images_every is not None:
-            self._log_images(images=self.generate(z=self.fixed_noise), step=0, writer=writer_train)
-        for epoch in range(epochs):
-            print("---"*20)
-            print("EPOCH:", epoch+1)
-            print("---"*20)
-            for batch, X in enumerate(train_dataloader):
-                batch += 1
-                step = epoch*max_batches + batch
-                X = X.to(self.device).float()
-                Z = self.sample(n=len(X))
-                for name, _ in self.neural_nets.items():
-                    for _ in range(self.steps[name]):
-                        self._losses = self.calculate_losses(X_batch=X, Z_batch=Z, who=name)
-                        self._zero_grad(who=name)
-                        self._backward(who=name)
-                        self._step(who=name)
-
-                if print_every is not None and step % print_every == 0:
-                    self._losses = self.calculate_losses(X_batch=X, Z_batch=Z)
-                    self._summarise_batch(
-                        batch=batch, max_batches=max_batches, epoch=epoch,
-                        max_epochs=epochs, print_every=print_every
-                    )
-
-                if save_model_every is not None and step % save_model_every == 0:
-                    self.save(name="models/model_{}.torch".format(step))
-
-                if save_images_every is not None and step % save_images_every == 0:
-                    self._log_images(images=self.generate(z=self.fixed_noise), step=step, writer=writer_train)
-                    self._save_losses_plot()
-
-                if save_losses_every is not None and step % save_losses_every == 0:
-                    self._log_losses(X_batch=X, Z_batch=Z, mode="Train")
-                    if enable_tensorboard:
-                        self._log_scalars(step=step, writer=writer_train)
-                    if test_x_batch is not None:
-                        self._log_losses(X_batch=test_x_batch, Z_batch=self.sample(n=len(test_x_batch)), mode="Test")
-                        if enable_tensorboard:
-                            self._log_scalars(step=step, writer=writer_test)
-
+        engine.run(
+            train_dataloader=train_dataloader, epochs=epochs, test_inputs=test_inputs,
+            writer_train=writer_train, writer_test=writer_test
+        )
+        self.total_training_time = self._meter.get_metrics()["elapsed_time"]
         self.eval()
         self._clean_up(writers=[writer_train, writer_test])
 
@@ -485,7 +617,10 @@ class AbstractGenerativeModel(ABC):
         Every network takes the `feature_layer` argument in its constructor.
         If it is not None, a layer of the discriminator / critic should be specified.
         A feature loss will be calculated which is the MSE between the output for real
-        and fake samples of the specified `self.feature_layer`.
+        and fake samples of the specified `self.feature_layer`. After `enable_mean_feature_matching()` the running
+        mean of the real features is matched by the mean of the fake features instead.
+
+        The real features are targets only and are computed once per batch (see `_real_features`).
 
         Parameters
         ----------
@@ -494,16 +629,49 @@ class AbstractGenerativeModel(ABC):
         X_fake : torch.Tensor
             Fake samples.
         """
-        X_real_features = self.feature_layer(X_real)
+        X_real_features = self._real_features(X_real=X_real)
         X_fake_features = self.feature_layer(X_fake)
+        if getattr(self, "_feature_momentum", None) is not None:
+            return MSELoss()(X_fake_features.mean(dim=0), getattr(self, "_real_features_mean", None))
         feature_loss = MSELoss()(X_real_features, X_fake_features)
         return feature_loss
 
+    def _real_features(self, X_real):
+        """ Output of `self.feature_layer` for the real samples without gradients.
+
+        The real features do not depend on the generator, so they are reused as long as the same `X_real` tensor is
+        passed (e.g. for both fake batches of the BicycleGAN and for repeated generator updates) and the parameters
+        of the feature layer were not changed by an optimizer step. Every new training batch also updates the running
+        mean of the features used by the mean feature matching once. Batches seen while logging losses (see
+        `_logging_losses`) do not change it.
+        """
+        versions = tuple(param._version for param in self.feature_layer.parameters())
+        cache = getattr(self, "_real_features_cache", None)
+        if cache is not None and cache[0] is X_real and cache[1] == versions:
+            X_real_features = cache[2]
+        else:
+            with torch.no_grad():
+                X_real_features = self.feature_layer(X_real)
+            self._real_features_cache = (X_real, versions, X_real_features)
+        momentum = getattr(self, "_feature_momentum", None)
+        is_new_batch = getattr(self, "_real_features_mean_batch", None) is not X_real
+        if momentum is not None and is_new_batch and not getattr(self, "_is_logging_losses", False):
+            batch_mean = X_real_features.mean(dim=0)
+            running_mean = getattr(self, "_real_features_mean", None)
+            if running_mean is None or running_mean.shape != batch_mean.shape:
+                self._real_features_mean = batch_mean
+            else:
+                self._real_features_mean = momentum*running_mean + (1 - momentum)*batch_mean
+            self._real_features_mean_batch = X_real
+        return X_real_features
+
     def _zero_grad(self, who=None):
         if who is not None:
-            self.optimizers[who].zero_grad()
+            self.optimizers[who].zero_grad(set_to_none=True)
+        elif getattr(self, "_joint_optimizer", None) is not None:
+            self._joint_optimizer.zero_grad(set_to_none=True)
         else:
-            [optimizer.zero_grad() for _, optimizer in self.optimizers.items()]
+            [optimizer.zero_grad(set_to_none=True) for _, optimizer in self.optimizers.items()]
 
     def _backward(self, who=None):
         assert len(self._losses) != 0, "'self._losses' empty when performing '_backward'."
@@ -513,8 +681,26 @@ class AbstractGenerativeModel(ABC):
             [loss.backward(retain_graph=True) for _, loss in self._losses.items()]
 
     def _step(self, who=None):
+        self._wait_for_ema(who=who)
         if who is not None:
             self.optimizers[who].step()
+        else:
+            self._step_all()
+
+    def _wait_for_ema(self, who=None):
+        """ Called before every optimizer step. If the step updates the network whose weights are averaged (see
+        `enable_ema(use_stream=True)`), the current stream waits for a pending update of the average on the side
+        stream, which still reads the parameters the step modifies in place.
+        """
+        ema = getattr(self, "ema", None)
+        if ema is not None and (who is None or who == self._ema_network):
+            ema.wait()
+
+    def _step_all(self):
+        """ Updates all networks, with a single optimizer step if `fuse_optimizers(joint=True)` was called.
+        """
+        if getattr(self, "_joint_optimizer", None) is not None:
+            self._joint_optimizer.step()
         else:
             [optimizer.step() for _, optimizer in self.optimizers.items()]
 
@@ -522,8 +708,32 @@ class AbstractGenerativeModel(ABC):
     #########################################################################
     # Logging during training
     #########################################################################
+    def _create_callbacks(self, save_periods, enable_tensorboard, callbacks=None):
+        """ Creates the `utils.callbacks.CallbackList` of the built-in callbacks for the given saving indicators
+        followed by the user defined `callbacks`. Disabled indicators (None) create no callback.
+        """
+        print_every, save_model_every, save_images_every, save_losses_every = save_periods
+        built_in = []
+        if print_every is not None:
+            built_in.append(PrintProgress(every=print_every))
+        if save_model_every is not None:
+            built_in.append(SaveModel(every=save_model_every))
+        if save_images_every is not None:
+            built_in.append(SaveImages(every=save_images_every))
+        if save_losses_every is not None:
+            built_in.append(LogLosses(every=save_losses_every, enable_tensorboard=enable_tensorboard))
+        if getattr(self, "ema", None) is not None:
+            built_in.insert(0, UpdateEMA(ema=self.ema, network=self._ema_network))
+        callbacks = [] if callbacks is None else list(callbacks)
+        return CallbackList(callbacks=built_in+callbacks, profiler=self.profiler)
+
+    def _generate_fixed_images(self):
+        """ Output for the fixed noise logged during training.
+        """
+        return self.generate(z=self.fixed_noise)
+
     def _summarise_batch(self, batch, max_batches, epoch, max_epochs, print_every):
-        """ Print summary statistics after a specified amount of batches.
+        """ Print the current losses and throughput after a specified amount of batches.
 
         Parameters
         ----------
@@ -540,7 +750,6 @@ class AbstractGenerativeModel(ABC):
         """
         step = epoch*max_batches + batch
         max_steps = max_epochs*max_batches
-        remaining_batches = max_epochs*max_batches - step
         print("Step: {} / {} (Epoch: {} / {}, Batch: {} / {})".format(
             step, max_steps, epoch+1, max_epochs, batch, max_batches)
         )
@@ -548,94 +757,116 @@ class AbstractGenerativeModel(ABC):
         for name, loss in self._losses.items():
             print("{}: {}".format(name, loss.item()))
 
-        self.batch_training_times.append(time.perf_counter() - self.current_timer)
-        self.total_training_time = np.sum(self.batch_training_times)
-        time_per_batch = np.mean(self.batch_training_times) / print_every
+        metrics = self.get_training_metrics()
+        if metrics:
+            self.total_training_time = metrics["elapsed_time"]
+            print("\n")
+            print("Throughput: {:.1f} samples/s (data: {:.1f}, train: {:.1f}), logging overhead: {:.1%}.".format(
+                metrics["samples_per_sec"], metrics["samples_per_sec_data"], metrics["samples_per_sec_train"],
+                metrics["overhead_fraction"]
+            ))
+            print("Time elapsed: {} minutes, time left: ~{} minutes{} (Steps remaining: {}).".format(
+                np.round(metrics["elapsed_time"]/60, 3), np.round(metrics["eta"]/60, 3),
+                " (warming up)" if metrics["warmup"] else "", max_steps - step
+            ))
+            if metrics["peak_memory_mb"] is not None:
+                print("Peak memory: {:.1f} MB.".format(metrics["peak_memory_mb"]))
+
+    def get_training_metrics(self):
+        """ Throughput, timing and memory metrics of the current (or last) call to `fit`.
 
-        print("\n")
-        print("Time left: ~{} minutes (Steps remaining: {}).".format(
-            np.round(remaining_batches*time_per_batch/60, 3), remaining_batches
-            )
-        )
-        self.current_timer = time.perf_counter()
+        Returns
+        -------
+        dict
+            See `utils.profiling.ThroughputMeter.get_metrics`. Times are in seconds. Empty before training.
+        """
+        if getattr(self, "_meter", None) is None:
+            return {}
+        return self._meter.get_metrics()
 
     def _log_images(self, images, step, writer, labels=None):
+        """ Hands the images to the background logger which saves them in folder/images and tensorboard.
+        """
         if self.images_produced:
-            if writer is not None:
-                grid = make_grid(images)
-                writer.add_image('images', grid, step)
+            self._logger.log_images(images=images, step=step, writer=writer, labels=labels)
 
-            fig, axs = self._build_images(images, labels=labels)
-            if fig is not None:
-                path = os.path.join(self.folder, "images/image_{}.png".format(step))
-                plt.savefig(path)
-                plt.close()
-                print("Images saved as {}.".format(path))
+    def _log_losses(self, X_batch, Z_batch, mode, step=None):
+        with self._logging_losses():
+            self._losses = self.calculate_losses(X_batch=X_batch, Z_batch=Z_batch)
+        self._append_losses(mode=mode, step=step)
 
-    def _build_images(self, images, labels=None):
-        """ Build matplotlib figure containing all images.
-
-        Parameters
-        ----------
-        images : torch.Tensor()
-            A torch Tensor containing the images to be plotted by matplotlib.
-
-        Returns
-        -------
-        fig, axs: plt.Figure, np.array
-            Objects containing the figure as well as all separate axis objects.
+    @contextmanager
+    def _logging_losses(self):
+        """ Losses calculated in this context are only logged, so they must not update statistics of the training
+        data like the running mean of the real features (see `enable_mean_feature_matching`).
         """
-        images = images.detach().cpu().numpy()
-        if self.images_produced:
-            fig, axs = plot_images(images=images, labels=labels, show=False)
-            return fig, axs
-        return None, None
+        self._is_logging_losses = True
+        try:
+            yield
+        finally:
+            self._is_logging_losses = False
 
-    def _log_losses(self, X_batch, Z_batch, mode):
-        self._losses = self.calculate_losses(X_batch=X_batch, Z_batch=Z_batch)
-        self._append_losses(mode=mode)
-
-    def _append_losses(self, mode):
+    def _append_losses(self, mode, step=None):
         if not hasattr(self, "logged_losses"):
             self.logged_losses = self._create_logged_losses()
-        for name, loss in self._losses.items():
-            self.logged_losses[mode][name].append(self._losses[name].item())
+        self.logged_losses.append(mode=mode, losses=self._losses, step=step)
 
     def _create_logged_losses(self):
+        """ Creates the `utils.history.LossHistory` storing one column per loss in `self._losses`.
+        """
         with_test = self.hyperparameters["nr_test"] is not None
-        logged_losses = {"Train": {}}
-        if with_test:
-            logged_losses["Test"] = {}
-
-        for name, _ in self._losses.items():
-            logged_losses["Train"][name] = []
-            if with_test:
-                logged_losses["Test"][name] = []
-
-        return logged_losses
+        modes = ["Train", "Test"] if with_test else ["Train"]
+        capacity = getattr(self, "_nr_expected_loss_logs", 1024)
+        return LossHistory(columns=list(self._losses.keys()), modes=modes, capacity=capacity)
 
     def _save_losses_plot(self):
-        """ Creates the `losses.png` plot in the `self.folder` path.
+        """ Updates the `losses.png` plot in the `self.folder` path in the background.
         """
         if hasattr(self, "logged_losses"):
-            fig, axs = plot_losses(self.logged_losses, show=False, share=False)
-            plt.savefig(os.path.join(self.folder, "losses.png"))
-            plt.close()
+            self._logger.plot_losses(logged_losses=self.logged_losses, path=os.path.join(self.folder, "losses.png"))
 
-    def _log_scalars(self, step, writer):
-        """ Log all scalars with tensorboard.
+    def _log_scalars(self, step, writer, training_metrics=False):
+        """ Log all scalars with tensorboard in the background. If `training_metrics`, the throughput, timing and memory
+        metrics (see `get_training_metrics`) and the phase times of `self.profiler` since the last call are logged as well.
         """
         if writer is not None:
-            for name, loss in self._losses.items():
-                writer.add_scalar("Loss/{}".format(name), loss.item(), step)
-            writer.add_scalar("Time/Total", self.total_training_time / 60, step)
-            writer.add_scalar("Time/Batch", np.mean(self.batch_training_times) / 60, step)
+            scalars = {"Loss/{}".format(name): loss for name, loss in self._losses.items()}
+            metrics = self.get_training_metrics() if training_metrics else {}
+            if metrics:
+                scalars["Time/Total"] = metrics["elapsed_time"] / 60
+                scalars["Time/ETA"] = metrics["eta"] / 60
+                scalars["Time/Step"] = metrics["time_per_step"]
+                scalars["Throughput/SamplesPerSec"] = metrics["samples_per_sec"]
+                scalars["Throughput/SamplesPerSecData"] = metrics["samples_per_sec_data"]
+                scalars["Throughput/SamplesPerSecTrain"] = metrics["samples_per_sec_train"]
+                scalars["Throughput/OverheadFraction"] = metrics["overhead_fraction"]
+                if metrics["peak_memory_mb"] is not None:
+                    scalars["Memory/PeakMB"] = metrics["peak_memory_mb"]
+            if training_metrics:
+                scalars.update(self.profiler.get_scalars())
+            self._logger.log_scalars(scalars=scalars, step=step, writer=writer)
 
     #########################################################################
     # After training
     #########################################################################
+    def _create_profiler(self, profile):
+        if profile is True:
+            return PhaseProfiler(device=self.device)
+        elif isinstance(profile, PhaseProfiler):
+            return profile
+        elif profile is False or profile is None:
+            return NoProfiler()
+        raise TypeError("`profile` must be bool or utils.profiling.PhaseProfiler. Given: {}.".format(type(profile)))
+
     def _clean_up(self, writers=None):
+        if isinstance(self.profiler, PhaseProfiler):
+            print(self.profiler.summary())
+        if self._logger is not None:
+            self._logger.close()
+            self._logger = None
         [writer.close() for writer in writers if writer is not None]
+        for attr in self._batch_caches():
+            setattr(self, attr, None)
 
     def get_training_results(self, by_epoch=False, agg=None):
         """ Call after training to get fixed_noise samples and losses.
@@ -677,19 +908,20 @@ class AbstractGenerativeModel(ABC):
         Returns
         -------
         losses_dict : dict
-            Dictionary containing all loss types logged during training
+            Dictionary containing all loss types logged during training. Use `self.logged_losses.to_csv()` or
+            `self.logged_losses.to_parquet()` to export the losses.
         """
         if agg is None:
             agg = np.mean
         assert callable(agg), "agg: Aggregation function must be callable."
-        losses_dict = self.logged_losses.copy()
-        if by_epoch:
-            epochs = self.get_hyperparameters()["epochs"]
-            for mode, loss_dict in losses_dict.items():
-                for key, losses in loss_dict.items():
-                    batches_per_epoch = len(losses) // epochs
-                    loss_dict[key] = [losses[epoch*batches_per_epoch:(epoch+1)*batches_per_epoch] for epoch in range(epochs)]
-                    loss_dict[key] = [agg(loss_epoch) for loss_epoch in loss_dict[key]]
+        losses_dict = {}
+        for mode, loss_dict in self.logged_losses.items():
+            if by_epoch:
+                epochs = self.get_hyperparameters()["epochs"]
+                batches_per_epoch = max(len(self.logged_losses.get_steps(mode=mode)) // epochs, 1)
+                loss_dict = self.logged_losses.aggregate(mode=mode, window=batches_per_epoch, agg=agg)
+                loss_dict = {key: losses[:epochs] for key, losses in loss_dict.items()}
+            losses_dict[mode] = {key: list(losses) for key, losses in loss_dict.items()}
 
         return losses_dict
 
@@ -697,7 +929,7 @@ class AbstractGenerativeModel(ABC):
     #########################################################################
     # Saving and loading
     #########################################################################
-    def save(self, name=None):
+    def save(self, name=None, use_ema=False):
         """ Saves model in the model folder as torch / pickle object.
 
         Parameters
@@ -705,15 +937,30 @@ class AbstractGenerativeModel(ABC):
         name : str, optional
             name of the saved file. folder specified in the constructor used
             in absolute path.
+        use_ema : bool, optional
+            Save the model with the exponential moving average of the generator / decoder weights (see `enable_ema`)
+            as its weights. The saved model keeps no average (`ema` is None), call `enable_ema` again to continue
+            training with one.
         """
+        if use_ema:
+            ema = self.ema
+            with self.ema_weights():
+                # While swapped, the average holds the live weights and must not be written to the checkpoint.
+                self.ema = None
+                try:
+                    return self.save(name=name)
+                finally:
+                    self.ema = ema
         if name is None:
             name = "model.torch"
         if self.folder is not None:
-            torch.save(self, os.path.join(self.folder, name))
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, name)
         else:
-            torch.save(self, os.path.join("", name))
+            path = os.path.join("", name)
+        torch.save(self, path)
 
-        print("Model saved to {}.".format(os.path.join(self.folder, name)))
+        print("Model saved to {}.".format(path))
 
     @staticmethod
     def load(path):
@@ -731,10 +978,30 @@ class AbstractGenerativeModel(ABC):
         """
         return torch.load(path)
 
+    def __getstate__(self):
+        # Checkpoints written during training should not contain the cached batch results.
+        state = self.__dict__.copy()
+        for attr in self._batch_caches():
+            state[attr] = None
+        return state
+
 
     #########################################################################
     # Utility functions
     #########################################################################
+    def _batch_caches(self):
+        """ Names of all attributes declared in `_cached_per_batch` by the classes of the model. They are dropped after
+        training, in checkpoints and in clones.
+        """
+        return [attr for cls in type(self).__mro__ for attr in vars(cls).get("_cached_per_batch", ())]
+
+    def _training_attributes(self):
+        """ Names of all attributes declared in `_training_state` by the classes of the model and of the per-batch
+        caches. They are not copied by `clone`.
+        """
+        training_state = [attr for cls in type(self).__mro__ for attr in vars(cls).get("_training_state", ())]
+        return training_state + self._batch_caches()
+
     def sample(self, n):
         """ Sample from the latent distribution.
 
@@ -819,6 +1086,62 @@ class AbstractGenerativeModel(ABC):
             sys.stdout = sys_stdout_temp
             sys_stdout_temp
 
+    def clone(self, folder=None, optim_kwargs=None, reinitialize=True):
+        """ Fast construction of a new model with the same architecture, e.g. for hyperparameter sweeps.
+
+        The model is copied without calling the constructor, so input validation, shape inference, the creation of a
+        time stamped folder and the sampling of the fixed noise are skipped. Training state (logged losses, timers,
+        optimizer state) is not copied and new optimizers of the same type are created for the copied networks.
+
+        Parameters
+        ----------
+        folder : str, optional
+            Output folder of the clone. Used as is and only created once something is written to it.
+        optim_kwargs : dict, optional
+            Optimizer keyword arguments overwriting the ones of this model. Must be a dictionary with network
+            name keys and dictionary with keyword arguments as value, i.e. {"Generator": {"lr": 0.0001}}.
+        reinitialize : bool, optional
+            If True, the weights of all layers are re-initialised via their `reset_parameters()` method. Custom
+            initialisations of the architecture are therefore not reproduced. If False, the current weights are copied.
+
+        Returns
+        -------
+        AbstractGenerativeModel
+            New, untrained model.
+        """
+        if optim_kwargs is None:
+            optim_kwargs = {}
+        self._check_dict_keys(param_dict={**{name: None for name in self.neural_nets}, **optim_kwargs}, where="clone")
+
+        excluded = {attr: self.__dict__.pop(attr) for attr in self._training_attributes() if attr in self.__dict__}
+        memo = {}
+        try:
+            model = copy.deepcopy(self, memo)
+        finally:
+            self.__dict__.update(excluded)
+
+        if reinitialize:
+            modules = [module for module in vars(model).values() if isinstance(module, torch.nn.Module)]
+            for module in modules:
+                for layer in module.modules():
+                    if hasattr(layer, "reset_parameters"):
+                        layer.reset_parameters()
+
+        model.optimizers = {
+            name: rebuild_optimizer(optimizer, params=memo, group_kwargs=optim_kwargs.get(name))
+            for name, optimizer in self.optimizers.items()
+        }
+        if getattr(self, "_joint_optimizer", None) is not None:
+            model._joint_optimizer = join_optimizers(model.optimizers.values())
+
+        model.profiler = NoProfiler()
+        model.folder = folder
+        model.hyperparameters = dict(
+            self.hyperparameters, folder=folder, optimizers=model.optimizers, loss_functions=model.loss_functions
+        )
+        model.hyperparameters.pop("ema", None)
+        return model
+
     def get_number_params(self):
         """ Returns the number of parameters in the model.
 
@@ -102,15 +102,31 @@ class EBGAN(AbstractGAN1v1):
         return loss_functions
 
     def _set_up_training(self, X_train, y_train, X_test, y_test, epochs, batch_size, steps,
-        print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard):
+        print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard, samples_per_epoch=None):
         train_dataloader, test_dataloader, writer_train, writer_test, save_periods = super()._set_up_training(
             X_train, y_train, X_test, y_test, epochs, batch_size, steps,
-            print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard
+            print_every, save_model_every, save_images_every, save_losses_every, enable_tensorboard, samples_per_epoch
         )
         if self.m is None:
-            self.m = np.mean(X_train)
+            self.m = self._estimate_margin(train_dataloader=train_dataloader)
+            self.hyperparameters["m"] = self.m
         return train_dataloader, test_dataloader, writer_train, writer_test, save_periods
 
+    def _estimate_margin(self, train_dataloader, nr_batches=10):
+        """ Default margin `m`: mean of the training data, estimated with a running sum over the first `nr_batches`
+        batches.
+
+        The batches are only peeked, so they are still used for training, and every input format (arrays,
+        datasets, data loaders) is supported without a full pass over the data.
+        """
+        total, count = 0., 0
+        for index in range(min(nr_batches, len(train_dataloader))):
+            X_batch, _ = self._split_batch(batch=train_dataloader.peek(index=index))
+            X_batch = torch.as_tensor(X_batch)
+            total += X_batch.double().sum().item()
+            count += X_batch.numel()
+        return total / count
+
     def _calculate_generator_loss(self, X_batch, Z_batch):
         fake_images = self.generate(z=Z_batch)
         if self.feature_layer is None:
@@ -130,10 +146,8 @@ class EBGAN(AbstractGAN1v1):
         adv_loss_fake = self.loss_functions["Adversary"](
             fake_predictions, fake_images
         )
-        if adv_loss_fake < self.m:
-            adv_loss_fake = self.m - adv_loss_fake
-        else:
-            adv_loss_fake = torch.Tensor([0]).to(self.device)
+        # Hinge max(0, m - loss) without a host synchronisation.
+        adv_loss_fake = torch.clamp(self.m - adv_loss_fake, min=0)
         adv_loss_real = self.loss_functions["Adversary"](
             real_predictions, X_batch
         )
@@ -27,7 +27,7 @@ import torch
 import numpy as np
 import torch.nn as nn
 
-from vegans.utils.layers import LayerReshape
+from vegans.utils.layers import LayerFusedHeads
 from torch.nn import CrossEntropyLoss, BCELoss
 from vegans.utils.networks import Generator, Adversary, Encoder
 from vegans.utils import get_input_dim, concatenate, NormalNegativeLogLikelihood
@@ -125,25 +125,19 @@ class InfoGAN(AbstractGenerativeModel):
             x_dim=x_dim, z_dim=z_dim, optim=optim, optim_kwargs=optim_kwargs, feature_layer=feature_layer,
             fixed_noise_size=fixed_noise_size, device=device, folder=folder, ngpu=ngpu, secure=secure
         )
+        # Reconstructions of the discrete codes and mean and log variance of the continuous codes, trained together
+        # with the encoder.
+        out_shapes, activations = [], []
         if self.c_dim_discrete != (0,):
-            self.multinomial = nn.Sequential(
-                nn.Flatten(),
-                nn.Linear(np.prod(self.encoder.output_size), np.sum(self.c_dim_discrete)),
-                nn.Sigmoid()
-            ).to(self.device)
-
+            out_shapes.append(int(np.sum(self.c_dim_discrete)))
+            activations.append(nn.Sigmoid())
         if self.c_dim_continuous != (0,):
-            self.mu = nn.Sequential(
-                nn.Flatten(),
-                nn.Linear(np.prod(self.encoder.output_size), np.sum(self.c_dim_continuous)),
-                LayerReshape(shape=self.c_dim_continuous)
-            ).to(self.device)
-            self.log_variance = nn.Sequential(
-                nn.Flatten(),
-                nn.Linear(np.prod(self.encoder.output_size), np.sum(self.c_dim_continuous)),
-                nn.ReLU(),
-                LayerReshape(shape=self.c_dim_continuous)
-            ).to(self.device)
+            out_shapes.extend([self.c_dim_continuous, self.c_dim_continuous])
+            activations.extend([None, nn.ReLU()])
+        self.code_heads = LayerFusedHeads(
+            in_features=self.encoder.output_size, out_shapes=out_shapes, activations=activations
+        ).to(self.device)
+        self._add_to_optimizer(module=self.code_heads, who="Encoder")
 
         self.lambda_z = lambda_z
         self.hyperparameters["lambda_z"] = lambda_z
@@ -175,6 +169,18 @@ class InfoGAN(AbstractGenerativeModel):
     def encode(self, x):
         return self.encoder(x)
 
+    def _reconstruct_c(self, x):
+        """ Encodes `x` and returns the reconstructed discrete codes and the mean and variance of the continuous
+        codes. Codes which the model does not use are None.
+        """
+        heads = list(self.code_heads(self.encode(x=x)))
+        reconstructed_c_discrete = heads.pop(0) if self.c_dim_discrete[0] != 0 else None
+        reconstructed_mu = reconstructed_variance = None
+        if self.c_dim_continuous[0] != 0:
+            reconstructed_mu, reconstructed_log_variance = heads
+            reconstructed_variance = reconstructed_log_variance.exp()
+        return reconstructed_c_discrete, reconstructed_mu, reconstructed_variance
+
     def sample_c(self, n):
         """ Sample the conditional vector.
 
@@ -243,13 +249,7 @@ class InfoGAN(AbstractGenerativeModel):
         if fake_images is None:
             c = self.sample_c(n=len(Z_batch))
             fake_images = self.generate(z=Z_batch, c=c)
-        encoded = self.encode(x=fake_images)
-
-        if self.c_dim_discrete[0] != 0:
-            reconstructed_c_discrete = self.multinomial(encoded)
-        if self.c_dim_continuous[0] != 0:
-            reconstructed_mu = self.mu(encoded)
-            reconstructed_variance = self.log_variance(encoded).exp()
+        reconstructed_c_discrete, reconstructed_mu, reconstructed_variance = self._reconstruct_c(x=fake_images)
 
         if self.feature_layer is None:
             fake_predictions = self.predict(x=fake_images)
@@ -286,13 +286,7 @@ class InfoGAN(AbstractGenerativeModel):
         if fake_images is None:
             c = self.sample_c(n=len(Z_batch))
             fake_images = self.generate(z=Z_batch, c=c).detach()
-        encoded = self.encode(x=fake_images)
-
-        if self.c_dim_discrete[0] != 0:
-            reconstructed_c_discrete = self.multinomial(encoded)
-        if self.c_dim_continuous[0] != 0:
-            reconstructed_mu = self.mu(encoded)
-            reconstructed_variance = self.log_variance(encoded).exp()
+        reconstructed_c_discrete, reconstructed_mu, reconstructed_variance = self._reconstruct_c(x=fake_images)
 
         discrete_encoder_loss = torch.Tensor([0]).to(self.device)
         start = 0
@@ -27,7 +27,7 @@ import numpy as np
 import torch.nn as nn
 
 from torch.nn import L1Loss
-from vegans.utils.layers import LayerReshape
+from vegans.utils.layers import LayerFusedHeads
 from vegans.models.unconditional.AbstractGANGAE import AbstractGANGAE
 
 class VAEGAN(AbstractGANGAE):
@@ -102,16 +102,9 @@ class VAEGAN(AbstractGANGAE):
             x_dim=x_dim, z_dim=z_dim, optim=optim, optim_kwargs=optim_kwargs, adv_type=adv_type, feature_layer=feature_layer,
             fixed_noise_size=fixed_noise_size, device=device, ngpu=ngpu, folder=folder, secure=secure
         )
-        self.mu = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
-        self.log_variance = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
+        # mu and log_variance of the latent distribution, trained together with the encoder.
+        self.latent_heads = LayerFusedHeads(in_features=self.encoder.output_size, out_shapes=[z_dim, z_dim]).to(self.device)
+        self._add_to_optimizer(module=self.latent_heads, who="Encoder")
 
         self.lambda_KL = lambda_KL
         self.lambda_x = lambda_x
@@ -141,9 +134,7 @@ class VAEGAN(AbstractGANGAE):
     #########################################################################
     def _calculate_generator_loss(self, X_batch, Z_batch, fake_images_x=None, fake_images_z=None):
         if fake_images_x is None:
-            encoded_output = self.encode(x=X_batch)
-            mu = self.mu(encoded_output)
-            log_variance = self.log_variance(encoded_output)
+            mu, log_variance = self._encode_real(X_batch=X_batch)
             Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
             fake_images_x = self.generate(z=Z_batch_encoded.detach())
         if fake_images_z is None:
@@ -175,9 +166,7 @@ class VAEGAN(AbstractGANGAE):
         }
 
     def _calculate_encoder_loss(self, X_batch, Z_batch, fake_images_x=None):
-        encoded_output = self.encode(x=X_batch)
-        mu = self.mu(encoded_output)
-        log_variance = self.log_variance(encoded_output)
+        mu, log_variance = self._encode_real(X_batch=X_batch)
         if fake_images_x is None:
             Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
             fake_images_x = self.generate(z=Z_batch_encoded)
@@ -202,11 +191,9 @@ class VAEGAN(AbstractGANGAE):
 
     def _calculate_adversary_loss(self, X_batch, Z_batch, fake_images_x=None, fake_images_z=None):
         if fake_images_x is None:
-            encoded_output = self.encode(x=X_batch)
-            mu = self.mu(encoded_output)
-            log_variance = self.log_variance(encoded_output)
+            mu, log_variance = self._encode_real(X_batch=X_batch)
             Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
-            fake_images_x = self.generate(z=Z_batch_encoded).detach()
+            fake_images_x = self.generate(z=Z_batch_encoded.detach()).detach()
         if fake_images_z is None:
             fake_images_z = self.generate(Z_batch).detach()
 
@@ -24,7 +24,7 @@ import numpy as np
 import torch.nn as nn
 
 from torch.nn import MSELoss
-from vegans.utils.layers import LayerReshape
+from vegans.utils.layers import LayerFusedHeads
 from vegans.utils.networks import Encoder, Decoder, Autoencoder
 from vegans.models.unconditional.AbstractGenerativeModel import AbstractGenerativeModel
 
@@ -92,16 +92,9 @@ class VanillaVAE(AbstractGenerativeModel):
             x_dim=x_dim, z_dim=z_dim, optim=optim, optim_kwargs=optim_kwargs, feature_layer=None,
             fixed_noise_size=fixed_noise_size, device=device, folder=folder, ngpu=ngpu, secure=secure
         )
-        self.mu = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
-        self.log_variance = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(np.prod(self.encoder.output_size), np.prod(z_dim)),
-            LayerReshape(shape=z_dim)
-        ).to(self.device)
+        # mu and log_variance of the latent distribution, trained together with the encoder.
+        self.latent_heads = LayerFusedHeads(in_features=self.encoder.output_size, out_shapes=[z_dim, z_dim]).to(self.device)
+        self._add_to_optimizer(module=self.latent_heads, who="Autoencoder")
 
         self.lambda_KL = lambda_KL
         self.hyperparameters["lambda_KL"] = lambda_KL
@@ -131,10 +124,9 @@ class VanillaVAE(AbstractGenerativeModel):
         losses = self._calculate_autoencoder_loss(X_batch=X_batch, Z_batch=Z_batch)
         return losses
 
-    def _calculate_autoencoder_loss(self, X_batch, Z_batch, fake_images=None):
-        encoded_output = self.encode(X_batch)
-        mu = self.mu(encoded_output)
-        log_variance = self.log_variance(encoded_output)
+    def _calculate_autoencoder_loss(self, X_batch, Z_batch, fake_images=None, mu=None, log_variance=None):
+        if mu is None:
+            mu, log_variance = self.latent_heads(self.encode(X_batch))
 
         if fake_images is None:
             Z_batch_encoded = mu + torch.exp(log_variance)*Z_batch
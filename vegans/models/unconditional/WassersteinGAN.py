@@ -112,10 +112,11 @@ class WassersteinGAN(AbstractGAN1v1):
     # Actions during training
     #########################################################################
     def _step(self, who=None):
+        self._wait_for_ema(who=who)
         if who is not None:
             self.optimizers[who].step()
             if who == "Adversary":
                 for p in self.adversary.parameters():
                     p.data.clamp_(-self._clip_val, self._clip_val)
         else:
-            [optimizer.step() for _, optimizer in self.optimizers.items()]
\ No newline at end of file
+            self._step_all()
\ No newline at end of file
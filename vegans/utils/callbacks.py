@@ -0,0 +1,211 @@
+from vegans.utils.profiling import NoProfiler
+
+
+class TrainingState():
+    """ Information about the running training passed to every callback.
+
+    Attributes
+    ----------
+    epoch : int
+        Current epoch (starting at 0).
+    batch : int
+        Current batch in the epoch (starting at 1).
+    step : int
+        Number of batches trained so far (starting at 1).
+    max_epochs, max_batches : int
+        Number of epochs and batches per epoch.
+    inputs : dict
+        Keyword arguments of `model.calculate_losses` for the current batch, i.e. {"X_batch": X, "Z_batch": Z} and
+        additionally "y_batch" for conditional models.
+    test_inputs : dict or None
+        Same as `inputs` for the fixed test batch, but without "Z_batch".
+    writer_train, writer_test : torch.utils.tensorboard.SummaryWriter or None
+        Tensorboard writers.
+    stop_training : bool
+        Set to True by a callback to stop training after the current batch.
+    """
+    def __init__(self, max_epochs, max_batches, test_inputs=None, writer_train=None, writer_test=None):
+        self.epoch = 0
+        self.batch = 0
+        self.step = 0
+        self.max_epochs = max_epochs
+        self.max_batches = max_batches
+        self.inputs = None
+        self.test_inputs = test_inputs
+        self.writer_train = writer_train
+        self.writer_test = writer_test
+        self.stop_training = False
+
+
+class Callback():
+    """ Base class for callbacks of `fit`. Override any of the hooks.
+
+    Only overridden hooks are called, so unused hooks cost nothing. The time spent in a callback is attributed to
+    the profiler phase `self.phase`.
+    """
+    phase = "callbacks"
+
+    def on_train_begin(self, model, state):
+        """ Called once before the first batch.
+        """
+        pass
+
+    def on_step(self, model, network, state):
+        """ Called after every optimizer step of `network` (name of the network as in `model.neural_nets`).
+        """
+        pass
+
+    def on_batch_end(self, model, state):
+        """ Called after all networks were updated for one batch.
+        """
+        pass
+
+    def on_epoch_end(self, model, state):
+        """ Called after the last batch of every epoch.
+        """
+        pass
+
+    def on_train_end(self, model, state):
+        """ Called once after training.
+        """
+        pass
+
+
+class PeriodicCallback(Callback):
+    """ Callback which acts every `every` steps in `on_batch_end` by calling `self.run(model, state)`.
+    """
+    def __init__(self, every):
+        self.every = every
+
+    def on_batch_end(self, model, state):
+        if state.step % self.every == 0:
+            self.run(model=model, state=state)
+
+    def run(self, model, state):
+        raise NotImplementedError
+
+
+class CallbackList():
+    """ Dispatches the hooks to all callbacks which override them.
+
+    Parameters
+    ----------
+    callbacks : list
+        Instances of `Callback`.
+    profiler : utils.profiling.PhaseProfiler, optional
+        Used to time every callback in its phase.
+    """
+    HOOKS = ("on_train_begin", "on_step", "on_batch_end", "on_epoch_end", "on_train_end")
+
+    def __init__(self, callbacks, profiler=None):
+        for callback in callbacks:
+            if not isinstance(callback, Callback):
+                raise TypeError("Callbacks must inherit from `vegans.utils.callbacks.Callback`. Given: {}.".format(
+                    type(callback))
+                )
+        self.callbacks = list(callbacks)
+        self.profiler = NoProfiler() if profiler is None else profiler
+        self._hooks = {
+            hook: [callback for callback in self.callbacks if self._overrides(callback, hook)] for hook in self.HOOKS
+        }
+        self.has_step_callbacks = len(self._hooks["on_step"]) > 0
+
+    @staticmethod
+    def _overrides(callback, hook):
+        return getattr(type(callback), hook) is not getattr(Callback, hook)
+
+    def _call(self, hook, **kwargs):
+        for callback in self._hooks[hook]:
+            with self.profiler.phase(callback.phase):
+                getattr(callback, hook)(**kwargs)
+
+    def on_train_begin(self, model, state):
+        self._call("on_train_begin", model=model, state=state)
+
+    def on_step(self, model, network, state):
+        self._call("on_step", model=model, network=network, state=state)
+
+    def on_batch_end(self, model, state):
+        self._call("on_batch_end", model=model, state=state)
+
+    def on_epoch_end(self, model, state):
+        self._call("on_epoch_end", model=model, state=state)
+
+    def on_train_end(self, model, state):
+        self._call("on_train_end", model=model, state=state)
+
+
+#########################################################################
+# Built-in callbacks used by fit
+#########################################################################
+class PrintProgress(PeriodicCallback):
+    """ Print the losses of the current batch and the throughput every `every` steps.
+    """
+    phase = "logging"
+
+    def run(self, model, state):
+        model._losses = model.calculate_losses(**state.inputs)
+        model._summarise_batch(
+            batch=state.batch, max_batches=state.max_batches, epoch=state.epoch,
+            max_epochs=state.max_epochs, print_every=self.every
+        )
+
+
+class SaveModel(PeriodicCallback):
+    """ Save the model to `folder/models/model_{step}.torch` every `every` steps.
+    """
+    phase = "checkpoint"
+
+    def run(self, model, state):
+        model.save(name="models/model_{}.torch".format(state.step))
+
+
+class SaveImages(PeriodicCallback):
+    """ Save the images generated from the fixed noise (and the loss plot) every `every` steps and once before training.
+    """
+    phase = "images"
+
+    def on_train_begin(self, model, state):
+        model._log_images(images=model._generate_fixed_images(), step=0, writer=state.writer_train)
+
+    def run(self, model, state):
+        model._log_images(images=model._generate_fixed_images(), step=state.step, writer=state.writer_train)
+        model._save_losses_plot()
+
+
+class LogLosses(PeriodicCallback):
+    """ Log the losses of the current batch and the test batch every `every` steps, optionally to tensorboard.
+    """
+    phase = "logging"
+
+    def __init__(self, every, enable_tensorboard=False):
+        super().__init__(every=every)
+        self.enable_tensorboard = enable_tensorboard
+
+    def run(self, model, state):
+        model._log_losses(**state.inputs, mode="Train", step=state.step)
+        if self.enable_tensorboard:
+            model._log_scalars(step=state.step, writer=state.writer_train, training_metrics=True)
+        if state.test_inputs is not None:
+            test_inputs = dict(state.test_inputs, Z_batch=model.sample(n=len(state.test_inputs["X_batch"])))
+            model._log_losses(**test_inputs, mode="Test", step=state.step)
+            if self.enable_tensorboard:
+                model._log_scalars(step=state.step, writer=state.writer_test)
+
+
+class UpdateEMA(Callback):
+    """ Updates the exponential moving average `ema` after every optimizer step of `network`.
+    """
+    phase = "ema"
+
+    def __init__(self, ema, network):
+        self.ema = ema
+        self.network = network
+
+    def on_step(self, model, network, state):
+        if network == self.network:
+            self.ema.update()
+
+    def on_batch_end(self, model, state):
+        # The next optimizer step must not modify the parameters while the side stream still reads them.
+        self.ema.wait()
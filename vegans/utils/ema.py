@@ -0,0 +1,87 @@
+import torch
+
+from contextlib import contextmanager
+
+
+class ExponentialMovingAverage():
+    """ Exponential moving average of the parameters of a network, e.g. of the generator.
+
+    Only the parameter tensors are copied (not the module), and all of them are updated with two multi-tensor
+    (foreach) kernels: ema = decay*ema + (1 - decay)*param. Buffers like batch norm statistics are not averaged.
+
+    On cuda the update can be run on a side stream with `use_stream=True`. It then overlaps with the following
+    computations, e.g. the adversary update. `wait()` must be called before the parameters are modified again
+    (the models do so before every optimizer step of the averaged network, see `_wait_for_ema`).
+
+    Parameters
+    ----------
+    module : torch.nn.Module
+        Network whose parameters are averaged.
+    decay : float, optional
+        Weight of the current average in every update.
+    every : int, optional
+        Only every `every`-th call to `update()` performs the update. The decay is adjusted to decay**every.
+    use_stream : bool, optional
+        Perform the updates on a separate cuda stream.
+    """
+    def __init__(self, module, decay=0.999, every=1, use_stream=False):
+        assert 0 <= decay < 1, "`decay` must be in [0, 1). Given: {}.".format(decay)
+        assert isinstance(every, int) and every >= 1, "`every` must be a positive integer. Given: {}.".format(every)
+        self.module = module
+        self.decay = decay
+        self.every = every
+        self.params = [param for param in module.parameters() if param.dtype.is_floating_point]
+        self.averages = [param.detach().clone() for param in self.params]
+        self.nr_updates = 0
+        self._calls = 0
+        self._stream = None
+        if use_stream and self.params and self.params[0].is_cuda:
+            self._stream = torch.cuda.Stream(device=self.params[0].device)
+
+    @torch.no_grad()
+    def update(self):
+        """ Update the averages with the current parameters.
+        """
+        self._calls += 1
+        if self._calls % self.every != 0:
+            return
+        decay = self.decay ** self.every
+        if self._stream is not None:
+            self._stream.wait_stream(torch.cuda.current_stream(self._stream.device))
+            with torch.cuda.stream(self._stream):
+                self._update(decay=decay)
+        else:
+            self._update(decay=decay)
+        self.nr_updates += 1
+
+    def _update(self, decay):
+        torch._foreach_mul_(self.averages, decay)
+        torch._foreach_add_(self.averages, [param.detach() for param in self.params], alpha=1 - decay)
+
+    def wait(self):
+        """ Let the current cuda stream wait for a pending update on the side stream.
+        """
+        if self._stream is not None:
+            torch.cuda.current_stream(self._stream.device).wait_stream(self._stream)
+
+    @contextmanager
+    def average_parameters(self):
+        """ Temporarily replace the parameters of the module by their averages.
+        """
+        self.wait()
+        self._swap()
+        try:
+            yield self.module
+        finally:
+            self._swap()
+
+    def _swap(self):
+        for param, average in zip(self.params, self.averages):
+            param.data, average.data = average.data, param.data
+
+    def __getstate__(self):
+        # cuda streams can not be pickled.
+        self.wait()
+        state = self.__dict__.copy()
+        state["_stream"] = None
+        return state
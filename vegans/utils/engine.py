@@ -0,0 +1,218 @@
+import torch
+
+from concurrent.futures import ThreadPoolExecutor
+from vegans.utils.callbacks import TrainingState, CallbackList
+from vegans.utils.profiling import NoProfiler, ThroughputMeter
+
+
+class TrainingEngine():
+    """ Training loop shared by all conditional and unconditional models.
+
+    Every step the next batch is fetched, copied to the device together with newly sampled noise and each network
+    is updated `schedule[name]` times in the order of `model.neural_nets`. The losses are computed with
+    `model.calculate_losses(**inputs, who=name)` where `inputs` contains "X_batch", "Z_batch" and, for conditional
+    models, "y_batch". Everything else (printing, saving, logging) is done by callbacks.
+
+    Networks which a model declares as independent in `model._independent_networks` (e.g. the two adversaries of
+    the CycleGAN, which only see detached fakes) can be updated concurrently with `concurrent=True`. Each of them
+    is then updated in its own thread of a thread pool (torch releases the GIL in its kernels) and, on cuda, on its
+    own stream. Networks of a group must be consecutive in `model.neural_nets`, otherwise they are updated
+    sequentially. Buffers of shared networks (e.g. batch norm statistics of a generator used by both
+    adversaries) are then updated from several threads.
+
+    Parameters
+    ----------
+    model : AbstractGenerativeModel
+        Model to train. Provides `neural_nets`, `sample`, `calculate_losses`, `_zero_grad`, `_backward` and `_step`.
+    schedule : dict
+        Number of updates per batch for every network, i.e. {"Generator": 5, "Adversary": 1}.
+    conditional : bool, optional
+        If True, the data loader returns (X, y) batches and `y` is passed as "y_batch" to the model.
+    callbacks : utils.callbacks.CallbackList, optional
+        Callbacks called during training.
+    profiler : utils.profiling.PhaseProfiler, optional
+        Records the time spent in every phase of the loop.
+    meter : utils.profiling.ThroughputMeter, optional
+        Tracks throughput and remaining time. Created in `run` if not given.
+    concurrent : bool, optional
+        Update independent networks concurrently.
+    """
+    def __init__(self, model, schedule, conditional=False, callbacks=None, profiler=None, meter=None, concurrent=False):
+        self.model = model
+        self.schedule = schedule
+        self.conditional = conditional
+        self.profiler = NoProfiler() if profiler is None else profiler
+        self.callbacks = CallbackList(callbacks=[], profiler=self.profiler) if callbacks is None else callbacks
+        self.meter = meter
+        self.stages = self._create_stages(concurrent=concurrent)
+        self._executor = None
+        self._streams = {}
+
+    def _create_stages(self, concurrent):
+        """ Splits the networks into stages which are updated one after another. All networks of a stage are updated
+        concurrently. Without concurrency every network is its own stage.
+        """
+        names = list(self.model.neural_nets)
+        if not concurrent:
+            return [(name, ) for name in names]
+        group_of = {}
+        for group in getattr(self.model, "_independent_networks", []):
+            for name in group:
+                group_of[name] = tuple(group)
+        stages = []
+        for name in names:
+            previous = stages[-1] if stages else ()
+            if previous and group_of.get(name) is not None and group_of.get(name) == group_of.get(previous[0]):
+                stages[-1] = previous + (name, )
+            else:
+                stages.append((name, ))
+        return stages
+
+    def prepare_batch(self, batch):
+        """ Copies the batch to the device and samples the noise. Returns the keyword arguments of `calculate_losses`.
+        """
+        device = self.model.device
+        if self.conditional:
+            X, y = batch
+            X = X.to(device).float()
+            return {"X_batch": X, "Z_batch": self.model.sample(n=len(X)), "y_batch": self.model._prepare_labels(y)}
+        X = batch.to(device).float()
+        return {"X_batch": X, "Z_batch": self.model.sample(n=len(X))}
+
+    def train_step(self, inputs, state):
+        """ Updates all networks on one batch according to the schedule.
+        """
+        for stage in self.stages:
+            if len(stage) == 1:
+                self._update_network(name=stage[0], inputs=inputs, state=state)
+            else:
+                self._update_concurrently(names=stage, inputs=inputs, state=state)
+
+    def _update_network(self, name, inputs, state):
+        model = self.model
+        profiler = self.profiler
+        for _ in range(self.schedule[name]):
+            with profiler.phase("losses/" + name):
+                model._losses = model.calculate_losses(**inputs, who=name)
+            with profiler.phase("backward/" + name):
+                model._zero_grad(who=name)
+                model._backward(who=name)
+            with profiler.phase("step/" + name):
+                model._step(who=name)
+            if self.callbacks.has_step_callbacks:
+                self.callbacks.on_step(model=model, network=name, state=state)
+
+    def _update_concurrently(self, names, inputs, state):
+        model = self.model
+        current_stream = torch.cuda.current_stream() if self._streams else None
+
+        def update(name):
+            # `model._losses` is shared between the threads, so the losses are kept locally.
+            for _ in range(self.schedule[name]):
+                losses = model.calculate_losses(**inputs, who=name)
+                model._zero_grad(who=name)
+                losses[name].backward(retain_graph=True)
+                model._step(who=name)
+            return losses
+
+        def update_on_stream(name):
+            stream = self._streams[name]
+            stream.wait_stream(current_stream)
+            with torch.cuda.stream(stream):
+                return update(name=name)
+
+        with self.profiler.phase("concurrent/" + "+".join(names)):
+            futures = [
+                self._executor.submit(update_on_stream if self._streams else update, name) for name in names
+            ]
+            model._losses = {}
+            for future in futures:
+                model._losses.update(future.result())
+            for name in names if self._streams else []:
+                current_stream.wait_stream(self._streams[name])
+        if self.callbacks.has_step_callbacks:
+            for name in names:
+                for _ in range(self.schedule[name]):
+                    self.callbacks.on_step(model=model, network=name, state=state)
+
+    def _start_workers(self):
+        max_workers = max(len(stage) for stage in self.stages)
+        if max_workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+            if self.model.device == "cuda" and torch.cuda.is_available():
+                self._streams = {
+                    name: torch.cuda.Stream() for stage in self.stages if len(stage) > 1 for name in stage
+                }
+
+    def _stop_workers(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._streams = {}
+
+    def run(self, train_dataloader, epochs, test_inputs=None, writer_train=None, writer_test=None):
+        """ Trains the model for `epochs` passes over `train_dataloader`.
+
+        Parameters
+        ----------
+        train_dataloader : utils.BatchStream
+            Training data. Its length defines the number of batches per epoch.
+        epochs : int
+            Number of epochs.
+        test_inputs : dict, optional
+            Fixed test batch handed to the callbacks, i.e. {"X_batch": X_test} and "y_batch" for conditional models.
+        writer_train, writer_test : torch.utils.tensorboard.SummaryWriter, optional
+            Tensorboard writers handed to the callbacks.
+
+        Returns
+        -------
+        utils.callbacks.TrainingState
+            State after the last step.
+        """
+        model = self.model
+        profiler = self.profiler
+        callbacks = self.callbacks
+        max_batches = len(train_dataloader)
+        state = TrainingState(
+            max_epochs=epochs, max_batches=max_batches, test_inputs=test_inputs,
+            writer_train=writer_train, writer_test=writer_test
+        )
+        if self.meter is None:
+            self.meter = ThroughputMeter(total_steps=epochs*max_batches, device=model.device)
+        self._start_workers()
+        try:
+            profiler.start()
+            callbacks.on_train_begin(model=model, state=state)
+            self.meter.start()
+            for epoch in range(epochs):
+                print("---"*20)
+                print("EPOCH:", epoch+1)
+                print("---"*20)
+                state.epoch = epoch
+                batches = iter(train_dataloader)
+                for batch in range(1, max_batches+1):
+                    state.batch = batch
+                    state.step = epoch*max_batches + batch
+                    with profiler.phase("data"):
+                        batch_data = next(batches)
+                    self.meter.mark("data")
+                    with profiler.phase("h2d"):
+                        state.inputs = self.prepare_batch(batch=batch_data)
+                    self.train_step(inputs=state.inputs, state=state)
+                    self.meter.mark("train")
+
+                    callbacks.on_batch_end(model=model, state=state)
+                    self.meter.end_step(nr_samples=len(state.inputs["X_batch"]))
+                    profiler.step()
+                    if state.stop_training:
+                        break
+                callbacks.on_epoch_end(model=model, state=state)
+                if state.stop_training:
+                    print("Training stopped by a callback after step {}.".format(state.step))
+                    break
+
+            callbacks.on_train_end(model=model, state=state)
+            profiler.stop()
+        finally:
+            self._stop_workers()
+        return state
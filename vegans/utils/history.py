@@ -0,0 +1,170 @@
+import torch
+import inspect
+
+import numpy as np
+
+
+class LossHistory():
+    """ Columnar storage for the losses logged during training.
+
+    Every logging event appends one row containing all loss columns. Rows are kept as a single stacked tensor
+    on the device of the losses and are only copied to the host every `flush_every` events (or when the history
+    is read). This replaces one `loss.item()` synchronisation per loss and event by one copy per flush.
+    On the host the rows are written into preallocated numpy buffers which grow by doubling.
+
+    Reading is compatible with the former dictionary structure {mode: {loss_name: values}}, i.e.
+    `history["Train"]["Generator"]` returns a numpy view on the column.
+
+    Parameters
+    ----------
+    columns : list
+        Names of the logged losses.
+    modes : list, optional
+        Modes for which losses are logged, e.g. ["Train", "Test"].
+    capacity : int, optional
+        Number of rows preallocated per mode.
+    flush_every : int, optional
+        Number of logging events after which the pending rows are copied to the host.
+    """
+    def __init__(self, columns, modes=("Train", ), capacity=1024, flush_every=64):
+        self.columns = list(columns)
+        self.modes = list(modes)
+        self.flush_every = flush_every
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        capacity = max(int(capacity), 1)
+        self._values = {mode: np.empty((capacity, len(self.columns))) for mode in self.modes}
+        self._steps = {mode: np.empty(capacity, dtype=np.int64) for mode in self.modes}
+        self._sizes = {mode: 0 for mode in self.modes}
+        self._pending = {mode: [] for mode in self.modes}
+
+    def append(self, mode, losses, step=None):
+        """ Append one row of losses without synchronising with the device.
+
+        Parameters
+        ----------
+        mode : str
+            One of `self.modes`.
+        losses : dict
+            Dictionary containing a scalar tensor (or float) for every column.
+        step : int, optional
+            Training step of the logging event. Stored as -1 if None.
+        """
+        row = torch.stack([torch.as_tensor(losses[name]).detach().reshape(()).float() for name in self.columns])
+        self._pending[mode].append((-1 if step is None else step, row))
+        if len(self._pending[mode]) >= self.flush_every:
+            self.flush(mode=mode)
+
+    def flush(self, mode=None):
+        """ Copy all pending rows to the host buffers.
+        """
+        modes = self.modes if mode is None else [mode]
+        for mode in modes:
+            pending = self._pending[mode]
+            if len(pending) == 0:
+                continue
+            rows = torch.stack([row for _, row in pending]).cpu().numpy()
+            self._reserve(mode=mode, nr_rows=len(rows))
+            start = self._sizes[mode]
+            end = start + len(rows)
+            self._values[mode][start:end] = rows
+            self._steps[mode][start:end] = [step for step, _ in pending]
+            self._sizes[mode] = end
+            self._pending[mode] = []
+
+    def _reserve(self, mode, nr_rows):
+        size = self._sizes[mode]
+        capacity = len(self._steps[mode])
+        if size + nr_rows > capacity:
+            capacity = max(size + nr_rows, 2*capacity)
+            values = np.empty((capacity, len(self.columns)))
+            values[:size] = self._values[mode][:size]
+            steps = np.empty(capacity, dtype=np.int64)
+            steps[:size] = self._steps[mode][:size]
+            self._values[mode] = values
+            self._steps[mode] = steps
+
+    #########################################################################
+    # Reading
+    #########################################################################
+    def get_steps(self, mode):
+        """ Returns the training steps of all logged rows for `mode`.
+        """
+        self.flush(mode=mode)
+        return self._steps[mode][:self._sizes[mode]]
+
+    def aggregate(self, mode, window, agg=None):
+        """ Aggregate consecutive windows of `window` rows. An incomplete last window is dropped.
+
+        Parameters
+        ----------
+        mode : str
+            One of `self.modes`.
+        window : int
+            Number of rows per window.
+        agg : callable, optional
+            Aggregation function. Default is np.mean. Called once with `axis=1` if its signature accepts
+            `axis`, otherwise once per window and column.
+
+        Returns
+        -------
+        dict
+            Dictionary with one array of aggregated values per column.
+        """
+        if agg is None:
+            agg = np.mean
+        self.flush(mode=mode)
+        nr_windows = self._sizes[mode] // window
+        blocks = self._values[mode][:nr_windows*window].reshape(nr_windows, window, len(self.columns))
+        if _accepts_axis(agg):
+            aggregated = np.asarray(agg(blocks, axis=1))
+        else:
+            aggregated = np.array([
+                [agg(blocks[i, :, j]) for j in range(len(self.columns))] for i in range(nr_windows)
+            ]).reshape(nr_windows, len(self.columns))
+        return {name: aggregated[:, i] for name, i in self._column_index.items()}
+
+    def to_dataframe(self):
+        """ Returns all logged losses as pandas.DataFrame with the columns "mode", "step" and one per loss.
+        """
+        import pandas as pd
+        frames = []
+        for mode in self.modes:
+            frame = pd.DataFrame(self[mode])
+            frame.insert(0, "step", self.get_steps(mode=mode))
+            frame.insert(0, "mode", mode)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    def to_csv(self, path):
+        """ Export all logged losses to a .csv file.
+        """
+        self.to_dataframe().to_csv(path, index=False)
+
+    def to_parquet(self, path):
+        """ Export all logged losses to a .parquet file. Requires a parquet engine like `pyarrow`.
+        """
+        self.to_dataframe().to_parquet(path, index=False)
+
+    def __getitem__(self, mode):
+        self.flush(mode=mode)
+        size = self._sizes[mode]
+        return {name: self._values[mode][:size, i] for name, i in self._column_index.items()}
+
+    def __contains__(self, mode):
+        return mode in self.modes
+
+    def keys(self):
+        return list(self.modes)
+
+    def items(self):
+        return [(mode, self[mode]) for mode in self.modes]
+
+
+def _accepts_axis(func):
+    """ Returns True if `func` can be called with an `axis` keyword argument.
+    """
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(param.name == "axis" or param.kind == param.VAR_KEYWORD for param in parameters)
@@ -0,0 +1,152 @@
+import torch
+
+import numpy as np
+
+
+def latent_sweep(base, dim, values):
+    """ Repeats every latent vector in `base` once per value and sets dimension `dim` to the value, e.g. to sweep
+    one code of the InfoGAN.
+
+    Parameters
+    ----------
+    base : torch.Tensor
+        Batch of latent vectors (or codes) of shape [n, *z_dim].
+    dim : int
+        Index of the swept dimension (of the flattened vectors).
+    values : list, np.array or torch.Tensor
+        Values of the swept dimension.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of shape [n*len(values), *z_dim]. The values vary fastest.
+    """
+    values = torch.as_tensor(values, dtype=base.dtype, device=base.device)
+    sweep = base.repeat_interleave(len(values), dim=0)
+    sweep.reshape(len(sweep), -1)[:, dim] = values.repeat(len(base))
+    return sweep
+
+
+def latent_grid(base, dims=(0, 1), limits=(-2, 2), nr_points=10):
+    """ Regular grid over two latent dimensions while all other dimensions are fixed to `base`.
+
+    Parameters
+    ----------
+    base : torch.Tensor
+        Latent vector of shape [*z_dim].
+    dims : tuple, optional
+        Indices of the dimension along the columns (x) and along the rows (y) of the grid.
+    limits : tuple, optional
+        Minimum and maximum value of both dimensions.
+    nr_points : int, optional
+        Number of points per dimension.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of shape [nr_points**2, *z_dim] in row-major order. The first row has the largest y value, so
+        the mosaic of the outputs (see `make_mosaic`) has the usual orientation of a coordinate system.
+    """
+    values = np.linspace(limits[0], limits[1], nr_points)
+    rows = latent_sweep(base=base.unsqueeze(0), dim=dims[1], values=values[::-1].copy())
+    return latent_sweep(base=rows, dim=dims[0], values=values)
+
+
+def latent_interpolation(start, end, nr_steps=10, spherical=False):
+    """ Path between two latent vectors.
+
+    Parameters
+    ----------
+    start, end : torch.Tensor
+        Latent vectors of shape [*z_dim].
+    nr_steps : int, optional
+        Number of points on the path including `start` and `end`.
+    spherical : bool, optional
+        If True, interpolate along the great circle (slerp), which keeps the norm typical for gaussian latent vectors.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of shape [nr_steps, *z_dim].
+    """
+    shape = start.shape
+    start, end = start.reshape(1, -1), end.reshape(1, -1)
+    weights = torch.linspace(0, 1, nr_steps, dtype=start.dtype, device=start.device).reshape(-1, 1)
+    if spherical:
+        cos_omega = torch.sum(start*end) / (torch.norm(start)*torch.norm(end))
+        omega = torch.acos(torch.clamp(cos_omega, -1, 1))
+        if omega.abs() > 1e-6:
+            path = (torch.sin((1 - weights)*omega)*start + torch.sin(weights*omega)*end) / torch.sin(omega)
+            return path.reshape(nr_steps, *shape)
+    path = (1 - weights)*start + weights*end
+    return path.reshape(nr_steps, *shape)
+
+
+def inference_mode():
+    """ `torch.inference_mode()` if available (torch >= 1.9), otherwise `torch.no_grad()`.
+    """
+    if hasattr(torch, "inference_mode"):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+def generate_in_batches(model, batch_size=256, **inputs):
+    """ Generates the outputs for many inputs with chunked forward passes in evaluation and inference mode
+    (see `inference_mode`).
+
+    Parameters
+    ----------
+    model : AbstractGenerativeModel
+        Trained model. `model.generate(**chunk)` is called for chunks of at most `batch_size` inputs.
+    batch_size : int, optional
+        Maximum number of inputs per forward pass.
+    **inputs
+        Inputs of `model.generate`, e.g. `z=...` (and `y=...` for conditional models, `c=...` for the InfoGAN).
+        All must have the same length.
+
+    Returns
+    -------
+    torch.Tensor
+        Outputs on the cpu.
+    """
+    nr_inputs = set(len(value) for value in inputs.values())
+    assert len(nr_inputs) == 1, "All inputs must have the same length. Given: {}.".format(
+        {name: len(value) for name, value in inputs.items()}
+    )
+    nr_inputs = nr_inputs.pop()
+    inputs = {name: torch.as_tensor(value).to(model.device) for name, value in inputs.items()}
+    was_training = model.training
+    model.eval()
+    try:
+        outputs = []
+        with inference_mode():
+            for start in range(0, nr_inputs, batch_size):
+                chunk = {name: value[start:start+batch_size] for name, value in inputs.items()}
+                outputs.append(torch.as_tensor(model.generate(**chunk)).cpu())
+    finally:
+        if was_training:
+            model.train()
+    return torch.cat(outputs, dim=0)
+
+
+def make_mosaic(images, nrow):
+    """ Arranges a batch of images in a grid with `nrow` rows (filled row by row).
+
+    Parameters
+    ----------
+    images : torch.Tensor
+        Images of shape [n, channels, height, width] where n is divisible by `nrow`.
+    nrow : int
+        Number of rows.
+
+    Returns
+    -------
+    torch.Tensor
+        Single image of shape [channels, nrow*height, n/nrow*width].
+    """
+    nr_images, channels, height, width = images.shape
+    assert nr_images % nrow == 0, "Number of images ({}) must be divisible by `nrow` ({}).".format(nr_images, nrow)
+    ncol = nr_images // nrow
+    return images.reshape(nrow, ncol, channels, height, width).permute(2, 0, 3, 1, 4).reshape(
+        channels, nrow*height, ncol*width
+    )
@@ -1,4 +1,7 @@
 import torch
+
+import numpy as np
+
 from torch.nn import Module
 
 class LayerPrintSize(Module):
@@ -145,3 +148,48 @@ class LayerResidualConvBlock(Module):
             "LayerResidualConvBlock(in_channels={}, out_channels={}, skip_layers={}, kernel_size={})"
             .format(self.in_channels, self.out_channels, self.skip_layers, self.kernel_size)
         )
+
+
+class LayerFusedHeads(Module):
+    """ Several linear heads on top of the same input, i.e. mu and log variance of a variational encoder.
+
+    All heads share one `Linear` layer, so the input is flattened once and all statistics are computed with a single
+    matrix multiplication. The output is split into (reshaped) views, one per head.
+
+    Parameters
+    ----------
+    in_features : int, list, tuple
+        Shape of the input without the batch dimension.
+    out_shapes : list
+        Output shape (int, list or tuple) of every head.
+    activations : list, optional
+        Activation (torch.nn.Module or None) applied to the output of every head.
+    """
+    def __init__(self, in_features, out_shapes, activations=None):
+        super().__init__()
+        self.in_features = int(np.prod(in_features))
+        self.out_shapes = [(shape, ) if isinstance(shape, int) else tuple(shape) for shape in out_shapes]
+        self.out_sizes = [int(np.prod(shape)) for shape in self.out_shapes]
+        if activations is None:
+            activations = [None]*len(self.out_shapes)
+        assert len(activations) == len(self.out_shapes), (
+            "Need one activation per head. Given: {} activations for {} heads.".format(len(activations), len(self.out_shapes))
+        )
+        self.linear = torch.nn.Linear(self.in_features, sum(self.out_sizes))
+        self.activations = torch.nn.ModuleList(
+            [torch.nn.Identity() if activation is None else activation for activation in activations]
+        )
+
+    def forward(self, x):
+        x = self.linear(torch.flatten(x, start_dim=1))
+        heads = torch.split(x, self.out_sizes, dim=1)
+        return tuple(
+            activation(head.reshape(-1, *shape))
+            for head, shape, activation in zip(heads, self.out_shapes, self.activations)
+        )
+
+    def __str__(self):
+        return "LayerFusedHeads(in_features={}, out_shapes={})".format(self.in_features, self.out_shapes)
+
+    def __repr__(self):
+        return "LayerFusedHeads(in_features={}, out_shapes={})".format(self.in_features, self.out_shapes)
@@ -5,7 +5,8 @@ from vegans.utils.loading.MNISTLoader import MNISTLoader
 from vegans.utils.loading.DatasetLoader import DatasetLoader, DatasetMetaData
 
 class CIFAR10Loader(MNISTLoader):
-    def __init__(self, root=None):
+    def __init__(self, root=None, one_hot=True):
+        self.one_hot = one_hot
         self.path_data = "cifar10_data.pickle"
         self.path_targets = "cifar10_targets.pickle"
         m5hashes = {
@@ -16,16 +17,21 @@ class CIFAR10Loader(MNISTLoader):
         DatasetLoader.__init__(self, metadata=metadata, root=root)
 
     @staticmethod
-    def _preprocess(X_train, y_train, X_test, y_test):
+    def _preprocess(X_train, y_train, X_test, y_test, one_hot=True):
         """ Preprocess mnist by normalizing and padding.
+
+        Labels are one-hot encoded if `one_hot`, otherwise returned as integer class ids of shape [nr_samples].
         """
         max_number = X_train.max()
         X_train = X_train / max_number
         X_test = X_test / max_number
 
-        if y_train is not None:
+        if y_train is not None and one_hot:
             y_train = np.eye(10)[y_train.reshape(-1)]
             y_test = np.eye(10)[y_test.reshape(-1)]
+        elif y_train is not None:
+            y_train = y_train.reshape(-1).astype(np.int64)
+            y_test = y_test.reshape(-1).astype(np.int64)
         return X_train, y_train, X_test, y_test
 
     def load_generator(self, x_dim=(3, 32, 32), z_dim=64, y_dim=10):
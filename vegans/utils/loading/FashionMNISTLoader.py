@@ -4,7 +4,8 @@ from vegans.utils.loading.MNISTLoader import MNISTLoader
 from vegans.utils.loading.DatasetLoader import DatasetLoader, DatasetMetaData
 
 class FashionMNISTLoader(MNISTLoader):
-    def __init__(self, root=None):
+    def __init__(self, root=None, one_hot=True):
+        self.one_hot = one_hot
         self.path_data = "fashionmnist_data.pickle"
         self.path_targets = "fashionmnist_targets.pickle"
         m5hashes = {
@@ -8,7 +8,8 @@ from vegans.utils.loading.DatasetLoader import DatasetLoader, DatasetMetaData
 
 class MNISTLoader(DatasetLoader):
 
-    def __init__(self, root=None):
+    def __init__(self, root=None, one_hot=True):
+        self.one_hot = one_hot
         self.path_data = "mnist_data.pickle"
         self.path_targets = "mnist_targets.pickle"
         m5hashes = {
@@ -26,7 +27,9 @@ class MNISTLoader(DatasetLoader):
             path=os.path.join(self.path, self.path_targets), m5hash=self._metadata.m5hashes["targets"]
         )
 
-        X_train, y_train, X_test, y_test = self._preprocess(X_train, y_train, X_test, y_test)
+        X_train, y_train, X_test, y_test = self._preprocess(
+            X_train, y_train, X_test, y_test, one_hot=getattr(self, "one_hot", True)
+        )
         return X_train, y_train, X_test, y_test
 
     def _load_from_path(self, path, m5hash):
@@ -37,8 +40,10 @@ class MNISTLoader(DatasetLoader):
         return train, test
 
     @staticmethod
-    def _preprocess(X_train, y_train, X_test, y_test):
+    def _preprocess(X_train, y_train, X_test, y_test, one_hot=True):
         """ Preprocess mnist by normalizing and padding.
+
+        Labels are one-hot encoded if `one_hot`, otherwise returned as integer class ids of shape [nr_samples].
         """
         max_number = X_train.max()
         X_train = X_train / max_number
@@ -47,9 +52,12 @@ class MNISTLoader(DatasetLoader):
         X_test = X_test / max_number
         X_test = np.pad(X_test, [(0, 0), (2, 2), (2, 2)], mode='constant').reshape(10000, 1, 32, 32)
 
-        if y_train is not None:
+        if y_train is not None and one_hot:
             y_train = np.eye(10)[y_train.reshape(-1)]
             y_test = np.eye(10)[y_test.reshape(-1)]
+        elif y_train is not None:
+            y_train = y_train.reshape(-1).astype(np.int64)
+            y_test = y_test.reshape(-1).astype(np.int64)
         return X_train, y_train, X_test, y_test
 
     def load_generator(self, x_dim=(1, 32, 32), z_dim=32, y_dim=10):
@@ -0,0 +1,194 @@
+import os
+import queue
+import torch
+import threading
+
+import numpy as np
+
+from matplotlib.figure import Figure
+from torchvision.utils import make_grid
+from vegans.utils.plotting import draw_images
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+class AsyncLogger():
+    """ Executes image rendering, PNG encoding and tensorboard writes on a background thread.
+
+    The training loop only hands over detached cpu copies of the tensors to be logged. All matplotlib work
+    is done on `matplotlib.figure.Figure` objects without pyplot, which is not thread-safe. Pending events are
+    processed in batches and every involved `SummaryWriter` is flushed once per batch.
+    The loss plot is kept alive between calls and only the newly logged values are appended to its lines.
+
+    Parameters
+    ----------
+    folder : str
+        Folder in which the images and the loss plot are stored.
+    max_queue_size : int, optional
+        Maximum number of pending events. If the worker falls behind, logging blocks until an event is processed,
+        which bounds the memory held by pending images.
+    """
+    def __init__(self, folder, max_queue_size=16):
+        self.folder = folder
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._error = None
+        self._loss_plot = None
+        self._nr_plotted_losses = {}
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    #########################################################################
+    # Called from the training loop
+    #########################################################################
+    def log_images(self, images, step, writer=None, labels=None):
+        """ Save images in `folder/images/image_{step}.png` and in tensorboard if `writer` is not None.
+        """
+        if not isinstance(images, torch.Tensor):
+            images = torch.from_numpy(images)
+        self._put(self._write_images, images.detach().cpu(), step, writer, labels)
+
+    def log_scalars(self, scalars, step, writer):
+        """ Add all values of the `scalars` dictionary to tensorboard.
+
+        Tensors are converted to floats by the worker, so no device synchronisation happens in the training loop.
+        """
+        scalars = {
+            name: value.detach() if isinstance(value, torch.Tensor) else value for name, value in scalars.items()
+        }
+        self._put(self._write_scalars, scalars, step, writer)
+
+    def plot_losses(self, logged_losses, path):
+        """ Update the loss plot with all values logged since the last call and save it to `path`.
+
+        Parameters
+        ----------
+        logged_losses : dict
+            Dictionary of the form {mode: {loss_type: [losses]}}. See `vegans.utils.plot_losses`.
+        path : str
+            Target file of the plot.
+        """
+        new_losses = {}
+        for mode, loss_dict in logged_losses.items():
+            new_losses[mode] = {}
+            for loss_type, losses in loss_dict.items():
+                nr_plotted = self._nr_plotted_losses.get((mode, loss_type), 0)
+                new_losses[mode][loss_type] = list(losses[nr_plotted:])
+                self._nr_plotted_losses[(mode, loss_type)] = len(losses)
+        self._put(self._write_losses_plot, new_losses, path)
+
+    def close(self):
+        """ Process all pending events and stop the worker.
+
+        Raises
+        ------
+        Exception
+            The first exception raised by the worker, if any.
+        """
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _put(self, function, *args):
+        assert self._worker is not None, "AsyncLogger is already closed."
+        self._queue.put((function, args))
+
+    #########################################################################
+    # Executed by the worker
+    #########################################################################
+    def _work(self):
+        stop = False
+        while not stop:
+            events = [self._queue.get()]
+            while not self._queue.empty():
+                events.append(self._queue.get_nowait())
+
+            writers = []
+            for event in events:
+                if event is None:
+                    stop = True
+                    continue
+                function, args = event
+                try:
+                    writer = function(*args)
+                except Exception as e:
+                    if self._error is None:
+                        self._error = e
+                    continue
+                if writer is not None and writer not in writers:
+                    writers.append(writer)
+            for writer in writers:
+                writer.flush()
+
+    def _write_images(self, images, step, writer, labels):
+        if writer is not None:
+            grid = make_grid(images)
+            writer.add_image('images', grid, step)
+
+        fig = Figure(figsize=(8, 8))
+        FigureCanvasAgg(fig)
+        draw_images(fig=fig, images=images.numpy(), labels=labels)
+        path = os.path.join(self.folder, "images/image_{}.png".format(step))
+        fig.savefig(path)
+        print("Images saved as {}.".format(path))
+        return writer
+
+    def _write_scalars(self, scalars, step, writer):
+        for name, value in scalars.items():
+            if isinstance(value, torch.Tensor):
+                value = value.item()
+            writer.add_scalar(name, value, step)
+        return writer
+
+    def _write_losses_plot(self, new_losses, path):
+        if self._loss_plot is None:
+            self._loss_plot = _IncrementalLossPlot(loss_types=list(new_losses["Train"].keys()))
+        self._loss_plot.update(new_losses)
+        self._loss_plot.fig.savefig(path)
+
+    def __getstate__(self):
+        # The worker thread and queue can not be pickled, e.g. when the model is saved during training.
+        return {"folder": self.folder, "_error": None, "_loss_plot": None, "_nr_plotted_losses": {}, "_worker": None}
+
+
+class _IncrementalLossPlot():
+    """ Loss plot with one subplot per loss type and one line per mode ("Train", "Test").
+
+    The figure, axes and lines are created once. Every update only appends the new values to the lines.
+    """
+    def __init__(self, loss_types):
+        n = len(loss_types)
+        nrows = int(np.sqrt(n))
+        ncols = int(np.ceil(n / nrows))
+        self.fig = Figure(figsize=(12, 9))
+        FigureCanvasAgg(self.fig)
+        axs = np.ravel(self.fig.subplots(nrows=nrows, ncols=ncols))
+        for ax, loss_type in zip(axs, loss_types):
+            ax.set_xlabel('Iterations')
+            ax.set_title(loss_type)
+            ax.set_facecolor("#ecffe7")
+        for ax in axs[n:]:
+            ax.axis("off")
+        self.fig.tight_layout()
+        self.axes = dict(zip(loss_types, axs))
+        self.lines = {}
+        self.values = {}
+
+    def update(self, new_losses):
+        for mode, loss_dict in new_losses.items():
+            for loss_type, losses in loss_dict.items():
+                if loss_type not in self.axes:
+                    continue
+                key = (mode, loss_type)
+                if key not in self.lines:
+                    ax = self.axes[loss_type]
+                    self.lines[key], = ax.plot([], [], lw=2, label=mode)
+                    self.values[key] = []
+                    ax.legend()
+                self.values[key].extend(losses)
+                self.lines[key].set_data(np.arange(len(self.values[key])), self.values[key])
+        for ax in self.axes.values():
+            ax.relim()
+            ax.autoscale_view()
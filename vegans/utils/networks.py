@@ -14,6 +14,10 @@ class NeuralNetwork(Module):
 
     These networks form the building blocks for the generative adversarial networks.
     Mainly responsible for consistency checks.
+
+    The output shape is inferred lazily on first access of `output_size`. If `secure=True` it is inferred
+    immediately to validate the architecture. Inference uses meta tensors if supported by the installed torch
+    version, otherwise a single sample forward pass without gradients. The result is stored on the instance.
     """
     def __init__(self, network, name, input_size, device, ngpu, secure):
         super(NeuralNetwork, self).__init__()
@@ -48,7 +52,15 @@ class NeuralNetwork(Module):
                 self.network = torch.nn.DataParallel(self.network)
                 self.network = network.to(self.device)
 
-        self.output_size = self._get_output_shape()[1:]
+        self._output_size = None
+        if self.secure:
+            self._output_size = self._get_output_shape()[1:]
+
+    @property
+    def output_size(self):
+        if getattr(self, "_output_size", None) is None:
+            self._output_size = self._get_output_shape()[1:]
+        return self._output_size
 
     def forward(self, x):
         output = self.network(x)
@@ -104,8 +116,39 @@ class NeuralNetwork(Module):
             raise NotImplemented("Network must be Sequential or Object.")
 
     def _get_output_shape(self):
-        sample_input = torch.rand([2, *self.input_size]).to(self.device)
-        return tuple(self.network(sample_input).shape)
+        """ Infer the output shape (including a batch dimension of 1) of the network.
+
+        Tries a forward pass on meta tensors (no memory is allocated and no computation is performed) and falls
+        back to a forward pass of one sample in evaluation mode without gradients. Shapes are not shared between
+        instances, because the output shape of custom architectures may depend on attributes not shown in `repr`.
+        """
+        try:
+            return self._get_output_shape_meta()
+        except Exception:
+            return self._get_output_shape_forward()
+
+    def _get_output_shape_meta(self):
+        from torch.func import functional_call
+        meta_tensors = {
+            name: torch.empty_like(tensor, device="meta")
+            for name, tensor in list(self.network.named_parameters()) + list(self.network.named_buffers())
+        }
+        sample_input = torch.empty([1, *self.input_size], device="meta")
+        with torch.no_grad():
+            output = functional_call(self.network, meta_tensors, (sample_input, ))
+        return (1, *output.shape[1:])
+
+    def _get_output_shape_forward(self):
+        # Evaluation mode allows a batch of one with batch normalization and leaves running statistics untouched.
+        was_training = self.network.training
+        self.network.eval()
+        try:
+            sample_input = torch.rand([1, *self.input_size]).to(self.device)
+            with torch.no_grad():
+                output = self.network(sample_input)
+        finally:
+            self.network.train(was_training)
+        return (1, *output.shape[1:])
 
 
     #########################################################################
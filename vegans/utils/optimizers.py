@@ -0,0 +1,94 @@
+import inspect
+
+from collections.abc import MutableMapping
+
+
+def supports_implementation(optimizer, implementation):
+    """ Checks whether the optimizer class accepts the `implementation` ("foreach" or "fused") keyword.
+    """
+    optimizer = optimizer if isinstance(optimizer, type) else type(optimizer)
+    return implementation in inspect.signature(optimizer.__init__).parameters
+
+
+def rebuild_optimizer(optimizer, params=None, group_kwargs=None, **defaults):
+    """ Creates a new optimizer of the same type with the same parameter groups (including learning rates).
+
+    Parameters
+    ----------
+    optimizer : torch.optim.Optimizer
+        Optimizer to rebuild. Its state is not copied.
+    params : dict, optional
+        Mapping id(old parameter) -> new parameter, e.g. the memo of `copy.deepcopy`. By default the same
+        parameters are used.
+    group_kwargs : dict, optional
+        Values overwriting the ones of every parameter group, i.e. {"lr": 0.001}.
+    **defaults
+        Values overwriting the defaults of the optimizer.
+
+    Returns
+    -------
+    torch.optim.Optimizer
+        New optimizer.
+    """
+    param_groups = []
+    for group in optimizer.param_groups:
+        new_group = {key: value for key, value in group.items() if key != "params"}
+        new_group.update({} if group_kwargs is None else group_kwargs)
+        new_group["params"] = group["params"] if params is None else [params[id(param)] for param in group["params"]]
+        param_groups.append(new_group)
+    return type(optimizer)(param_groups, **dict(optimizer.defaults, **defaults))
+
+
+def join_optimizers(optimizers):
+    """ Creates one optimizer updating the parameter groups of all `optimizers` with a single call to `step()`.
+
+    With foreach or fused implementations all parameters are then updated by one set of multi-tensor kernels
+    instead of one set per optimizer. The parameter groups (and therefore the learning rates of every network)
+    and the per-parameter state, e.g. Adam's moments, are shared with the given optimizers, so updates with the
+    joint optimizer and with the single optimizers can be mixed.
+
+    Parameters
+    ----------
+    optimizers : list
+        Optimizers of the same type.
+
+    Returns
+    -------
+    torch.optim.Optimizer
+        Joint optimizer.
+    """
+    optimizers = list(optimizers)
+    types = set(type(optimizer) for optimizer in optimizers)
+    if len(types) != 1:
+        raise TypeError("Only optimizers of the same type can be joined. Given: {}.".format(types))
+    param_groups = [group for optimizer in optimizers for group in optimizer.param_groups]
+    joint = type(optimizers[0])([dict(group) for group in param_groups], **optimizers[0].defaults)
+    joint.param_groups = param_groups
+    joint.state = _SharedState(optimizers=optimizers)
+    return joint
+
+
+class _SharedState(MutableMapping):
+    """ Per-parameter state of a joint optimizer which is stored in the optimizer owning the parameter.
+    """
+    def __init__(self, optimizers):
+        self._optimizers = optimizers
+        self._owners = {
+            param: optimizer for optimizer in optimizers for group in optimizer.param_groups for param in group["params"]
+        }
+
+    def __getitem__(self, param):
+        # `optimizer.state` is a defaultdict, so missing entries are created as for a single optimizer.
+        return self._owners[param].state[param]
+
+    def __setitem__(self, param, value):
+        self._owners[param].state[param] = value
+
+    def __delitem__(self, param):
+        del self._owners[param].state[param]
+
+    def __iter__(self):
+        return (param for optimizer in self._optimizers for param in optimizer.state)
+
+    def __len__(self):
+        return sum(len(optimizer.state) for optimizer in self._optimizers)
@@ -1,33 +1,45 @@
-import os
 import torch
 
 import numpy as np
-import pandas as pd
-import matplotlib as mpl
-import vegans.utils as utils
 import matplotlib.pyplot as plt
 
+from vegans.utils.latent import latent_grid, generate_in_batches, make_mosaic
 
-def plot_2d_grid(model, nr_images=10, show=True):
-    image_dim = model.adversary.input_size[1]
-    the_max = 2
-    x_limit = np.linspace(-the_max, the_max, nr_images)
-    y_limit = np.linspace(the_max, -the_max, nr_images)
-    image = np.empty((image_dim*nr_images, image_dim*nr_images))
-    fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(9, 9))
 
-    for j, yi in enumerate(y_limit):
-        for i, xi in enumerate(x_limit):
-            # z_input = torch.randn(size=(3, *model.generator.input_size), requires_grad=False).to(model.device)
-            z_input = torch.Tensor([[xi, yi]]).to(model.device)
-            generated_image = model(z=z_input).cpu().detach().numpy()
-            image[i*image_dim:(i+1)*image_dim, j*image_dim:(j+1)*image_dim] = generated_image[0, 0, :, :]
-    ax.imshow(image, cmap="gray")
+def _to_image(image):
+    """ Converts a [channels, height, width] tensor into an array for `imshow`.
+    """
+    if image.shape[0] == 1:
+        return image[0].numpy()
+    return image.permute(1, 2, 0).numpy()
+
+
+def plot_2d_grid(model, nr_images=10, show=True, the_max=2, batch_size=256):
+    """ Plots the outputs of a model with a two dimensional latent space on a regular grid.
+
+    All grid points are generated with a few batched forward passes (see `utils.latent`).
+
+    Parameters
+    ----------
+    model : AbstractGenerativeModel
+        Trained model with `z_dim=(2, )` producing images.
+    nr_images : int, optional
+        Number of images per latent dimension.
+    show : bool, optional
+        Show the figure.
+    the_max : float, optional
+        The grid covers [-the_max, the_max] in both dimensions.
+    batch_size : int, optional
+        Maximum number of images per forward pass.
+    """
+    z_grid = latent_grid(
+        base=torch.zeros(model.z_dim), dims=(0, 1), limits=(-the_max, the_max), nr_points=nr_images
+    )
+    images = generate_in_batches(model, batch_size=batch_size, z=z_grid)
+    image = make_mosaic(images=images, nrow=nr_images)
+    fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(9, 9))
+    ax.imshow(_to_image(image), cmap="gray", extent=(-the_max, the_max, -the_max, the_max))
     ax.grid(False)
-    xticks = ax.get_xticks()[1:-1]
-    yticks = ax.get_yticks()[1:-1]
-    plt.xticks(xticks, np.round(np.linspace(-the_max, the_max, len(xticks)), 2))
-    plt.yticks(yticks, np.round(np.linspace(-the_max, the_max, len(yticks)), 2))
     if show:
         plt.show()
     return fig, ax
@@ -36,14 +48,14 @@ def plot_on_click(model):
     fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(9, 9))
     plt.plot([-2, -2, 2, 2, -2], [-2, 2, 2, -2, -2])
     ax.set_title("Latent space")
-    fig.canvas.mpl_connect('button_press_event', onclick)
+    fig.canvas.mpl_connect('button_press_event', lambda event: onclick(event, model=model))
     plt.show()
 
-def onclick(event):
-    z_input = torch.Tensor([[event.xdata, event.ydata]]).to(model.device)
-    generated_image = model(z=z_input).cpu().detach().numpy()
+def onclick(event, model):
+    z_input = torch.Tensor([[event.xdata, event.ydata]])
+    generated_image = generate_in_batches(model, z=z_input)
     fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(4, 4))
-    ax.imshow(generated_image[0, 0, :, :], cmap="gray", origin=None)
+    ax.imshow(_to_image(generated_image[0]), cmap="gray", origin=None)
     ax.set_title("(x, y) = ({}, {})".format(round(event.xdata, 2), round(event.ydata, 2)))
     plt.show()
 
@@ -56,5 +68,3 @@ if __name__ == '__main__':
     )
     plot_2d_grid(model=model, nr_images=20, show=False)
     plot_on_click(model=model)
-
-
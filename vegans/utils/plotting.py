@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 from vegans.utils.processing import invert_channel_order
 
@@ -31,6 +30,7 @@ def plot_losses(losses, show=True, share=False):
     plt.figure, plt.axis
         Created figure and axis objects.
     """
+    import matplotlib.pyplot as plt
     if share:
         fig, ax = plt.subplots(1, 1, figsize=(8, 8))
         for mode, loss_dict in losses.items():
@@ -76,6 +76,35 @@ def plot_images(images, labels=None, show=True, n=None):
     plt.figure, plt.axis
         Created figure and axis objects.
     """
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(8, 8))
+    axs = draw_images(fig=fig, images=images, labels=labels, n=n)
+    if show:
+        plt.show()
+    return fig, axs
+
+def draw_images(fig, images, labels=None, n=None):
+    """ Draw a number of input images with optional label into an existing figure.
+
+    Does not use the pyplot state machine, so it can be used on a `matplotlib.figure.Figure` outside
+    of the main thread.
+
+    Parameters
+    ----------
+    fig : matplotlib.figure.Figure
+        Empty figure to draw into.
+    images : np.array
+        Must be of shape [nr_samples, height, width] or [nr_samples, height, width, 3].
+    labels : np.array, optional
+        Array of labels used in the title.
+    n : None, optional
+        Number of images to be drawn, maximum is 36.
+
+    Returns
+    -------
+    np.array
+        Created axis objects.
+    """
     if len(images.shape)==4 and images.shape[1] == 3:
         images = invert_channel_order(images=images)
     elif len(images.shape)==4 and images.shape[1] == 1:
@@ -86,8 +115,7 @@ def plot_images(images, labels=None, show=True, n=None):
         n = 36
     nrows = int(np.sqrt(n))
     ncols = n // nrows
-    fig, axs = plt.subplots(nrows=nrows, ncols=ncols, figsize=(8, 8))
-    axs = np.ravel(axs)
+    axs = np.ravel(fig.subplots(nrows=nrows, ncols=ncols))
 
     for i, ax in enumerate(axs):
         ax.imshow(images[i])
@@ -96,9 +124,7 @@ def plot_images(images, labels=None, show=True, n=None):
             ax.set_title("Label: {}".format(labels[i]))
 
     fig.tight_layout()
-    if show:
-        plt.show()
-    return fig, axs
+    return axs
 
 def create_gif(source_path, target_path=None):
     """Create a GIF from images contained on the source path.
@@ -1,6 +1,6 @@
 import torch
 import numpy as np
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, IterableDataset
 
 
 class DataSet(Dataset):
@@ -17,9 +17,108 @@ class DataSet(Dataset):
         return self.X[index]
 
 
+class ArrayDataSet(IterableDataset):
+    """ Iterates over an array-like object in contiguous batches.
+
+    Contrary to `DataSet` no per-sample indexing and collating is performed. Only one slice `X[start:end]`
+    is read per batch, so arrays which are much larger than the available memory, e.g. `np.memmap`,
+    `np.load(path, mmap_mode="r")` or zarr / h5py arrays, are never loaded completely. Use it with
+    `torch.utils.data.DataLoader(dataset, batch_size=None)`.
+
+    Parameters
+    ----------
+    X : array-like
+        Object supporting `len()` and slicing along the first dimension.
+    y : array-like, optional
+        Labels with the same number of samples as `X`.
+    batch_size : int, optional
+        Number of samples per batch. The last batch might be smaller.
+    """
+    def __init__(self, X, y=None, batch_size=32):
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return int(np.ceil(len(self.X) / self.batch_size))
+
+    def __iter__(self):
+        for start in range(0, len(self.X), self.batch_size):
+            end = start + self.batch_size
+            X_batch = torch.from_numpy(np.array(self.X[start:end]))
+            if self.y is not None:
+                yield X_batch, torch.from_numpy(np.array(self.y[start:end]))
+            else:
+                yield X_batch
+
+
+class BatchStream():
+    """ Epoch-wise view on a data loader.
+
+    The epoch length is defined by a number of samples instead of by one pass over the data, so infinite
+    or unsized iterables can be used for training. Batches can be inspected with `peek()` before training,
+    e.g. for consistency checks. Peeked batches are buffered and returned by the next iteration instead
+    of being discarded.
+
+    Parameters
+    ----------
+    dataloader : iterable
+        Typically a torch.utils.data.DataLoader returning batches.
+    nr_samples : int, optional
+        Number of samples per epoch. If None, `len(dataloader)` batches make up one epoch.
+    """
+    def __init__(self, dataloader, nr_samples=None):
+        self.dataloader = dataloader
+        self._iterator = iter(dataloader)
+        self._buffer = []
+        if nr_samples is not None:
+            first_batch = self.peek()
+            batch_size = len(first_batch[0]) if isinstance(first_batch, (list, tuple)) else len(first_batch)
+            self.nr_batches = max(int(np.ceil(nr_samples / batch_size)), 1)
+        else:
+            try:
+                self.nr_batches = len(dataloader)
+            except TypeError:
+                self.nr_batches = None
+
+    def peek(self, index=0):
+        """ Returns an upcoming batch without consuming it.
+
+        Parameters
+        ----------
+        index : int, optional
+            Position of the batch relative to the next one, i.e. 0 returns the next batch.
+        """
+        while len(self._buffer) <= index:
+            self._buffer.append(self._next_batch())
+        return self._buffer[index]
+
+    def _next_batch(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._iterator = iter(self.dataloader)
+            return next(self._iterator)
+
+    def __len__(self):
+        if self.nr_batches is None:
+            raise TypeError("Number of batches per epoch unknown. Provide `nr_samples`.")
+        return self.nr_batches
+
+    def __iter__(self):
+        for _ in range(len(self)):
+            if len(self._buffer) > 0:
+                yield self._buffer.pop(0)
+            else:
+                yield self._next_batch()
+
+
 def concatenate(tensor1, tensor2):
     """ Concatenates two 2D or 4D tensors.
 
+    If a 2D tensor (e.g. a one-hot label) is concatenated with a 4D tensor (e.g. an image), it is broadcast to
+    the height and width of the image with an `expand` view. Only the output of the concatenation is allocated.
+
     Parameters
     ----------
     tensor1 : torch.Tensor
@@ -30,7 +129,7 @@ def concatenate(tensor1, tensor2):
     Returns
     -------
     torch.Tensor
-        Cncatenation of tensor1 and tensor2.
+        Cncatenation of tensor1 and tensor2 as float tensor.
 
     Raises
     ------
@@ -40,24 +139,17 @@ def concatenate(tensor1, tensor2):
     assert tensor1.shape[0] == tensor2.shape[0], (
         "Tensors to concatenate must have same dim 0. Tensor1: {}. Tensor2: {}.".format(tensor1.shape[0], tensor2.shape[0])
     )
-    batch_size = tensor1.shape[0]
-    if tensor1.shape == tensor2.shape:
-        return torch.cat((tensor1, tensor2), axis=1).float()
-    elif (len(tensor1.shape) == 2) and (len(tensor2.shape) == 2):
-        return torch.cat((tensor1, tensor2), axis=1).float()
-    elif (len(tensor1.shape) == 4) and (len(tensor2.shape) == 2):
-        y_dim = tensor2.shape[1]
-        tensor2 = torch.reshape(tensor2, shape=(batch_size, y_dim, 1, 1))
-        tensor2 = torch.tile(tensor2, dims=(1, 1, *tensor1.shape[2:]))
-    elif (len(tensor1.shape) == 2) and (len(tensor2.shape) == 4):
-        y_dim = tensor1.shape[1]
-        tensor1 = torch.reshape(tensor1, shape=(batch_size, y_dim, 1, 1))
-        tensor1 = torch.tile(tensor1, dims=(1, 1, *tensor2.shape[2:]))
-    elif (len(tensor1.shape) == 4) and (len(tensor2.shape) == 4):
-        return torch.cat((tensor1, tensor2), axis=1).float()
+    # Cast before broadcasting so that only the small, unexpanded tensors are copied if the dtype differs.
+    tensor1, tensor2 = tensor1.float(), tensor2.float()
+    if tensor1.shape == tensor2.shape or (tensor1.dim() == tensor2.dim() and tensor1.dim() in [2, 4]):
+        return torch.cat((tensor1, tensor2), axis=1)
+    elif (tensor1.dim() == 4) and (tensor2.dim() == 2):
+        tensor2 = tensor2[:, :, None, None].expand(-1, -1, *tensor1.shape[2:])
+    elif (tensor1.dim() == 2) and (tensor2.dim() == 4):
+        tensor1 = tensor1[:, :, None, None].expand(-1, -1, *tensor2.shape[2:])
     else:
         raise AssertionError("tensor1 and tensor2 must have 2 or 4 dimensions. Given: {} and {}.".format(tensor1.shape, tensor2.shape))
-    return torch.cat((tensor1, tensor2), axis=1).float()
+    return torch.cat((tensor1, tensor2), axis=1)
 
 def get_input_dim(dim1, dim2):
     """ Get the number of input dimension from two inputs.
@@ -0,0 +1,292 @@
+import sys
+import time
+import torch
+
+from contextlib import contextmanager
+
+
+class PhaseProfiler():
+    """ Records the wall time spent in the phases of the training loop.
+
+    Phases are timed with `with profiler.phase(name): ...`. In `fit` the phases are "data" (fetching the next batch),
+    "h2d" (copying the batch to the device and sampling the noise), "losses/{network}", "backward/{network}"
+    (including zero_grad), "step/{network}", "logging" (printing, loss logging, tensorboard), "images" and
+    "checkpoint".
+
+    CUDA kernels run asynchronously, so without synchronisation the time of a kernel is attributed to the phase
+    that waits for it. With `synchronize=True` the device is synchronised at the end of every phase, which gives
+    exact per-phase times at the price of a slightly slower training loop.
+
+    Parameters
+    ----------
+    device : str, optional
+        Device used during training. Only relevant for `synchronize`.
+    synchronize : bool, optional
+        Synchronise the device at the end of every phase. Defaults to True on "cuda".
+    trace_dir : str, optional
+        If given, a `torch.profiler` trace is recorded for a few steps (see `trace_schedule`) and written to this
+        directory in the tensorboard format. Every phase appears as a named range in the trace.
+    trace_schedule : dict, optional
+        Keyword arguments of `torch.profiler.schedule`. Default: {"wait": 1, "warmup": 1, "active": 3}.
+    """
+    def __init__(self, device="cpu", synchronize=None, trace_dir=None, trace_schedule=None):
+        self.device = device
+        self.synchronize = (device == "cuda") if synchronize is None else synchronize
+        self.synchronize = self.synchronize and torch.cuda.is_available()
+        self.trace_dir = trace_dir
+        self.trace_schedule = {"wait": 1, "warmup": 1, "active": 3} if trace_schedule is None else trace_schedule
+        self.totals = {}
+        self.counts = {}
+        self.total_time = 0
+        self._reported_totals = {}
+        self._nr_steps = 0
+        self._nr_reported_steps = 0
+        self._start = None
+        self._torch_profiler = None
+
+    def start(self):
+        """ Start the measurement (and the `torch.profiler` trace). Called at the beginning of `fit`.
+        """
+        if self.trace_dir is not None:
+            import torch.profiler
+            self._torch_profiler = torch.profiler.profile(
+                schedule=torch.profiler.schedule(**self.trace_schedule),
+                on_trace_ready=torch.profiler.tensorboard_trace_handler(self.trace_dir)
+            )
+            self._torch_profiler.start()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        """ Stop the measurement. Called at the end of `fit`.
+        """
+        if self._start is not None:
+            self.total_time += time.perf_counter() - self._start
+            self._start = None
+        if self._torch_profiler is not None:
+            self._torch_profiler.stop()
+            self._torch_profiler = None
+
+    def step(self):
+        """ Mark the end of one training step (batch).
+        """
+        self._nr_steps += 1
+        if self._torch_profiler is not None:
+            self._torch_profiler.step()
+
+    @contextmanager
+    def phase(self, name):
+        record = torch.autograd.profiler.record_function(name) if self._torch_profiler is not None else _NO_PHASE
+        start = time.perf_counter()
+        try:
+            with record:
+                yield
+        finally:
+            if self.synchronize:
+                torch.cuda.synchronize()
+            self.totals[name] = self.totals.get(name, 0) + time.perf_counter() - start
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    #########################################################################
+    # Reporting
+    #########################################################################
+    def get_scalars(self):
+        """ Mean time per training step in milliseconds for every phase since the last call.
+
+        Returns
+        -------
+        dict
+            Dictionary of the form {"Profile/{phase}": milliseconds}, e.g. for tensorboard.
+        """
+        nr_steps = max(self._nr_steps - self._nr_reported_steps, 1)
+        scalars = {
+            "Profile/{}".format(name): 1000 * (total - self._reported_totals.get(name, 0)) / nr_steps
+            for name, total in self.totals.items()
+        }
+        self._reported_totals = dict(self.totals)
+        self._nr_reported_steps = self._nr_steps
+        return scalars
+
+    def summary(self):
+        """ Table with the number of calls, total, mean time per call and share of the total time per phase.
+
+        Returns
+        -------
+        str
+            Printable table. The row "other" contains the time not covered by any phase.
+        """
+        total_time = self.total_time
+        if self._start is not None:
+            total_time += time.perf_counter() - self._start
+        lines = [
+            "{:>24} {:>8} {:>12} {:>12} {:>8}".format("Phase", "Calls", "Total [s]", "Mean [ms]", "Share"),
+            "-"*68
+        ]
+        for name, total in sorted(self.totals.items(), key=lambda item: -item[1]):
+            lines.append("{:>24} {:>8} {:>12.3f} {:>12.3f} {:>8.1%}".format(
+                name, self.counts[name], total, 1000*total/self.counts[name], total/max(total_time, 1e-12)
+            ))
+        other = total_time - sum(self.totals.values())
+        lines.append("{:>24} {:>8} {:>12.3f} {:>12} {:>8.1%}".format("other", "", other, "", other/max(total_time, 1e-12)))
+        lines.append("-"*68)
+        lines.append("{:>24} {:>8} {:>12.3f}".format("total ({} steps)".format(self._nr_steps), "", total_time))
+        return "\n".join(lines)
+
+    def __getstate__(self):
+        # The torch profiler can not be pickled, e.g. when the model is saved during training.
+        state = self.__dict__.copy()
+        state["_torch_profiler"] = None
+        return state
+
+
+class ThroughputMeter():
+    """ Tracks the throughput of the training loop and estimates the remaining training time.
+
+    Every step is split into the phases "data" (fetching the next batch), "train" (device copy and network updates)
+    and "overhead" (printing, loss logging including the test set, tensorboard, images and checkpoints). For every
+    phase an exponential moving average of the time per step is kept, from which the samples per second are derived.
+    The remaining time is estimated from the mean wall time per step after the first `warmup_steps` steps. This
+    amortises the periodic overhead and excludes slow first iterations (e.g. cudnn autotuning, allocator growth).
+
+    On cuda the time of asynchronously launched kernels is attributed to the phase that waits for them, so the
+    split between "train" and "overhead" is approximate. Exact per-phase times are recorded by `PhaseProfiler`.
+
+    Parameters
+    ----------
+    total_steps : int
+        Total number of steps (batches) of the training.
+    device : str, optional
+        Device used for training. On "cuda" the memory high-water mark is taken from the caching allocator.
+    warmup_steps : int, optional
+        Number of first steps excluded from the remaining time estimate.
+    smoothing : float, optional
+        Weight of the newest step in the exponential moving averages.
+    """
+    PHASES = ("data", "train", "overhead")
+
+    def __init__(self, total_steps, device="cpu", warmup_steps=10, smoothing=0.05):
+        self.total_steps = total_steps
+        self.device = device
+        self.warmup_steps = warmup_steps
+        self.smoothing = smoothing
+        self.step = 0
+        self.ema = {}
+        self._ema_samples = None
+        self._step_times = {}
+        self._start = self._last = self._warmup_end = None
+
+    def start(self):
+        """ Start the clock. Called right before the first step.
+        """
+        if self.device == "cuda" and torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, phase):
+        """ Attribute the time since the last mark to `phase`.
+        """
+        now = time.perf_counter()
+        self._step_times[phase] = self._step_times.get(phase, 0) + now - self._last
+        self._last = now
+
+    def end_step(self, nr_samples):
+        """ Finish one step. The time since the last mark is attributed to "overhead".
+        """
+        self.mark("overhead")
+        self.step += 1
+        for phase in self.PHASES:
+            self.ema[phase] = self._update_ema(old=self.ema.get(phase), new=self._step_times.get(phase, 0))
+        self._ema_samples = self._update_ema(old=self._ema_samples, new=nr_samples)
+        self._step_times = {}
+        if self.step == self.warmup_steps:
+            self._warmup_end = self._last
+
+    def _update_ema(self, old, new):
+        if old is None:
+            return new
+        return (1 - self.smoothing)*old + self.smoothing*new
+
+    def get_metrics(self):
+        """ Current throughput, timing and memory metrics.
+
+        Returns
+        -------
+        dict
+            step, total_steps, elapsed_time [s], time_per_step [s], eta [s], samples_per_sec (data and train phase),
+            samples_per_sec_data, samples_per_sec_train, overhead_fraction (share of the step time spent in
+            logging etc.), warmup (True while the estimate is based on the moving averages) and peak_memory_mb.
+        """
+        if self._start is None:
+            return {}
+        if self._warmup_end is not None and self.step > self.warmup_steps:
+            time_per_step = (self._last - self._warmup_end) / (self.step - self.warmup_steps)
+        else:
+            time_per_step = sum(self.ema.values())
+        ema_time = sum(self.ema.values())
+        return {
+            "step": self.step,
+            "total_steps": self.total_steps,
+            "elapsed_time": self._last - self._start,
+            "time_per_step": time_per_step,
+            "eta": (self.total_steps - self.step) * time_per_step,
+            "samples_per_sec": self._rate(self.ema.get("data", 0) + self.ema.get("train", 0)),
+            "samples_per_sec_data": self._rate(self.ema.get("data", 0)),
+            "samples_per_sec_train": self._rate(self.ema.get("train", 0)),
+            "overhead_fraction": self.ema.get("overhead", 0) / ema_time if ema_time > 0 else 0.0,
+            "warmup": self._warmup_end is None or self.step <= self.warmup_steps,
+            "peak_memory_mb": get_peak_memory(device=self.device),
+        }
+
+    def _rate(self, seconds):
+        if self._ema_samples is None or seconds <= 0:
+            return float("nan")
+        return self._ema_samples / seconds
+
+
+def get_peak_memory(device):
+    """ Memory high-water mark in megabytes.
+
+    On "cuda" the peak memory allocated by tensors (since the last `torch.cuda.reset_peak_memory_stats`), on "cpu"
+    the peak resident set size of the process. None if it can not be determined.
+    """
+    if device == "cuda":
+        return torch.cuda.max_memory_allocated() / 1024**2
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes on Linux.
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+class NoProfiler():
+    """ Used if profiling is disabled. All methods are no-ops.
+    """
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def step(self):
+        pass
+
+    def phase(self, name):
+        return _NO_PHASE
+
+    def get_scalars(self):
+        return {}
+
+    def summary(self):
+        return "Profiling was not enabled. Use `fit(..., profile=True)`."
+
+
+class _NoPhase():
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        return False
+
+
+_NO_PHASE = _NoPhase()
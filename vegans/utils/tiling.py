@@ -0,0 +1,107 @@
+import torch
+
+import numpy as np
+
+from vegans.utils.latent import inference_mode
+
+
+def tile_positions(size, tile_size, stride):
+    """ Start indices of tiles of length `tile_size` covering `size` pixels with at most `stride` between them.
+    The last tile is aligned with the border.
+    """
+    assert size >= tile_size, "Input ({}) must not be smaller than the tile ({}).".format(size, tile_size)
+    positions = list(range(0, size - tile_size + 1, stride))
+    if positions[-1] != size - tile_size:
+        positions.append(size - tile_size)
+    return positions
+
+
+def feather_weights(tile_size, overlap):
+    """ Blending weights of one tile which rise linearly over `overlap` pixels at every border.
+
+    Parameters
+    ----------
+    tile_size : tuple
+        Height and width of the tile.
+    overlap : int
+        Number of overlapping pixels of neighbouring tiles.
+
+    Returns
+    -------
+    torch.Tensor
+        Weights of shape [height, width]. All weights are positive, so pixels at the border of the image, which are
+        covered by a single tile, are kept as they are.
+    """
+    ramps = []
+    for size in tile_size:
+        distance = torch.minimum(torch.arange(size) + 0.5, size - torch.arange(size) - 0.5)
+        ramps.append(torch.clamp(distance / max(overlap, 1), max=1))
+    return ramps[0][:, None] * ramps[1][None, :]
+
+
+def generate_tiled(model, y, overlap=16, batch_size=16, **kwargs):
+    """ Image-to-image translation of inputs larger than the images the model was trained on, e.g. with the
+    `ConditionalPix2Pix` or `ConditionalCycleGAN`.
+
+    The input is split into overlapping tiles of the trained size (`model.y_dim`). The tiles are streamed through
+    the generator in chunks of `batch_size` and the outputs are blended with feathered weights (see
+    `feather_weights`), so only the output image and one chunk of tiles are kept in memory.
+
+    Parameters
+    ----------
+    model : AbstractConditionalGenerativeModel
+        Trained model whose condition `y` is an image of shape `y_dim` = [channels, height, width].
+    y : np.array or torch.Tensor
+        Input image of shape [channels, height, width] with height and width at least the trained size.
+    overlap : int, optional
+        Number of pixels neighbouring tiles overlap. Larger values hide the tile borders better but need more
+        forward passes.
+    batch_size : int, optional
+        Number of tiles per forward pass.
+    **kwargs
+        Further arguments of `model.generate`, e.g. `who="GeneratorY_X"` for the CycleGAN.
+
+    Returns
+    -------
+    torch.Tensor
+        Output image of shape [output channels, height, width] on the cpu.
+    """
+    y = torch.as_tensor(y)
+    assert len(model.y_dim) == 3 and y.dim() == 3 and y.shape[0] == model.y_dim[0], (
+        "`y` must be a single image with the channels of y_dim={}. Given: {}.".format(model.y_dim, tuple(y.shape))
+    )
+    tile_size = tuple(model.y_dim[1:])
+    assert 0 <= overlap < min(tile_size), "`overlap` must be smaller than the tile {}. Given: {}.".format(tile_size, overlap)
+    _, height, width = y.shape
+    stride = [size - overlap for size in tile_size]
+    corners = [
+        (row, col)
+        for row in tile_positions(size=height, tile_size=tile_size[0], stride=stride[0])
+        for col in tile_positions(size=width, tile_size=tile_size[1], stride=stride[1])
+    ]
+    weights = feather_weights(tile_size=tile_size, overlap=overlap)
+
+    output = None
+    weight_sum = torch.zeros(height, width)
+    was_training = model.training
+    model.eval()
+    try:
+        with inference_mode():
+            for start in range(0, len(corners), batch_size):
+                chunk = corners[start:start+batch_size]
+                tiles = torch.stack([y[:, row:row+tile_size[0], col:col+tile_size[1]] for row, col in chunk])
+                outputs = torch.as_tensor(np.asarray(model.generate(y=tiles.to(model.device), **kwargs))).float()
+                if output is None:
+                    assert tuple(outputs.shape[2:]) == tile_size, (
+                        "Generator output must have the spatial size of the tiles {}. Given: {}.".format(
+                            tile_size, tuple(outputs.shape[2:])
+                        )
+                    )
+                    output = torch.zeros(outputs.shape[1], height, width)
+                for (row, col), tile in zip(chunk, outputs):
+                    output[:, row:row+tile_size[0], col:col+tile_size[1]] += tile * weights
+                    weight_sum[row:row+tile_size[0], col:col+tile_size[1]] += weights
+    finally:
+        if was_training:
+            model.train()
+    return output / weight_sum
@@ -79,11 +79,13 @@ def summary_string(model, input_size, batch_size=-1, device=torch.device('cuda:0
 
     # make a forward pass
     # print(x.shape)
-    model(*x)
-
-    # remove these hooks
-    for h in hooks:
-        h.remove()
+    try:
+        with torch.no_grad():
+            model(*x)
+    finally:
+        # remove these hooks
+        for h in hooks:
+            h.remove()
 
     summary_str += "----------------------------------------------------------------" + "\n"
     line_new = "{:>20}  {:>25} {:>15}".format(
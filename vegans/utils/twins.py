@@ -0,0 +1,89 @@
+import torch
+
+
+def twins_supported():
+    """ Returns True if the installed torch provides `torch.func` (torch >= 2.0), which `twin_forward` requires.
+    """
+    try:
+        import torch.func
+    except ImportError:
+        return False
+    return hasattr(torch.func, "functional_call") and hasattr(torch.func, "vmap")
+
+
+def check_twins(first, second):
+    """ Asserts that two networks can be run by `twin_forward`.
+
+    Both networks must have the same parameter names and shapes and no buffers. The running statistics of batch
+    normalization can not be updated in a vectorized forward pass.
+
+    Parameters
+    ----------
+    first, second : torch.nn.Module
+        Networks with identical architecture, e.g. the two generators of the CycleGAN.
+    """
+    shapes_first = [(name, param.shape) for name, param in first.named_parameters()]
+    shapes_second = [(name, param.shape) for name, param in second.named_parameters()]
+    if shapes_first != shapes_second:
+        raise ValueError("Twin networks must have the same architecture (parameter names and shapes).")
+    buffers = [name for name, _ in first.named_buffers()] + [name for name, _ in second.named_buffers()]
+    if buffers:
+        raise ValueError(
+            "Twin networks must not have buffers (e.g. running statistics of batch normalization). Given: {}.".format(buffers)
+        )
+
+
+def stack_twins(first, second):
+    """ Stacks the parameters of both networks along a new leading dimension for `twin_forward`.
+
+    The parameters are stacked with `torch.stack` (not with `torch.func.stack_module_state`, which returns detached
+    copies), so the gradients flow back to the parameters of both networks and their optimizers, `save` and `load`
+    are unaffected. Stacking copies all parameters, so the result should be reused for all forward passes until
+    the next optimizer step of the networks.
+
+    Parameters
+    ----------
+    first, second : torch.nn.Module
+        Networks with identical architecture (see `check_twins`).
+
+    Returns
+    -------
+    dict
+        Stacked parameters keyed by the parameter names of `first`.
+    """
+    return {
+        name: torch.stack([param_first, param_second])
+        for (name, param_first), param_second in zip(first.named_parameters(), second.parameters())
+    }
+
+
+def twin_forward(first, second, x_first, x_second, params=None):
+    """ Runs `first(x_first)` and `second(x_second)` in one vectorized forward pass.
+
+    The forward pass of `first` is vmapped over the stacked parameters of both networks and the stacked inputs, so
+    every layer launches one batched kernel for both networks. Requires torch >= 2.0 (see `twins_supported`).
+
+    Parameters
+    ----------
+    first, second : torch.nn.Module
+        Networks with identical architecture (see `check_twins`).
+    x_first, x_second : torch.Tensor
+        Inputs of the same shape.
+    params : dict, optional
+        Output of `stack_twins(first, second)` computed after the last optimizer step. Stacked on every call if
+        not given.
+
+    Returns
+    -------
+    tuple
+        Outputs of `first` and `second`.
+    """
+    from torch.func import functional_call, vmap
+    if params is None:
+        params = stack_twins(first, second)
+
+    def forward(params, x):
+        return functional_call(first, params, (x, ))
+
+    outputs = vmap(forward, randomness="different")(params, torch.stack([x_first, x_second]))
+    return outputs[0], outputs[1]